@@ -0,0 +1,392 @@
+"""
+File: barchart.py
+-----------------
+This file lays out and draws the charts of biasbars.py: the bars of one word
+by gender and rating bucket (with optional error bars), the heatmap comparing
+many words, and the bars of one word in several partitions. It only calls the
+drawing methods of the canvas it is given, so the same code draws on a Tk
+canvas in the GUI and on a chartexport.SvgCanvas when charts are exported
+without a display; nothing here imports tkinter.
+"""
+
+import biasbarsdata
+import instrument
+from wordstore import PER_MILLION
+
+# the default size of the chart, and the layout of its parts
+WINDOW_WIDTH = 1000
+WINDOW_HEIGHT = 600
+
+VERTICAL_MARGIN = 30
+LEFT_MARGIN = 60
+RIGHT_MARGIN = 30
+LABELS = ["Low Reviews", "Medium Reviews", "High Reviews"]
+LABEL_OFFSET = 10
+BAR_WIDTH = 75
+# the most of its share of the plotting area the bars of a bucket may fill when there are many buckets
+BAR_FILL = 0.9
+LINE_WIDTH = 2
+TEXT_DX = 10
+TEXT_DY = 10
+NUM_VERTICAL_DIVISIONS = 7
+TICK_WIDTH = 15
+# colors of the bars for each gender, and of the heatmap cells at their highest frequency
+COLORS = {biasbarsdata.KEY_WOMEN: 'dodgerblue', biasbarsdata.KEY_MEN: 'orange'}
+HEATMAP_COLORS = {biasbarsdata.KEY_WOMEN: (30, 144, 255), biasbarsdata.KEY_MEN: (255, 165, 0)}
+# heatmap rows shorter than this many pixels leave out the numbers in the cells
+MIN_CELL_TEXT_HEIGHT = 14
+# how pale the bars of the last partition are when several partitions are plotted together,
+# and the width of each swatch in the legend naming them
+MIN_PARTITION_SHADE = 0.35
+LEGEND_SWATCH = 10
+# the width of the caps at the ends of the error bars, as a fraction of the bar width
+ERROR_CAP_FRACTION = 0.3
+
+# the Tk anchor and state option values the charts use, spelled out so tkinter is not needed
+N, S, E, W = 'n', 's', 'e', 'w'
+NORMAL, HIDDEN = 'normal', 'hidden'
+
+# the attribute of a canvas holding the item ids of the chart parts that plot_word updates, so
+# they go away with the canvas
+CHART_ITEMS = 'chart_items'
+
+
+def get_centered_x_coordinate(width, idx, num_buckets=len(LABELS)):
+    """
+    Given the width of the canvas and the index of the current review
+    quality bucket to plot, returns the x coordinate of the centered
+    location for the bars and label to be plotted relative to.
+
+    Input:
+        width (int): The width of the canvas
+        year_index (int): The index of the current label in the LABELS list
+        num_buckets (int): The number of buckets the plotting area is shared by
+    Returns:
+        x_coordinate (float): The centered x coordinate of the horizontal line 
+                              associated with the specified label.
+    >>> round(get_centered_x_coordinate(1000, 0), 1)
+    211.7
+    >>> round(get_centered_x_coordinate(1000, 1), 1)
+    515.0
+    >>> round(get_centered_x_coordinate(1000, 2), 1)
+    818.3
+    >>> round(get_centered_x_coordinate(1000, 4, 5), 1)
+    879.0
+    """
+    # the plotting area is divided into two parts per bucket, and each bucket is centered between its two parts
+    fraction = (width - (LEFT_MARGIN + RIGHT_MARGIN)) / (2 * num_buckets)
+
+    # the index determines how many proportional parts are added to the LEFT_MARGIN to get the x_coordinate
+    x_coordinate = LEFT_MARGIN + ((2 * idx + 1) * fraction)
+
+    return x_coordinate
+
+
+def get_bar_width(width, num_buckets):
+    """
+    Returns the width of each bar when the plotting area is shared by
+    num_buckets buckets: BAR_WIDTH, unless the two bars of a bucket would
+    then not fit in it.
+
+    >>> get_bar_width(1000, 3)
+    75
+    >>> round(get_bar_width(1000, 8), 1)
+    51.2
+    """
+    return min(BAR_WIDTH, (width - (LEFT_MARGIN + RIGHT_MARGIN)) / (2 * num_buckets) * BAR_FILL)
+
+
+def draw_fixed_content(canvas, labels=LABELS):
+    """
+    Erases all existing information on the given canvas and then
+    draws the fixed background border and x-axis labels on it.
+
+    Input:
+        canvas (tkinter Canvas): The canvas on which we are drawing.
+        labels (List[str]): The names of the rating buckets, from low to high
+    """
+    canvas.delete('all')            # delete all existing content from the canvas
+    setattr(canvas, CHART_ITEMS, None)
+    width = canvas.winfo_width()    # get the width of the canvas
+    height = canvas.winfo_height()  # get the height of the canvas
+
+    # creates a rectangle that will serve as the plotting area
+    canvas.create_rectangle(LEFT_MARGIN, VERTICAL_MARGIN, width - RIGHT_MARGIN, height - VERTICAL_MARGIN, width=LINE_WIDTH)
+
+    # creates evenly spaced labels for the rating buckets (low, medium, and high reviews by default)
+    for i in range(len(labels)):
+        x = get_centered_x_coordinate(width, i, len(labels))
+        y = height - VERTICAL_MARGIN + LABEL_OFFSET
+        canvas.create_text(x, y, text=labels[i], anchor=N)
+
+
+def create_chart_items(canvas, labels=LABELS):
+    """
+    Draws the fixed content and the y-axis ticks on the given canvas, and
+    creates the tick labels, bars and bar labels that plot_word later moves
+    and relabels for each word. Returns the dictionary of their item ids,
+    which is also saved on the canvas as its CHART_ITEMS attribute.
+
+    Input:
+        canvas (tkinter Canvas): The canvas on which we are drawing.
+        labels (List[str]): The names of the rating buckets, from low to high
+    """
+    draw_fixed_content(canvas, labels)
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+
+    tick_offset = TICK_WIDTH / 2
+    start = height - VERTICAL_MARGIN
+    increment = (height - (2 * VERTICAL_MARGIN)) / NUM_VERTICAL_DIVISIONS
+
+    # creates ticks and (empty) labels for the frequencies along the y-axis, with the top tick last
+    tick_labels = []
+    for y in [start - (i * increment) for i in range(NUM_VERTICAL_DIVISIONS)] + [VERTICAL_MARGIN]:
+        canvas.create_line(LEFT_MARGIN - tick_offset, y, LEFT_MARGIN + tick_offset, y, width=LINE_WIDTH)
+        tick_labels.append(canvas.create_text(LEFT_MARGIN - LABEL_OFFSET, y, text='', anchor=E))
+
+    # creates an empty bar, a hidden label and a hidden error bar for each gender in each bucket
+    bars = {biasbarsdata.KEY_WOMEN: [], biasbarsdata.KEY_MEN: []}
+    bar_labels = {biasbarsdata.KEY_WOMEN: [], biasbarsdata.KEY_MEN: []}
+    error_bars = {biasbarsdata.KEY_WOMEN: [], biasbarsdata.KEY_MEN: []}
+    for i in range(len(labels)):
+        for gender, color in COLORS.items():
+            bars[gender].append(canvas.create_rectangle(0, start, 0, start, fill=color))
+            bar_labels[gender].append(canvas.create_text(0, start, text=gender, state=HIDDEN))
+    # the error bars are made after every bar, so they are drawn on top of the bars next to them
+    for i in range(len(labels)):
+        for gender in COLORS:
+            error_bars[gender].append(canvas.create_line(0, start, 0, start, state=HIDDEN))
+
+    items = {'size': (width, height), 'labels': tuple(labels), 'tick_labels': tick_labels, 'bars': bars,
+             'bar_labels': bar_labels, 'error_bars': error_bars}
+    setattr(canvas, CHART_ITEMS, items)
+    return items
+
+
+@instrument.timed
+def plot_word(canvas, word_data, word, scheme=None, intervals=None):
+    """
+    Given a dictionary of word frequency data and a single word, plots
+    the distribution of the frequency of this word across gender and 
+    rating category.
+
+    The canvas items are only created the first time a word is plotted (or
+    after the canvas changes size or bucket scheme); later plots just move the
+    bars and change the label text, which avoids flicker when stepping through
+    many words.
+
+    Input:
+        canvas (tkinter Canvas): The canvas on which we are drawing.
+        word_data (dictionary): Dictionary holding word frequency data
+        word (str): The word whose frequency distribution you want to plot
+        scheme (BucketScheme): How to cut the ratings into buckets, or None for
+                               low, medium and high reviews; any other scheme
+                               needs a WordStore (or FrequencyView) with histograms
+        intervals (dictionary): The (low, high) confidence interval of each bar,
+                                by gender and bucket, drawn as error bars; or None
+                                for no error bars (see confidence.WordConfidence)
+    """
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+    labels = LABELS if scheme is None else scheme.labels
+    items = getattr(canvas, CHART_ITEMS, None)
+    if items is None or items['size'] != (width, height) or items['labels'] != tuple(labels):
+        items = create_chart_items(canvas, labels)
+
+    # We have provided code to calculate the maximum frequency for the specified
+    # word from the provided dict 
+    gender_data = word_data[word] if scheme is None else biasbarsdata.lookup_words(word_data, [word], scheme)[0]
+    max_frequency = max(max(gender_data[biasbarsdata.KEY_WOMEN]), max(gender_data[biasbarsdata.KEY_MEN]))
+    if intervals is not None:
+        # the scale is stretched to fit the tops of the error bars
+        max_frequency = max(max_frequency, *(high for gender in COLORS for low, high in intervals[gender]))
+
+    label_list = get_labels(max_frequency)
+    start = height - VERTICAL_MARGIN
+    # a word with no counts (yet) is drawn with empty bars
+    frequency_to_pixels = (height - (2 * VERTICAL_MARGIN)) / max_frequency if max_frequency else 0
+
+    # relabels the ticks along the y-axis
+    for item, label in zip(items['tick_labels'], label_list + [max_frequency]):
+        canvas.itemconfigure(item, text=int(label))
+
+    # moves the bars for the graph as well as the label for men and women
+    # frequencies are converted to pixels using frequency_to_pixels conversion factor
+    bar_width = get_bar_width(width, len(labels))
+    for i in range(len(labels)):
+        x_coordinate = get_centered_x_coordinate(width, i, len(labels))
+        for gender, left in ((biasbarsdata.KEY_WOMEN, x_coordinate - bar_width), (biasbarsdata.KEY_MEN, x_coordinate)):
+            frequency = gender_data[gender][i]
+            top = start - (frequency * frequency_to_pixels)
+            canvas.coords(items['bars'][gender][i], left, top, left + bar_width, start)
+            label = items['bar_labels'][gender][i]
+            canvas.coords(label, left + TEXT_DX, top + TEXT_DY)
+            canvas.itemconfigure(label, state=NORMAL if frequency > 0 else HIDDEN)
+            error_bar = items['error_bars'][gender][i]
+            if intervals is None:
+                canvas.itemconfigure(error_bar, state=HIDDEN)
+                continue
+            # an I shape from the low end of the interval to the high end, with a cap at each end
+            low, high = intervals[gender][i]
+            low_y = start - (low * frequency_to_pixels)
+            high_y = start - (high * frequency_to_pixels)
+            middle = left + (bar_width / 2)
+            cap = bar_width * ERROR_CAP_FRACTION / 2
+            canvas.coords(error_bar, middle - cap, high_y, middle + cap, high_y, middle, high_y, middle, low_y,
+                          middle - cap, low_y, middle + cap, low_y)
+            canvas.itemconfigure(error_bar, state=NORMAL if high > 0 else HIDDEN)
+
+
+def blend(rgb, fraction):
+    """
+    Returns the Tk color string for the color that is the given fraction of
+    the way from white to rgb.
+
+    >>> blend((30, 144, 255), 0)
+    '#ffffff'
+    >>> blend((30, 144, 255), 1)
+    '#1e90ff'
+    """
+    fraction = min(max(fraction, 0), 1)
+    return '#' + ''.join(f"{round(255 - (255 - value) * fraction):02x}" for value in rgb)
+
+
+@instrument.timed
+def plot_words(canvas, word_data, words, scheme=None):
+    """
+    Given a dictionary of word frequency data and a list of words, plots all of
+    the words at once as a heatmap, so their distributions can be compared.
+    Each word is a row, and each rating category has a column for women and a
+    column for men, lined up with the bars plot_word draws. The darker a cell,
+    the higher that frequency, on a scale shared by every word. The data for
+    all of the words is fetched in one batched lookup, and the whole chart is
+    drawn in one pass.
+
+    Input:
+        canvas (tkinter Canvas): The canvas on which we are drawing.
+        word_data (dictionary): Dictionary holding word frequency data
+        words (List[str]): The words to plot, all of which must be in word_data
+        scheme (BucketScheme): How to cut the ratings into buckets, as for plot_word
+    """
+    labels = LABELS if scheme is None else scheme.labels
+    draw_fixed_content(canvas, labels)
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+
+    all_gender_data = biasbarsdata.lookup_words(word_data, words, scheme)
+    max_frequency = max(max(max(gender_data[gender]) for gender in COLORS) for gender_data in all_gender_data)
+    canvas.create_text(LEFT_MARGIN, VERTICAL_MARGIN / 2, anchor=W,
+                       text=f"max {int(max_frequency)}")
+    scale = 1 / max_frequency if max_frequency else 0
+
+    row_height = (height - (2 * VERTICAL_MARGIN)) / len(words)
+    font_size = max(6, min(10, int(row_height) - 4))
+    show_values = row_height >= MIN_CELL_TEXT_HEIGHT
+    columns = []
+    bar_width = get_bar_width(width, len(labels))
+    for i in range(len(labels)):
+        x_coordinate = get_centered_x_coordinate(width, i, len(labels))
+        for gender, left in ((biasbarsdata.KEY_WOMEN, x_coordinate - bar_width), (biasbarsdata.KEY_MEN, x_coordinate)):
+            columns.append((gender, i, left))
+    label_x = columns[0][2] - TEXT_DX
+
+    # draws one row of cells per word, with the word to the left of its row
+    for row, (word, gender_data) in enumerate(zip(words, all_gender_data)):
+        top = VERTICAL_MARGIN + (row * row_height)
+        middle = top + (row_height / 2)
+        canvas.create_text(label_x, middle, text=word, anchor=E, font=('Helvetica', font_size))
+        for gender, i, left in columns:
+            frequency = gender_data[gender][i]
+            fraction = frequency * scale
+            canvas.create_rectangle(left, top, left + bar_width, top + row_height, width=0,
+                                    fill=blend(HEATMAP_COLORS[gender], fraction))
+            if show_values and frequency > 0:
+                canvas.create_text(left + (bar_width / 2), middle, text=int(frequency), font=('Helvetica', font_size),
+                                   fill='white' if fraction > 0.5 else 'black')
+
+    # names the gender of each column above the first row
+    for gender, i, left in columns:
+        canvas.create_text(left + (bar_width / 2), VERTICAL_MARGIN - TEXT_DY / 2, text=gender, anchor=S)
+
+
+@instrument.timed
+def plot_word_partitions(canvas, partitions, word, names=None, scheme=None):
+    """
+    Given a PartitionedStore (see partitions.py) and a single word, plots the
+    distribution of the word's frequency in each of the named partitions (or in
+    every partition) on one chart, so slices such as years can be compared.
+    Each gender's bar in each rating category is split into one thinner bar per
+    partition, shaded from the full gender color for the first partition to a
+    paler one for the last, on a scale shared by every partition. A legend of
+    the partitions and their shades is drawn above the chart.
+
+    Input:
+        canvas (tkinter Canvas): The canvas on which we are drawing.
+        partitions (PartitionedStore): The partitions holding word frequency data
+        word (str): The word whose frequency distribution you want to plot
+        names (List[str]): The partitions to plot, or None for every partition
+        scheme (BucketScheme): How to cut the ratings into buckets, as for plot_word
+    """
+    labels = LABELS if scheme is None else scheme.labels
+    draw_fixed_content(canvas, labels)
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+
+    all_gender_data = partitions.compare(word, names, PER_MILLION, scheme)
+    max_frequency = max((max(max(gender_data[gender]) for gender in COLORS)
+                         for gender_data in all_gender_data.values() if gender_data is not None), default=0)
+    if not max_frequency:
+        return
+    start = height - VERTICAL_MARGIN
+    frequency_to_pixels = (height - (2 * VERTICAL_MARGIN)) / max_frequency
+
+    # draws the ticks and their labels along the y-axis, as plot_word does
+    tick_offset = TICK_WIDTH / 2
+    increment = (height - (2 * VERTICAL_MARGIN)) / NUM_VERTICAL_DIVISIONS
+    ticks = [start - (i * increment) for i in range(NUM_VERTICAL_DIVISIONS)] + [VERTICAL_MARGIN]
+    for y, label in zip(ticks, get_labels(max_frequency) + [max_frequency]):
+        canvas.create_line(LEFT_MARGIN - tick_offset, y, LEFT_MARGIN + tick_offset, y, width=LINE_WIDTH)
+        canvas.create_text(LEFT_MARGIN - LABEL_OFFSET, y, text=int(label), anchor=E)
+
+    # draws one thin bar per partition inside the space of each gender's bar
+    shades = {name: 1 - (1 - MIN_PARTITION_SHADE) * i / max(len(all_gender_data) - 1, 1)
+              for i, name in enumerate(all_gender_data)}
+    bar_width = get_bar_width(width, len(labels))
+    thin_width = bar_width / len(all_gender_data)
+    for i in range(len(labels)):
+        x_coordinate = get_centered_x_coordinate(width, i, len(labels))
+        for gender, left in ((biasbarsdata.KEY_WOMEN, x_coordinate - bar_width), (biasbarsdata.KEY_MEN, x_coordinate)):
+            for j, (name, gender_data) in enumerate(all_gender_data.items()):
+                frequency = gender_data[gender][i] if gender_data is not None else 0
+                if frequency > 0:
+                    top = start - (frequency * frequency_to_pixels)
+                    bar_left = left + (j * thin_width)
+                    canvas.create_rectangle(bar_left, top, bar_left + thin_width, start,
+                                            fill=blend(HEATMAP_COLORS[gender], shades[name]))
+            canvas.create_text(left + (bar_width / 2), start - TEXT_DY, text=gender, anchor=S)
+
+    # names each partition next to its shades, above the plotting area
+    x = LEFT_MARGIN
+    for name, shade in shades.items():
+        for gender in COLORS:
+            canvas.create_rectangle(x, VERTICAL_MARGIN / 4, x + LEGEND_SWATCH, VERTICAL_MARGIN * 3 / 4,
+                                    fill=blend(HEATMAP_COLORS[gender], shade))
+            x += LEGEND_SWATCH
+        label = canvas.create_text(x + TEXT_DX / 2, VERTICAL_MARGIN / 2, text=name, anchor=W)
+        x = canvas.bbox(label)[2] + TEXT_DX
+
+
+def get_labels(max_frequency):
+    """
+    Input: max_frequency value
+    Output: a list of labels for the frequency
+    """
+    label_list = []
+    label = 0
+    label_increment = max_frequency // NUM_VERTICAL_DIVISIONS
+    for i in range(NUM_VERTICAL_DIVISIONS):
+        label_list.append(label)
+        label += label_increment
+
+    return label_list
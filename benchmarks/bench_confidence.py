@@ -0,0 +1,68 @@
+"""
+File: bench_confidence.py
+-------------------------
+Measures the confidence intervals and p-values of confidence.py on a data file:
+    collect     how long the pass gathering the review-level counts takes
+    per word    how long one word takes by each method, for the most common
+                words and for random ones, and how long a cached word takes
+    batch       how many words a second score_vocabulary gets through by the
+                bootstrap method with one worker and with one per CPU, and how
+                far past its time budget it runs
+
+Run from the top of the repository:
+    python benchmarks/bench_confidence.py [data_file] [budget_seconds]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import confidence
+from timing import best_time
+
+FILENAME = "data/full-data.txt"
+NUM_WORDS = 50
+BUDGET = 10.0
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    budget = float(args[1]) if len(args) > 1 else BUDGET
+
+    collect = best_time(lambda: confidence.collect_review_counts(filename))
+    review_counts = confidence.collect_review_counts(filename)
+    print(f"collect_review_counts {collect * 1000:.0f} ms for {len(review_counts)} words")
+
+    common = review_counts.most_used()[:NUM_WORDS]
+    rare = random.Random(0).sample(list(review_counts), NUM_WORDS)
+    for name, words in (("common", common), ("random", rare)):
+        analytic = best_time(lambda: confidence.score_words(review_counts, words)) / len(words)
+        bootstrap = best_time(lambda: confidence.score_words(review_counts, words, method=confidence.BOOTSTRAP),
+                              1) / len(words)
+        print(f"{name:6s} words: analytic {analytic * 1e6:8.1f} us, "
+              f"bootstrap ({confidence.REPLICATES} resamples) {bootstrap * 1000:8.1f} ms per word")
+
+    cache = confidence.WordConfidence(review_counts)
+    for word in common:
+        cache.result(word)
+    cached = best_time(lambda: [cache.result(word) for word in common]) / len(common)
+    print(f"cached result {cached * 1e6:.2f} us per word")
+
+    rates = {}
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        results = confidence.score_vocabulary(review_counts, budget=budget, workers=workers)
+        seconds = time.perf_counter() - start
+        rates[workers] = len(results) / seconds
+        print(f"score_vocabulary, {workers} worker(s): {len(results)} of {len(review_counts)} words in "
+              f"{seconds:.1f} s ({rates[workers]:.0f} words/s, {seconds - budget:+.1f} s past the budget)")
+    if len(rates) > 1:
+        print(f"speedup {rates[max(rates)] / rates[1]:.2f}x with {max(rates)} workers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+File: bench_export.py
+---------------------
+Measures the headless chart export of chartexport.py on a data file: how many
+SVG charts a second export_vocabulary writes with one worker and with one per
+CPU (startup of the pool included), and how long one chart takes to lay out
+and to write out on its own.
+
+Run from the top of the repository:
+    python benchmarks/bench_export.py [data_file] [num_words]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barchart
+import biasbarsdata
+import chartexport
+import indexcache
+from timing import best_time
+
+FILENAME = "data/full-data.txt"
+NUM_WORDS = 5000
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    num_words = int(args[1]) if len(args) > 1 else NUM_WORDS
+
+    word_data = biasbarsdata.FrequencyView(indexcache.load_word_data(filename))
+    words = [word for word, count in word_data.store.most_common(num_words)]
+    canvas = chartexport.SvgCanvas()
+    plot = best_time(lambda: [barchart.plot_word(canvas, word_data, word) for word in words]) / len(words)
+    render = best_time(lambda: [canvas.to_svg() for word in words]) / len(words)
+    print(f"plot_word {plot * 1e6:.0f} us, to_svg {render * 1e6:.0f} us per chart "
+          f"({len(canvas.to_svg()) / 1024:.1f} KiB each)")
+
+    directory = tempfile.mkdtemp()
+    try:
+        rates = {}
+        for workers in sorted({1, os.cpu_count() or 1}):
+            seconds = best_time(lambda: chartexport.export_vocabulary(filename, words, directory, workers=workers))
+            rates[workers] = len(words) / seconds
+            print(f"export_vocabulary, {workers} worker(s): {len(words)} charts in {seconds:.2f} s "
+                  f"({rates[workers]:.0f} charts/s)")
+        if len(rates) > 1:
+            print(f"speedup {rates[max(rates)] / rates[1]:.2f}x with {max(rates)} workers")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
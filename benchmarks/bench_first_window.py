@@ -0,0 +1,87 @@
+"""
+File: bench_first_window.py
+---------------------------
+Measures how long biasbars.main keeps the user waiting, comparing loading the
+data before the window is made (as main used to) with loading it in the
+background while the window is already up (as main does now). For each, it
+reports:
+    first window   when the window can be shown
+    first plot     when a word typed straight away can be plotted
+    loaded         when the whole data set has been counted
+
+The Tk thread is stood in for by a loop that polls every LOAD_POLL_MS, so no
+display is needed; the real timings of a run with a window are printed by
+    python biasbars.py -timing
+
+Run from the top of the repository:
+    python benchmarks/bench_first_window.py [data_file] [word]
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+import biasbarsgui
+import indexcache
+
+FILENAME = "data/full-data.txt"
+WORD = "good"
+
+
+def blocking_start(filename, word):
+    """
+    Loads everything and then shows the window, as main used to. Returns the
+    (first window, first plot, loaded) times in seconds.
+    """
+    start = time.perf_counter()
+    word_data = biasbarsdata.FrequencyView(indexcache.load_word_data(filename))
+    loaded = time.perf_counter() - start
+    word_data[word]
+    return loaded, time.perf_counter() - start, loaded
+
+
+def background_start(filename, word):
+    """
+    Shows the window at once and loads in a worker thread, as main does now,
+    trying to plot word every poll until it has been counted. Returns the
+    (first window, first plot, loaded) times in seconds.
+    """
+    start = time.perf_counter()
+    word_data = biasbarsdata.FrequencyView(biasbarsdata.WordStore())
+    loaded = []
+
+    def load():
+        word_data.store = indexcache.load_word_data(filename, word_data.store)
+        loaded.append(time.perf_counter() - start)
+
+    worker = threading.Thread(target=load, daemon=True)
+    worker.start()
+    first_window = time.perf_counter() - start
+    while word not in word_data:
+        time.sleep(biasbarsgui.LOAD_POLL_MS / 1000)
+    word_data[word]
+    first_plot = time.perf_counter() - start
+    worker.join()
+    return first_window, first_plot, loaded[0]
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    word = args[1] if len(args) > 1 else WORD
+
+    for cache in ("cold", "warm"):
+        for name, run in (("blocking", blocking_start), ("background", background_start)):
+            if cache == "cold" and os.path.exists(indexcache.cache_path(filename)):
+                os.remove(indexcache.cache_path(filename))
+            window, plot, loaded = run(filename, word)
+            print(f"{cache} {name:10s} first window {window * 1000:7.1f} ms  "
+                  f"first plot {plot * 1000:7.1f} ms  loaded {loaded * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
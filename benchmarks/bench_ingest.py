@@ -0,0 +1,59 @@
+"""
+File: bench_ingest.py
+---------------------
+Measures how fast a review file can be ingested, comparing the batched
+biasbarsdata.read_file with the original one word at a time loop.
+Throughput is reported in MB/s and reviews/s.
+
+Run from the top of the repository:
+    python benchmarks/bench_ingest.py [data_file] [repeats]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+from wordstore import WordStore
+from timing import best_time
+
+FILENAME = "data/full-data.txt"
+REPEATS = 5
+
+
+def read_file_by_line(filename):
+    """
+    The original ingestion loop: one line, and then one word, at a time.
+    """
+    word_data = WordStore()
+    with open(filename) as file:
+        next(file)
+        for line in file:
+            line = line.strip()
+            index = line.find(',')
+            rating = float(line[0:index])
+            gender = line[index+1:index+2]
+            for word in line[index+3:].split():
+                biasbarsdata.add_data_for_word(word_data, word, gender, rating)
+    return word_data
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    repeats = int(args[1]) if len(args) > 1 else REPEATS
+
+    assert biasbarsdata.read_file(filename) == read_file_by_line(filename)
+
+    megabytes = os.path.getsize(filename) / 1e6
+    with open(filename) as file:
+        reviews = sum(1 for line in file) - 1
+
+    for name, load in (("line by line", read_file_by_line), ("batched", biasbarsdata.read_file)):
+        seconds = best_time(lambda: load(filename), repeats)
+        print(f"{name:14s} {seconds * 1000:8.1f} ms {megabytes / seconds:8.2f} MB/s {reviews / seconds:10.0f} reviews/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+File: bench_memory.py
+---------------------
+Compares the memory used by the original dictionary-of-dictionaries word_data
+with the array-backed WordStore returned by biasbarsdata.read_file.
+
+Run from the top of the repository:
+    python benchmarks/bench_memory.py [data_file]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+
+FILENAME = "data/full-data.txt"
+
+
+def read_file_as_dict(filename):
+    """
+    Builds word_data the original way, as a plain nested dictionary.
+    """
+    word_data = {}
+    with open(filename) as file:
+        next(file)
+        for line in file:
+            line = line.strip()
+            index = line.find(',')
+            rating = float(line[0:index])
+            gender = line[index+1:index+2]
+            for word in line[index+3:].split():
+                biasbarsdata.add_data_for_word(word_data, word, gender, rating)
+    return word_data
+
+
+def measure(load, filename):
+    """
+    Returns the loaded word data along with the number of bytes still
+    allocated once loading has finished.
+    """
+    tracemalloc.start()
+    word_data = load(filename)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return word_data, current
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if args else FILENAME
+
+    dict_data, dict_bytes = measure(read_file_as_dict, filename)
+    store, store_bytes = measure(biasbarsdata.read_file, filename)
+    assert dict(store.items()) == dict_data
+
+    print(f"vocabulary size:   {len(store)} words")
+    print(f"nested dict:       {dict_bytes / 1024:10.1f} KiB")
+    print(f"WordStore:         {store_bytes / 1024:10.1f} KiB ({store.nbytes() / 1024:.1f} KiB of counts)")
+    print(f"reduction:         {dict_bytes / store_bytes:10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
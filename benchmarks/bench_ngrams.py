@@ -0,0 +1,60 @@
+"""
+File: bench_ngrams.py
+---------------------
+Measures counting phrases of n words with biasbarsdata.read_file for n = 1, 2
+and 3, with no limit on the number of distinct phrases and with max_words set
+to MAX_WORDS. For each run it reports the throughput, the number of distinct
+phrases kept, the peak memory allocated while counting, the memory held by
+the finished store and the error bound left by pruning.
+
+Run from the top of the repository:
+    python benchmarks/bench_ngrams.py [data_file] [max_words]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+
+FILENAME = "data/full-data.txt"
+MAX_WORDS = 1 << 16
+MEBIBYTE = 1 << 20
+
+
+def measure(filename, n, max_words):
+    """
+    Counts the file and returns (seconds, store, peak bytes, bytes held).
+    The time is measured without tracemalloc running, since it slows allocation down.
+    """
+    start = time.perf_counter()
+    biasbarsdata.read_file(filename, n=n, max_words=max_words)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    word_data = biasbarsdata.read_file(filename, n=n, max_words=max_words)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, word_data, peak, held
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    max_words = int(args[1]) if len(args) > 1 else MAX_WORDS
+    size = os.path.getsize(filename) / MEBIBYTE
+
+    print(f"{filename}: {size:.1f} MiB")
+    for n in (1, 2, 3):
+        for limit in (None, max_words):
+            seconds, word_data, peak, held = measure(filename, n, limit)
+            print(f"n={n} max_words={str(limit):7s} {size / seconds:6.1f} MiB/s  {len(word_data):7d} phrases  "
+                  f"peak {peak / MEBIBYTE:6.1f} MiB  held {held / MEBIBYTE:6.1f} MiB  "
+                  f"error bound {word_data.error_bound()}")
+
+
+if __name__ == '__main__':
+    main()
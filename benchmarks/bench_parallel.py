@@ -0,0 +1,42 @@
+"""
+File: bench_parallel.py
+-----------------------
+Measures how biasbarsdata.read_file_parallel scales with the number of
+worker processes, compared with the single process read_file.
+
+Run from the top of the repository:
+    python benchmarks/bench_parallel.py [data_file] [repeats]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+from timing import best_time
+
+FILENAME = "data/full-data.txt"
+REPEATS = 3
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    repeats = int(args[1]) if len(args) > 1 else REPEATS
+
+    expected = biasbarsdata.read_file(filename)
+    megabytes = os.path.getsize(filename) / 1e6
+    print(f"{os.cpu_count()} CPUs available, {megabytes:.1f} MB file")
+
+    baseline = best_time(lambda: biasbarsdata.read_file(filename), repeats)
+    print(f"read_file          {baseline * 1000:8.1f} ms")
+    for workers in WORKER_COUNTS:
+        assert biasbarsdata.read_file_parallel(filename, workers) == expected
+        seconds = best_time(lambda: biasbarsdata.read_file_parallel(filename, workers), repeats)
+        print(f"{workers} worker(s)        {seconds * 1000:8.1f} ms  speedup {baseline / seconds:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+File: bench_partitions.py
+-------------------------
+Measures the partitioned store (see partitions.py) against counting every file
+into one store, for the given data files:
+    load        loading every partition from its own index file (warm cache),
+                next to reading all of the files into one WordStore
+    lookup      per-word counts of a union, added up at query time, and the
+                same word compared across the partitions
+    search      a substring search over the union's combined search indexes
+    skew        the first top-k skew ranking of the union (which merges the
+                counts once) and the rankings after it (which reuse them)
+
+Run from the top of the repository:
+    python benchmarks/bench_partitions.py [data_file ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+import partitions
+import skew
+from timing import best_time
+
+FILENAMES = ["data/full-data.txt", "data/small-2016.txt", "data/small-handout.txt"]
+NUM_WORDS = 200
+
+
+def main():
+    filenames = sys.argv[1:] or FILENAMES
+    partitions.load_partitions(filenames)       # makes sure every index file is up to date
+
+    load = best_time(lambda: partitions.load_partitions(filenames))
+    combined = best_time(lambda: biasbarsdata.merge_word_data(*(biasbarsdata.read_file(name) for name in filenames)))
+    print(f"{len(filenames)} partitions loaded in {load * 1000:.1f} ms; "
+          f"counting every file into one store takes {combined * 1000:.0f} ms")
+
+    loaded = partitions.load_partitions(filenames)
+    union = loaded.union()
+    words = [word for word, count in union.most_common(NUM_WORDS)]
+    lookup = best_time(lambda: [union[word] for word in words]) / len(words)
+    batch = best_time(lambda: union.lookup(words)) / len(words)
+    compare = best_time(lambda: [loaded.compare(word) for word in words]) / len(words)
+    print(f"union lookup {lookup * 1e6:.1f} us per word ({batch * 1e6:.1f} us batched), "
+          f"compare across partitions {compare * 1e6:.1f} us per word")
+
+    search = best_time(lambda: biasbarsdata.search_words(union, 'smar'))
+    print(f"union search {search * 1000:.2f} ms")
+
+    fresh = partitions.load_partitions(filenames).union()
+    start = time.perf_counter()
+    skew.top_skewed(fresh)
+    first = time.perf_counter() - start
+    again = best_time(lambda: skew.top_skewed(fresh))
+    print(f"union skew ranking {first * 1000:.0f} ms the first time (merging counts), {again * 1000:.0f} ms after")
+
+
+if __name__ == '__main__':
+    main()
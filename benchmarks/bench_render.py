@@ -0,0 +1,81 @@
+"""
+File: bench_render.py
+---------------------
+Measures the frame time of biasbars.plot_word when stepping through many
+words, comparing the item-reusing renderer with a full redraw (erasing the
+canvas before every plot, as plot_word used to). It then measures
+biasbars.plot_words drawing comparison charts of COMPARED_WORDS words at a
+time. Each frame is flushed to the display with update_idletasks so the
+drawing cost is included.
+
+This needs a display. On a headless machine run it under Xvfb:
+    xvfb-run -a python benchmarks/bench_render.py [num_words]
+"""
+
+import os
+import sys
+import time
+import tkinter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbars
+import biasbarsdata
+
+FILENAME = "data/full-data.txt"
+NUM_WORDS = 500
+COMPARED_WORDS = 50
+
+
+def frame_times(top, canvas, word_data, words, redraw):
+    """
+    Plots every word in turn and returns the list of frame times in seconds.
+    When redraw is True the canvas is erased before each plot.
+    """
+    times = []
+    for word in words:
+        start = time.perf_counter()
+        if redraw:
+            biasbars.draw_fixed_content(canvas)
+        biasbars.plot_word(canvas, word_data, word)
+        top.update_idletasks()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    args = sys.argv[1:]
+    num_words = int(args[0]) if args else NUM_WORDS
+
+    try:
+        top = tkinter.Tk()
+    except tkinter.TclError as error:
+        print(f"no display available ({error}); run this under xvfb-run")
+        return
+    canvas = tkinter.Canvas(top, width=biasbars.WINDOW_WIDTH, height=biasbars.WINDOW_HEIGHT)
+    canvas.pack()
+    top.update()
+
+    word_data = biasbarsdata.FrequencyView(biasbarsdata.read_file(FILENAME))
+    words = [word for word, count in word_data.store.most_common(num_words)]
+
+    for name, redraw in (("full redraw", True), ("item reuse", False)):
+        times = sorted(frame_times(top, canvas, word_data, words, redraw))
+        mean = sum(times) / len(times)
+        print(f"{name:12s} mean {mean * 1000:6.2f} ms  p50 {times[len(times) // 2] * 1000:6.2f} ms  "
+              f"p99 {times[int(len(times) * 0.99)] * 1000:6.2f} ms")
+
+    times = []
+    for first in range(0, len(words) - COMPARED_WORDS + 1, COMPARED_WORDS):
+        start = time.perf_counter()
+        biasbars.plot_words(canvas, word_data, words[first:first + COMPARED_WORDS])
+        top.update_idletasks()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f"compare {COMPARED_WORDS:2d}   mean {sum(times) / len(times) * 1000:6.2f} ms  "
+          f"max {times[-1] * 1000:6.2f} ms")
+    top.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+File: bench_review_index.py
+---------------------------
+Measures the inverted index of reviews (see reviewindex.py) on a data file:
+    build       how much longer read_file takes when it also fills the index,
+                and how long index_reviews takes on its own
+    size        the bytes of the delta and varint encoded posting lists, next
+                to the same offsets stored as plain 8 byte integers
+    lookup      how long it takes to find the offsets of the first few reviews
+                behind a bar, and to read those reviews from the data file, for
+                the most common words (long posting lists) and for rare ones
+
+Run from the top of the repository:
+    python benchmarks/bench_review_index.py [data_file] [examples]
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+from reviewindex import ReviewIndex, DEFAULT_EXAMPLES
+from wordstore import GENDERS, NUM_BUCKETS
+from timing import best_time
+
+FILENAME = "data/full-data.txt"
+NUM_WORDS = 200
+
+
+def time_lookups(filename, review_index, words, count):
+    """
+    Returns the mean time, in microseconds, to find the offsets of up to count
+    reviews behind each bar of each word, and to read those reviews.
+    """
+    bars = [(word, gender, index) for word in words for gender in GENDERS for index in range(NUM_BUCKETS)]
+    offsets_time = best_time(lambda: [review_index.offsets(word, gender, index, count)
+                                      for word, gender, index in bars])
+    examples_time = best_time(lambda: [biasbarsdata.example_reviews(filename, review_index, word, gender, index, count)
+                                       for word, gender, index in bars])
+    return offsets_time / len(bars) * 1e6, examples_time / len(bars) * 1e6
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    count = int(args[1]) if len(args) > 1 else DEFAULT_EXAMPLES
+
+    plain = best_time(lambda: biasbarsdata.read_file(filename))
+    indexed = best_time(lambda: biasbarsdata.read_file(filename, review_index=ReviewIndex()))
+    alone = best_time(lambda: biasbarsdata.index_reviews(filename))
+    print(f"read_file {plain * 1000:.0f} ms, with the index {indexed * 1000:.0f} ms "
+          f"(+{(indexed / plain - 1) * 100:.0f}%), index_reviews alone {alone * 1000:.0f} ms")
+
+    word_data = biasbarsdata.read_file(filename)
+    review_index = biasbarsdata.index_reviews(filename)
+    postings = review_index.num_postings()
+    encoded = review_index.nbytes()
+    print(f"{len(review_index)} words, {postings} postings: {encoded / 1024:.0f} KiB encoded "
+          f"({encoded / postings:.2f} bytes each) against {postings * 8 / 1024:.0f} KiB as 8 byte offsets; "
+          f"data file {os.path.getsize(filename) / 1024:.0f} KiB")
+
+    common = [word for word, total in word_data.most_common(NUM_WORDS)]
+    rare = random.Random(0).sample(list(word_data), NUM_WORDS)
+    for name, words in (("common", common), ("random", rare)):
+        offsets_us, examples_us = time_lookups(filename, review_index, words, count)
+        bars = [(word, gender, index) for word in words for gender in GENDERS for index in range(NUM_BUCKETS)]
+        everything_us = best_time(lambda: [review_index.offsets(*bar) for bar in bars]) / len(bars) * 1e6
+        print(f"{name:6s} words: {offsets_us:7.1f} us per bar for {count} offsets, "
+              f"{examples_us:7.1f} us to read them, {everything_us:9.1f} us to decode every offset")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+File: bench_search.py
+---------------------
+Compares search_words answered by the trigram SearchIndex with the original
+linear scan over the whole vocabulary, for a fixed set of query strings.
+
+Run from the top of the repository:
+    python benchmarks/bench_search.py [data_file]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+
+FILENAME = "data/full-data.txt"
+NUM_QUERIES = 500
+SEED = 106
+
+
+def linear_search(word_data, target):
+    """
+    The original search: check every word in the vocabulary.
+    """
+    target = target.lower()
+    return [word for word in word_data if target in word.lower()]
+
+
+def make_queries(words, count):
+    """
+    Returns count query strings of length 1 to 6 cut from random words.
+    """
+    generator = random.Random(SEED)
+    queries = []
+    while len(queries) < count:
+        word = generator.choice(words)
+        length = generator.randint(1, 6)
+        if len(word) >= length:
+            start = generator.randint(0, len(word) - length)
+            queries.append(word[start:start + length])
+    return queries
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if args else FILENAME
+
+    word_data = biasbarsdata.read_file(filename)
+    queries = make_queries(list(word_data), NUM_QUERIES)
+
+    start = time.perf_counter()
+    word_data.search_index()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [linear_search(word_data, query) for query in queries]
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [biasbarsdata.search_words(word_data, query) for query in queries]
+    indexed = time.perf_counter() - start
+    assert found == expected
+
+    print(f"{len(word_data)} words, {len(queries)} queries")
+    print(f"index build        {build * 1000:8.1f} ms")
+    print(f"linear scan        {scan / len(queries) * 1e6:8.1f} us/query")
+    print(f"search index       {indexed / len(queries) * 1e6:8.1f} us/query  ({scan / indexed:.1f}x faster)")
+    for length in (1, 3, 5):
+        subset = [query for query in queries if len(query) == length]
+        start = time.perf_counter()
+        for query in subset:
+            biasbarsdata.search_words(word_data, query)
+        per_query = (time.perf_counter() - start) / len(subset)
+        print(f"  length {length} queries {per_query * 1e6:8.1f} us/query")
+
+
+if __name__ == '__main__':
+    main()
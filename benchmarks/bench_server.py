@@ -0,0 +1,127 @@
+"""
+File: bench_server.py
+---------------------
+Load generator for biasbarsserver.py. Starts the server in its own process,
+opens a number of concurrent keep-alive connections and sends a mix of plot
+(single and batched), search and top-k requests over each, then reports the
+latency percentiles and the overall request rate.
+
+Run from the top of the repository:
+    python benchmarks/bench_server.py [clients] [requests_per_client]
+"""
+
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import biasbarsdata
+
+FILENAME = "data/full-data.txt"
+CLIENTS = 50
+REQUESTS_PER_CLIENT = 100
+BATCH_WORDS = 20
+SEED = 106
+
+
+def free_port():
+    """
+    Returns a TCP port on the local machine that is not in use.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_requests(words, count, generator):
+    """
+    Returns count request targets mixing the server's endpoints.
+    """
+    targets = []
+    for i in range(count):
+        kind = generator.random()
+        if kind < 0.5:
+            targets.append(f"/plot?word={generator.choice(words)}")
+        elif kind < 0.7:
+            targets.append("/plot?" + "&".join(f"word={word}" for word in generator.sample(words, BATCH_WORDS)))
+        elif kind < 0.95:
+            word = generator.choice(words)
+            targets.append(f"/search?target={word[:3]}")
+        else:
+            targets.append("/top?k=10")
+    return targets
+
+
+async def run_client(port, targets, latencies):
+    """
+    Sends every target over one keep-alive connection, recording each latency.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for target in targets:
+        start = time.perf_counter()
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run_load(port, clients, requests_per_client, words):
+    """
+    Runs all the clients at once and returns the latencies and the elapsed time.
+    """
+    generator = random.Random(SEED)
+    latencies = []
+    jobs = [run_client(port, make_requests(words, requests_per_client, generator), latencies) for i in range(clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at the given fraction of the sorted values.
+
+    >>> percentile([4, 1, 3, 2], 0.5)
+    3
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    args = sys.argv[1:]
+    clients = int(args[0]) if len(args) > 0 else CLIENTS
+    requests_per_client = int(args[1]) if len(args) > 1 else REQUESTS_PER_CLIENT
+
+    words = list(biasbarsdata.read_file(os.path.join(ROOT, FILENAME)))
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "biasbarsserver.py", "-port", str(port), FILENAME],
+                              cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()
+        latencies, elapsed = asyncio.run(run_load(port, clients, requests_per_client, words))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{clients} clients x {requests_per_client} requests: {len(latencies) / elapsed:.0f} requests/s")
+    for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)):
+        print(f"{name} {percentile(latencies, fraction) * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+File: bench_sketch.py
+---------------------
+Compares the approximate SketchStore against the exact WordStore on the same
+file, for sketches of several widths. For each width it reports the memory
+used by the sketch table, the time to count the file, how far the estimated
+counts of the heavy hitters are from the exact ones (mean and worst case,
+next to the error bound the sketch promises), and the recall of the sketch's
+heavy hitters against the exact TOP_K most common words.
+
+Run from the top of the repository:
+    python benchmarks/bench_sketch.py [data_file] [depth]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+from sketchstore import SketchStore, DEPTH, CAPACITY
+from wordstore import GENDERS
+
+FILENAME = "data/full-data.txt"
+WIDTHS = [1 << 8, 1 << 10, 1 << 12, 1 << 14, 1 << 16]
+TOP_K = 1000
+
+
+def compare(exact, sketch):
+    """
+    Returns the mean and the largest absolute error over every count of every
+    heavy hitter in the sketch.
+    """
+    errors = []
+    for word in sketch:
+        estimated = sketch[word]
+        counted = exact[word]
+        for gender in GENDERS:
+            errors.extend(abs(a - b) for a, b in zip(estimated[gender], counted[gender]))
+    return sum(errors) / len(errors), max(errors)
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    depth = int(args[1]) if len(args) > 1 else DEPTH
+
+    start = time.perf_counter()
+    exact = biasbarsdata.read_file(filename)
+    exact_seconds = time.perf_counter() - start
+    top_words = {word for word, count in exact.most_common(TOP_K)}
+    print(f"exact: {len(exact)} words, counts {exact.nbytes() / 1024:8.1f} KiB, {exact_seconds * 1000:.0f} ms")
+
+    for width in WIDTHS:
+        sketch = SketchStore(width, depth, CAPACITY)
+        start = time.perf_counter()
+        biasbarsdata.read_file(filename, word_data=sketch)
+        seconds = time.perf_counter() - start
+        mean_error, max_error = compare(exact, sketch)
+        recall = len(top_words.intersection(sketch)) / len(top_words)
+        print(f"width {width:6d} x {depth}: table {sketch.nbytes() / 1024:8.1f} KiB, {seconds * 1000:5.0f} ms, "
+              f"error mean {mean_error:7.2f} max {max_error:5d} bound {sketch.error_bound():5d}, "
+              f"top {TOP_K} recall {recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
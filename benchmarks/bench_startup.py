@@ -0,0 +1,82 @@
+"""
+File: bench_startup.py
+----------------------
+Measures the data loading done by biasbars.main before the window appears,
+with a cold start (no index file, so the data file is parsed and the index is
+written) and a warm start (the index file is memory-mapped). Each start is
+measured with the eager convert_counts_to_frequencies pass and with the lazy
+FrequencyView that main uses, reporting the time and the peak memory
+allocated while loading.
+
+Run from the top of the repository:
+    python benchmarks/bench_startup.py [data_file] [repeats]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbars
+import biasbarsdata
+import indexcache
+
+FILENAME = "data/full-data.txt"
+REPEATS = 5
+
+
+def load_eager(filename):
+    """
+    Loads the word data and converts every count to a frequency up front.
+    """
+    word_data = indexcache.load_word_data(filename)
+    biasbars.convert_counts_to_frequencies(word_data)
+    return word_data
+
+
+def load_lazy(filename):
+    """
+    Loads the word data and wraps it in a FrequencyView, as biasbars.main does.
+    """
+    return biasbarsdata.FrequencyView(indexcache.load_word_data(filename))
+
+
+def time_startup(load, filename, cold):
+    """
+    Returns the seconds taken by load, removing the index file first when cold is True.
+    """
+    if cold and os.path.exists(indexcache.cache_path(filename)):
+        os.remove(indexcache.cache_path(filename))
+    start = time.perf_counter()
+    load(filename)
+    return time.perf_counter() - start
+
+
+def peak_memory(load, filename):
+    """
+    Returns the peak number of bytes allocated during a warm call to load.
+    """
+    indexcache.load_word_data(filename)
+    tracemalloc.start()
+    word_data = load(filename)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    args = sys.argv[1:]
+    filename = args[0] if len(args) > 0 else FILENAME
+    repeats = int(args[1]) if len(args) > 1 else REPEATS
+
+    for name, load in (("eager", load_eager), ("lazy", load_lazy)):
+        cold = min(time_startup(load, filename, True) for i in range(repeats))
+        warm = min(time_startup(load, filename, False) for i in range(repeats))
+        peak = peak_memory(load, filename)
+        print(f"{name:6s} cold {cold * 1000:7.1f} ms  warm {warm * 1000:7.1f} ms  warm peak {peak / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
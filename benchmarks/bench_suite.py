@@ -0,0 +1,285 @@
+"""
+File: bench_suite.py
+--------------------
+A reproducible benchmark of the hot paths, for telling whether a change made
+things faster or slower. It writes a synthetic review corpus with a Zipfian
+vocabulary (a few words are very common and most are rare, as in real
+reviews), then times each stage in a fresh process so that the peak resident
+memory (RSS) of every stage can be recorded on its own:
+
+    read_file                       the batched, memory-mapped ingestion
+    add_data_for_word               the original one word at a time loop into a dict
+    search_words                    building the search index and answering queries
+    convert_counts_to_frequencies   the eager frequency pass
+    plot_word                       drawing charts (skipped without a display)
+
+The results are printed as JSON, and can be saved and later used as a baseline:
+every stage that got slower than the baseline by more than the threshold is
+reported as a regression, and the exit status is then 1.
+
+Run from the top of the repository:
+    python benchmarks/bench_suite.py [-reviews n] [-vocabulary n] [-skew s] [-seed n]
+                                     [-repeats n] [-output file] [-baseline file] [-threshold fraction]
+e.g.
+    python benchmarks/bench_suite.py -output baseline.json
+    python benchmarks/bench_suite.py -baseline baseline.json -threshold 0.1
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import biasbarsdata
+from timing import best_time
+
+OPTIONS = {
+    'reviews': 50000,           # number of reviews in the corpus
+    'vocabulary': 20000,        # number of distinct words in the corpus
+    'skew': 1.1,                # Zipf exponent: how much more common the common words are
+    'seed': 106,
+    'repeats': 5,               # each stage is timed this many times and the fastest is kept
+    'output': None,             # file to write the JSON results to, as well as printing them
+    'baseline': None,           # JSON results to compare against
+    'threshold': 0.1,           # how much slower than the baseline a stage may get
+}
+RATINGS = [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0]
+RATING_WEIGHTS = [9, 3, 4, 3, 5, 4, 9, 8, 25]
+MIN_REVIEW_WORDS = 5
+MAX_REVIEW_WORDS = 40
+NUM_QUERIES = 200
+NUM_PLOTS = 200
+
+
+def make_vocabulary(size, generator):
+    """
+    Returns size distinct made-up lowercase words.
+    """
+    words = set()
+    while len(words) < size:
+        length = generator.randint(2, 10)
+        words.add(''.join(generator.choice(string.ascii_lowercase) for i in range(length)))
+    return sorted(words)
+
+
+def write_corpus(filename, reviews, vocabulary, skew, seed):
+    """
+    Writes a review file in the format of data/full-data.txt with the given
+    number of reviews, drawing their words from a vocabulary of the given size
+    in which the word of rank r has a weight of 1 / r ** skew.
+    """
+    generator = random.Random(seed)
+    words = make_vocabulary(vocabulary, generator)
+    cum_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, len(words) + 1)))
+    with open(filename, 'w') as file:
+        file.write("Rating,Professor Gender,Comment Text\n")
+        for rating in generator.choices(RATINGS, RATING_WEIGHTS, k=reviews):
+            length = generator.randint(MIN_REVIEW_WORDS, MAX_REVIEW_WORDS)
+            comment = ' '.join(generator.choices(words, cum_weights=cum_weights, k=length))
+            file.write(f"{rating},{generator.choice('WM')},{comment}\n")
+
+
+def stage_read_file(filename, repeats):
+    """
+    Times biasbarsdata.read_file.
+    """
+    seconds = best_time(lambda: biasbarsdata.read_file(filename), repeats)
+    return {'seconds': seconds, 'mb_per_second': os.path.getsize(filename) / seconds / 1e6}
+
+
+def stage_add_data_for_word(filename, repeats):
+    """
+    Times the original loop that reads one line and adds one word at a time to a dict.
+    """
+    def load():
+        word_data = {}
+        with open(filename) as file:
+            next(file)
+            for line in file:
+                rating, gender, comment = line.rstrip('\n').split(',', 2)
+                rating = float(rating)
+                for word in comment.split():
+                    biasbarsdata.add_data_for_word(word_data, word, gender, rating)
+        return word_data
+
+    seconds = best_time(load, repeats)
+    return {'seconds': seconds, 'mb_per_second': os.path.getsize(filename) / seconds / 1e6}
+
+
+def stage_search_words(filename, repeats):
+    """
+    Times building the search index of a loaded store and then answering
+    NUM_QUERIES substring searches for pieces of its words.
+    """
+    generator = random.Random(0)
+    words = list(biasbarsdata.read_file(filename))
+    queries = []
+    for word in generator.sample(words, NUM_QUERIES):
+        start = generator.randrange(len(word))
+        queries.append(word[start:start + 3])
+
+    def search():
+        word_data = biasbarsdata.read_file(filename)
+        start = time.perf_counter()
+        for query in queries:
+            biasbarsdata.search_words(word_data, query)
+        return time.perf_counter() - start
+
+    seconds = min(search() for i in range(repeats))
+    return {'seconds': seconds, 'queries_per_second': NUM_QUERIES / seconds}
+
+
+def stage_convert_counts_to_frequencies(filename, repeats):
+    """
+    Times the eager frequency pass over a freshly loaded store.
+    """
+    import biasbars
+
+    def convert():
+        word_data = biasbarsdata.read_file(filename)
+        start = time.perf_counter()
+        biasbars.convert_counts_to_frequencies(word_data)
+        return time.perf_counter() - start
+
+    return {'seconds': min(convert() for i in range(repeats))}
+
+
+def stage_plot_word(filename, repeats):
+    """
+    Times plotting the NUM_PLOTS most common words, drawing each to the display.
+    """
+    import tkinter
+    import biasbars
+
+    try:
+        top = tkinter.Tk()
+    except tkinter.TclError:
+        return {'skipped': "no display"}
+    canvas = tkinter.Canvas(top, width=biasbars.WINDOW_WIDTH, height=biasbars.WINDOW_HEIGHT)
+    canvas.pack()
+    top.update()
+    word_data = biasbarsdata.FrequencyView(biasbarsdata.read_file(filename))
+    words = [word for word, count in word_data.store.most_common(NUM_PLOTS)]
+
+    def plot():
+        for word in words:
+            biasbars.plot_word(canvas, word_data, word)
+            top.update_idletasks()
+
+    seconds = best_time(plot, repeats)
+    top.destroy()
+    return {'seconds': seconds, 'plots_per_second': len(words) / seconds}
+
+
+STAGES = {
+    'read_file': stage_read_file,
+    'add_data_for_word': stage_add_data_for_word,
+    'search_words': stage_search_words,
+    'convert_counts_to_frequencies': stage_convert_counts_to_frequencies,
+    'plot_word': stage_plot_word,
+}
+
+
+def run_stage(name, filename, repeats):
+    """
+    Runs one stage and adds the peak RSS of the process running it, in KiB,
+    to its result. Meant to be run in a fresh process.
+    """
+    result = STAGES[name](filename, repeats)
+    result['peak_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of (stage, baseline seconds, seconds, ratio, regressed)
+    tuples for every stage timed in both results.
+
+    >>> compare({'a': {'seconds': 1.2}, 'b': {'seconds': 1.0}, 'c': {'skipped': 'no display'}},
+    ...         {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0}, 'c': {'seconds': 1.0}}, 0.1)
+    [('a', 1.0, 1.2, 1.2, True), ('b', 1.0, 1.0, 1.0, False)]
+    """
+    rows = []
+    for name, result in results.items():
+        if 'seconds' in result and 'seconds' in baseline.get(name, {}):
+            before = baseline[name]['seconds']
+            ratio = result['seconds'] / before
+            rows.append((name, before, result['seconds'], round(ratio, 3), ratio > 1 + threshold))
+    return rows
+
+
+def parse_options(args):
+    """
+    Returns the OPTIONS updated with the -name value pairs in args.
+
+    >>> parse_options(['-reviews', '1000', '-baseline', 'base.json'])['reviews']
+    1000
+    """
+    options = dict(OPTIONS)
+    for flag, value in zip(args[::2], args[1::2]):
+        name = flag.lstrip('-')
+        if name not in options:
+            raise SystemExit(f"unknown option {flag}")
+        default = OPTIONS[name]
+        options[name] = type(default)(value) if default is not None else value
+    return options
+
+
+def main():
+    options = parse_options(sys.argv[1:])
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'corpus.txt')
+        write_corpus(filename, options['reviews'], options['vocabulary'], options['skew'], options['seed'])
+
+        # each stage gets its own process, so its peak RSS is not hidden by an earlier stage's
+        results = {}
+        context = multiprocessing.get_context('spawn')
+        for name in STAGES:
+            with context.Pool(1) as pool:
+                results[name] = pool.apply(run_stage, (name, filename, options['repeats']))
+        corpus_bytes = os.path.getsize(filename)
+    finally:
+        shutil.rmtree(directory)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'corpus': {name: options[name] for name in ('reviews', 'vocabulary', 'skew', 'seed')},
+        'corpus_bytes': corpus_bytes,
+        'repeats': options['repeats'],
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if options['output']:
+        with open(options['output'], 'w') as file:
+            file.write(text + '\n')
+
+    if options['baseline']:
+        with open(options['baseline']) as file:
+            baseline = json.load(file)
+        if baseline.get('corpus') != report['corpus']:
+            print("warning: the baseline was measured on a different corpus", file=sys.stderr)
+        rows = compare(results, baseline['results'], options['threshold'])
+        regressed = [row for row in rows if row[4]]
+        for name, before, after, ratio, slower in rows:
+            print(f"{name:30s} {before * 1000:9.1f} ms -> {after * 1000:9.1f} ms  x{ratio:.2f}"
+                  f"{'  REGRESSION' if slower else ''}", file=sys.stderr)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
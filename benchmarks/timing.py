@@ -0,0 +1,28 @@
+"""
+File: timing.py
+---------------
+The timing helper shared by the benchmarks in this directory. Each benchmark
+is run as a script from the top of the repository, so this directory is on
+the module search path and the helper is imported as
+
+    from timing import best_time
+"""
+
+import time
+
+REPEATS = 5
+
+
+def best_time(function, repeats=REPEATS):
+    """
+    Returns the fastest of repeats timed calls to function, in seconds.
+
+    >>> best_time(lambda: None, 3) >= 0
+    True
+    """
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
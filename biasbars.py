@@ -9,152 +9,40 @@ visualize gender-based disparities in how students review their professors.
 import tkinter
 import biasbarsdata
 import biasbarsgui as gui
+import confidence
+import indexcache
+import instrument
+import partitions
+import skew
+import barchart
+from barchart import (WINDOW_WIDTH, WINDOW_HEIGHT, VERTICAL_MARGIN, LEFT_MARGIN, RIGHT_MARGIN, LABELS, LABEL_OFFSET,
+                      BAR_WIDTH, BAR_FILL, LINE_WIDTH, TEXT_DX, TEXT_DY, NUM_VERTICAL_DIVISIONS, TICK_WIDTH, COLORS,
+                      HEATMAP_COLORS, MIN_CELL_TEXT_HEIGHT, MIN_PARTITION_SHADE, LEGEND_SWATCH, ERROR_CAP_FRACTION,
+                      get_centered_x_coordinate, get_bar_width, get_labels, blend, draw_fixed_content,
+                      create_chart_items, plot_word, plot_words, plot_word_partitions)
+from reviewindex import ReviewIndex
 
 
-# Provided constants to load and plot the word frequency data
-WINDOW_WIDTH = 1000
-WINDOW_HEIGHT = 600
-
 FILENAME = "data/full-data.txt"
 
-VERTICAL_MARGIN = 30
-LEFT_MARGIN = 60
-RIGHT_MARGIN = 30
-LABELS = ["Low Reviews", "Medium Reviews", "High Reviews"]
-LABEL_OFFSET = 10
-BAR_WIDTH = 75
-LINE_WIDTH = 2
-TEXT_DX = 10
-TEXT_DY = 10
-NUM_VERTICAL_DIVISIONS = 7
-TICK_WIDTH = 15
-
-
-def get_centered_x_coordinate(width, idx):
-    """
-    Given the width of the canvas and the index of the current review
-    quality bucket to plot, returns the x coordinate of the centered
-    location for the bars and label to be plotted relative to.
-
-    Input:
-        width (int): The width of the canvas
-        year_index (int): The index of the current label in the LABELS list
-    Returns:
-        x_coordinate (float): The centered x coordinate of the horizontal line 
-                              associated with the specified label.
-    >>> round(get_centered_x_coordinate(1000, 0), 1)
-    211.7
-    >>> round(get_centered_x_coordinate(1000, 1), 1)
-    515.0
-    >>> round(get_centered_x_coordinate(1000, 2), 1)
-    818.3
-    """
-    # the plotting area is divided into six parts: two smaller areas make up 2/6, and two larger areas make up 4/6
-    fraction = (width - (LEFT_MARGIN + RIGHT_MARGIN)) / 6
-
-    # the index determines how many proportional parts are added to the LEFT_MARGIN to get the x_coordinate
-    if idx == 0:
-        x_coordinate = LEFT_MARGIN + fraction
-    elif idx == 1:
-        x_coordinate = LEFT_MARGIN + (3 * fraction)
-    else:
-        x_coordinate = LEFT_MARGIN + (5 * fraction)
+NUM_SKEWED_WORDS = 8
 
-    return x_coordinate
+# the charts are laid out in barchart.py, which needs no display; the examples
+# of the layout functions that have always been part of this file still run here
+__test__ = {'get_centered_x_coordinate': barchart.get_centered_x_coordinate}
 
 
-def draw_fixed_content(canvas):
+@instrument.timed
+def describe_skewed_words(word_data, bucket):
     """
-    Erases all existing information on the given canvas and then
-    draws the fixed background border and x-axis labels on it.
-
-    Input:
-        canvas (tkinter Canvas): The canvas on which we are drawing.
+    Returns the text shown in the GUI's skewed words panel: the words most
+    skewed towards each gender in the given rating bucket (or in all buckets
+    when bucket is None).
     """
-    canvas.delete('all')            # delete all existing content from the canvas
-    width = canvas.winfo_width()    # get the width of the canvas
-    height = canvas.winfo_height()  # get the height of the canvas
-
-    # creates a rectangle that will serve as the plotting area
-    canvas.create_rectangle(LEFT_MARGIN, VERTICAL_MARGIN, width - RIGHT_MARGIN, height - VERTICAL_MARGIN, width=LINE_WIDTH)
-
-    # creates evenly spaced labels for low, medium, and high reviews
-    for i in range(len(LABELS)):
-        x = get_centered_x_coordinate(width, i)
-        y = height - VERTICAL_MARGIN + LABEL_OFFSET
-        canvas.create_text(x, y, text=LABELS[i], anchor=tkinter.N)
-
-
-def plot_word(canvas, word_data, word):
-    """
-    Given a dictionary of word frequency data and a single word, plots
-    the distribution of the frequency of this word across gender and 
-    rating category.
-
-    Input:
-        canvas (tkinter Canvas): The canvas on which we are drawing.
-        word_data (dictionary): Dictionary holding word frequency data
-        word (str): The word whose frequency distribution you want to plot
-    """
-    draw_fixed_content(canvas)
-    width = canvas.winfo_width()
-    height = canvas.winfo_height()
-
-    # We have provided code to calculate the maximum frequency for the specified
-    # word from the provided dict 
-    gender_data = word_data[word]
-    max_frequency = max(max(gender_data[biasbarsdata.KEY_WOMEN]), max(gender_data[biasbarsdata.KEY_MEN]))
-
-    label_list = get_labels(max_frequency)
-    tick_offset = TICK_WIDTH / 2
-    start = height - VERTICAL_MARGIN
-    increment = (height - (2 * VERTICAL_MARGIN)) / NUM_VERTICAL_DIVISIONS
-    frequency_to_pixels = (height - (2 * VERTICAL_MARGIN)) / max_frequency
-
-    # creates ticks and labels for the frequencies along the y-axis
-    for i in range(NUM_VERTICAL_DIVISIONS):
-        y = start - (i * increment)
-        canvas.create_line(LEFT_MARGIN - tick_offset, y, LEFT_MARGIN + tick_offset, y, width=LINE_WIDTH)
-        canvas.create_text(LEFT_MARGIN - LABEL_OFFSET, y, text=int(label_list[i]), anchor=tkinter.E)
-
-    canvas.create_line(LEFT_MARGIN - tick_offset, VERTICAL_MARGIN, LEFT_MARGIN + tick_offset, VERTICAL_MARGIN,width=LINE_WIDTH)
-    canvas.create_text(LEFT_MARGIN - LABEL_OFFSET, VERTICAL_MARGIN, text=int(max_frequency), anchor=tkinter.E)
-
-    # creates bars for the graph as well as a label for men and women
-    # frequencies are converted to pixels using frequency_to_pixels conversion factor
-    for i in range(3):
-        x_coordinate = get_centered_x_coordinate(width, i)
-        canvas.create_rectangle(x_coordinate - BAR_WIDTH,
-                                start - (word_data[word][biasbarsdata.KEY_WOMEN][i] * frequency_to_pixels),
-                                x_coordinate, start, fill='dodgerblue')
-        if word_data[word][biasbarsdata.KEY_WOMEN][i] > 0:
-            canvas.create_text(x_coordinate - BAR_WIDTH + TEXT_DX,
-                                start - (word_data[word][biasbarsdata.KEY_WOMEN][i] * frequency_to_pixels) + TEXT_DY,
-                                text=biasbarsdata.KEY_WOMEN)
-        canvas.create_rectangle(x_coordinate,
-                                start - (word_data[word][biasbarsdata.KEY_MEN][i] * frequency_to_pixels),
-                                x_coordinate + BAR_WIDTH, start, fill='orange')
-        if word_data[word][biasbarsdata.KEY_MEN][i] > 0:
-            canvas.create_text(x_coordinate + TEXT_DX,
-                                start - (word_data[word][biasbarsdata.KEY_MEN][i] * frequency_to_pixels) + TEXT_DY,
-                                text=biasbarsdata.KEY_MEN)
-
-
-def get_labels(max_frequency):
-    """
-    Input: max_frequency value
-    Output: a list of labels for the frequency
-    """
-    label_list = []
-    label = 0
-    label_increment = max_frequency // NUM_VERTICAL_DIVISIONS
-    for i in range(NUM_VERTICAL_DIVISIONS):
-        label_list.append(label)
-        label += label_increment
-
-    return label_list
+    return skew.format_ranking(skew.top_skewed(word_data, NUM_SKEWED_WORDS, bucket))
 
 
+@instrument.timed
 def convert_counts_to_frequencies(word_data):
     """
     This code is provided to you! 
@@ -163,8 +51,17 @@ def convert_counts_to_frequencies(word_data):
     of word counts into a dictionary of word frequencies by 
     dividing each count for a given gender by the total number 
     of words found in reviews about professors of that gender.
+
+    main() no longer needs this, since a biasbarsdata.FrequencyView works
+    out the same frequencies for each word only when it is plotted.
     """ 
     K = 1000000
+    if isinstance(word_data, biasbarsdata.WordStore):
+        totals = word_data.totals()
+        word_data.scale({biasbarsdata.KEY_MEN: K / totals[biasbarsdata.KEY_MEN],
+                         biasbarsdata.KEY_WOMEN: K / totals[biasbarsdata.KEY_WOMEN]})
+        return
+
     total_words_men = sum([sum(counts[biasbarsdata.KEY_MEN]) for word, counts in word_data.items()])
     total_words_women = sum([sum(counts[biasbarsdata.KEY_WOMEN]) for word, counts in word_data.items()])
     for word in word_data:
@@ -177,25 +74,149 @@ def convert_counts_to_frequencies(word_data):
 # main() code is provided for you
 def main():
     import sys
-    args = sys.argv[1:]
+    import time
+    start = time.perf_counter()
+    args = instrument.take_flag(sys.argv[1:])
+    # -timing prints how long the window, the load and the first plot took
+    timing = '-timing' in args
+    if timing:
+        args.remove('-timing')
+    # -ngrams n counts phrases of n words instead of single words
+    n = 1
+    if '-ngrams' in args:
+        position = args.index('-ngrams')
+        n = int(args[position + 1])
+        del args[position:position + 2]
+    # -buckets scheme cuts the ratings into other buckets: 3, 5 or a list of edges such as 2,3.5,4.5
+    scheme = None
+    if '-buckets' in args:
+        position = args.index('-buckets')
+        scheme = biasbarsdata.BucketScheme.parse(args[position + 1])
+        del args[position:position + 2]
+    # -partitions file,file,... loads each data file as its own partition and overlays them in plots
+    partition_files = None
+    if '-partitions' in args:
+        position = args.index('-partitions')
+        partition_files = args[position + 1].split(',')
+        del args[position:position + 2]
+    # -intervals method picks how the error bars are worked out (analytic or bootstrap), or turns them off
+    interval_method = confidence.ANALYTIC
+    if '-intervals' in args:
+        position = args.index('-intervals')
+        try:
+            interval_method = confidence.parse_method(args[position + 1])
+        except ValueError as error:
+            print(error)
+            return
+        del args[position:position + 2]
     global WINDOW_WIDTH
     global WINDOW_HEIGHT
     if len(args) == 2:
         WINDOW_WIDTH = int(args[0])
         WINDOW_HEIGHT = int(args[1])
 
-    # Load data
-    word_data = biasbarsdata.read_file(FILENAME)
-    convert_counts_to_frequencies(word_data)
+    # The window is made before any data is loaded. The data is then loaded in the background,
+    # reusing the compiled index from an earlier run when the file is unchanged. Until loading
+    # finishes, plots and searches use the words counted so far. Frequencies are worked out
+    # from the counts only for the words that get plotted.
+    word_data = biasbarsdata.FrequencyView(biasbarsdata.WordStore())
+
+    def report(event):
+        if timing:
+            print(f"{event}: {(time.perf_counter() - start) * 1000:.0f} ms", flush=True)
+
+    plotted = []
+    # holds the PartitionedStore once it has loaded, when -partitions is given
+    loaded_partitions = []
+    # holds the WordConfidence giving the error bars once the reviews have been counted
+    word_confidence = []
+
+    def plot_and_report(canvas, word_data, word):
+        if loaded_partitions:
+            plot_word_partitions(canvas, loaded_partitions[0], word, scheme=scheme)
+        else:
+            intervals = word_confidence[0].intervals(word, scheme) if word_confidence else None
+            plot_word(canvas, word_data, word, scheme, intervals)
+        if timing and not plotted:
+            plotted.append(word)
+            canvas.update_idletasks()
+            report("first plot")
+
+    def plot_many(canvas, word_data, words):
+        plot_words(canvas, word_data, words, scheme)
 
     # Make window
     top = tkinter.Tk()
-    top.wm_title('Bias Bars')
-    canvas = gui.make_gui(top, WINDOW_WIDTH, WINDOW_HEIGHT, word_data, plot_word, biasbarsdata.search_words)
+    top.wm_title('Bias Bars (loading)')
+
+    # the reviews behind each word are indexed once the counts are in use, so example reviews can be shown
+    review_index = ReviewIndex()
+    indexed = []
+
+    def show_examples(word):
+        if not indexed:
+            return None
+        return biasbarsdata.format_examples(FILENAME, review_index, word)
+
+    canvas = gui.make_gui(top, WINDOW_WIDTH, WINDOW_HEIGHT, word_data, plot_and_report, biasbarsdata.search_words,
+                          describe_skewed_words, plot_many, show_examples if partition_files is None else None)
 
     # draw_fixed once at startup so we have the borders and labels
     # even before the user types anything.
-    draw_fixed_content(canvas)
+    draw_fixed_content(canvas, LABELS if scheme is None else scheme.labels)
+    top.update_idletasks()
+    report("first window")
+
+    def load(progress):
+        if partition_files is not None:
+            # each file is its own partition with its own index file, and searches and rankings use their union
+            loaded = partitions.load_partitions(partition_files, progress)
+            loaded.union().search_index()
+            return loaded
+        if n > 1:
+            # phrases are not kept in the index cache, so they are always counted from the data file
+            loaded = biasbarsdata.read_file(FILENAME, word_data=word_data.store, progress=progress,
+                                            n=n, max_words=biasbarsdata.MAX_NGRAMS)
+        else:
+            loaded = indexcache.load_word_data(FILENAME, word_data.store, progress)
+        # builds the search index here rather than on the Tk thread at the first search
+        loaded.search_index()
+        return loaded
+
+    def show_progress(done, total):
+        top.wm_title(f'Bias Bars (loading {done * 100 // max(total, 1)}%)')
+
+    def finish(loaded):
+        if partition_files is not None:
+            loaded_partitions.append(loaded)
+            loaded = loaded.union()
+        word_data.store = loaded
+        top.wm_title('Bias Bars')
+        report("data loaded")
+        if partition_files is None:
+            # the reviews are indexed, and counted for the error bars, by more passes once the store is in use;
+            # these send no DATA_LOADED_EVENT, as the searches and rankings do not change, and the example
+            # reviews and error bars are only used once their own pass has finished
+            gui.BackgroundLoader(top, lambda progress: index(loaded), lambda done, total: None, finish_index,
+                                 None).start()
+            if interval_method is not None:
+                gui.BackgroundLoader(top, lambda progress: count_reviews(loaded), lambda done, total: None,
+                                     word_confidence.append, None).start()
+
+    def index(loaded):
+        # only the phrases the store kept after pruning get postings (single words are never pruned)
+        biasbarsdata.index_reviews(FILENAME, review_index, n, loaded if n > 1 else None)
+
+    def finish_index(result):
+        indexed.append(True)
+        report("reviews indexed")
+
+    def count_reviews(loaded):
+        # the review-level counts are kept only for the words the (possibly pruned) store kept
+        review_counts = confidence.collect_review_counts(FILENAME, n=n, vocabulary=loaded)
+        return confidence.WordConfidence(review_counts, interval_method)
+
+    gui.BackgroundLoader(top, load, show_progress, finish).start()
 
     # This needs to be called just once
     top.mainloop()
@@ -7,8 +7,32 @@ The results of this data can be searched with the search_words() function and wi
 biasbars.py
 """
 
-KEY_WOMEN = "W"
-KEY_MEN = "M"
+import math
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+import reviewreader
+import skew
+from reviewindex import ReviewIndex, DEFAULT_EXAMPLES
+from sketchstore import SketchStore
+from wordstore import WordStore, FrequencyView, StoreUnion, BucketScheme, THREE_BUCKETS, KEY_WOMEN, KEY_MEN
+
+# the approximate number of bytes of reviews read_file counts per batch
+CHUNK_SIZE = 1 << 18
+
+# the most distinct phrases counted at once when counting phrases of more than one word
+MAX_NGRAMS = 1 << 20
+# the smallest total count a phrase needs to survive the first pruning of a full store
+PRUNE_MIN_COUNT = 2
+
+# the names of the rating buckets, in bucket index order
+BUCKET_LABELS = ["Low Reviews", "Medium Reviews", "High Reviews"]
+
+# the number of seconds follow_file waits before checking a file for new reviews
+FOLLOW_INTERVAL = 1.0
 
 
 def convert_rating_to_index(rating):
@@ -38,10 +62,16 @@ def convert_rating_to_index(rating):
     2
     >>> convert_rating_to_index(5.5)
     2
+
+    A rating of exactly 2.5 is medium, as the handout says. (It used to fall
+    through to the high bucket, so charts counted before that fix differ.)
+
+    >>> convert_rating_to_index(2.0), convert_rating_to_index(2.5)
+    (0, 1)
     """
     if rating < 2.5:
         index = 0
-    elif 2.5 < rating <= 3.5:
+    elif 2.5 <= rating <= 3.5:
         index = 1
     else:
         index = 2
@@ -49,6 +79,20 @@ def convert_rating_to_index(rating):
     return index
 
 
+def convert_gender_to_key(gender):
+    """
+    Returns the gender key a review is counted under: KEY_WOMEN for a gender
+    starting with W (in either case), and KEY_MEN for anything else, as
+    rating_stats.py has always counted them.
+
+    >>> convert_gender_to_key('W'), convert_gender_to_key('w'), convert_gender_to_key('M')
+    ('W', 'W', 'M')
+    >>> convert_gender_to_key('X'), convert_gender_to_key('')
+    ('M', 'M')
+    """
+    return KEY_WOMEN if gender[0:1] in ('W', 'w') else KEY_MEN
+
+
 def add_data_for_word(word_data, word, gender, rating):
     """
     Updates the word_data dictionary to log an occurence of the
@@ -76,7 +120,15 @@ def add_data_for_word(word_data, word, gender, rating):
     >>> add_data_for_word(word_data, "bad", "M", 1.5)
     >>> word_data
     {'good': {'W': [0, 1, 1], 'M': [0, 0, 1]}, 'bad': {'W': [0, 0, 0], 'M': [1, 0, 0]}}
+    >>> store = WordStore()
+    >>> add_data_for_word(store, "good", "W", 4.5)
+    >>> store
+    {'good': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
     """
+    if isinstance(word_data, WordStore):
+        word_data.add(word, gender, convert_rating_to_index(rating), rating=rating)
+        return
+
     default_dict = {
         KEY_WOMEN: [0, 0, 0],
         KEY_MEN: [0, 0, 0]
@@ -91,14 +143,158 @@ def add_data_for_word(word_data, word, gender, rating):
         word_data[word][gender][index] += 1
 
 
-def read_file(filename):
+def convert_ratings_to_indices(ratings):
+    """
+    Converts a whole batch of ratings into their bucket indices at once.
+    The ratings are given as the strings found in the data file, and since a
+    data file only ever contains a handful of distinct ratings, each distinct
+    rating is converted just once.
+
+    Input:
+        ratings (List[str]): the rating strings for a batch of reviews
+
+    Output:
+        indices (List[int]): the bucket index of each rating, in order
+
+    >>> convert_ratings_to_indices(['1.0', '2.5', '3.0', '5.0', '3.0'])
+    [0, 1, 1, 2, 1]
+    """
+    cache = {}
+    indices = []
+    for rating in ratings:
+        index = cache.get(rating)
+        if index is None:
+            index = convert_rating_to_index(float(rating))
+            cache[rating] = index
+        indices.append(index)
+    return indices
+
+
+def add_reviews(word_data, lines):
+    """
+    Adds a batch of review lines from a data file to the given WordStore.
+    The ratings and genders of the whole batch are parsed first, and the
+    words are then counted in bulk by add_review_words.
+
+    Input:
+        word_data (WordStore): the store to add the counts to
+        lines (List[str]): review lines, without the header line
+
+    >>> store = WordStore()
+    >>> add_reviews(store, ['3.0,M,average average\\n', '5.0,W,best average\\n'])
+    >>> store
+    {'average': {'W': [0, 0, 1], 'M': [0, 2, 0]}, 'best': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
+    """
+    commas = [line.find(',') for line in lines]
+    add_review_words(word_data, [(line[comma+1:comma+2], float(line[0:comma]), line[comma+3:].split())
+                                 for line, comma in zip(lines, commas)])
+
+
+def add_review_words(word_data, reviews):
+    """
+    Adds a batch of already parsed reviews to the given WordStore. The words
+    are grouped by gender and rating, and each group is then counted in bulk
+    (into its bucket and the histograms of ratings) rather than logging one
+    word at a time.
+
+    Input:
+        word_data (WordStore): the store to add the counts to
+        reviews (List[Tuple[str, float, List[str]]]): the gender, rating and
+                                                      list of words of each review
+
+    >>> store = WordStore()
+    >>> add_review_words(store, [('M', 3.0, ['average', 'average']), ('W', 5.0, ['best', 'average'])])
+    >>> store
+    {'average': {'W': [0, 0, 1], 'M': [0, 2, 0]}, 'best': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
+    >>> store.histogram('average', 'M')
+    [0, 0, 0, 0, 0, 0, 2, 0, 0, 0, 0]
+    """
+    # groups the words of every review by the gender and rating they are counted under
+    groups = {}
+    all_words = []
+    for gender, rating, words in reviews:
+        key = (gender, rating)
+        if key in groups:
+            groups[key].extend(words)
+        else:
+            groups[key] = list(words)
+        all_words.extend(words)
+
+    # words are given their rows in the order they first appear so the store matches a line by line read,
+    # and are only published to readers once their counts are in
+    word_data.add_words(dict.fromkeys(all_words), publish=False)
+    for (gender, rating), words in groups.items():
+        word_data.add_counts(gender, convert_rating_to_index(rating), Counter(words), rating)
+    word_data.publish_words()
+
+
+def word_ngrams(words, n):
+    """
+    Returns the runs of n consecutive words in the list of words, each joined
+    by a single space, so a phrase can be counted just like a word.
+
+    >>> word_ngrams(['not', 'very', 'helpful'], 2)
+    ['not very', 'very helpful']
+    >>> word_ngrams(['great'], 1)
+    ['great']
+    """
+    if n == 1:
+        return words
+    return [' '.join(words[i:i + n]) for i in range(len(words) - n + 1)]
+
+
+def prune_words(word_data, max_words, min_count=PRUNE_MIN_COUNT):
+    """
+    Prunes the rarest words from word_data until it holds at most half of
+    max_words, leaving room to count more before the next pruning. Words
+    counted fewer than min_count times are removed, and min_count is doubled
+    until enough words are gone. Returns the min_count to use next time.
+
+    >>> store = WordStore()
+    >>> store.merge({'good': {'W': [5, 0, 0], 'M': [0, 0, 0]}, 'fine': {'W': [0, 0, 0], 'M': [0, 3, 0]},
+    ...              'bad': {'W': [0, 0, 0], 'M': [1, 0, 0]}})
+    >>> prune_words(store, 4)
+    2
+    >>> list(store)
+    ['good', 'fine']
+    >>> prune_words(store, 2)
+    4
+    >>> list(store), store.error_bound()
+    (['good'], 4)
+    """
+    while len(word_data) > max_words // 2:
+        instrument.count('words pruned', word_data.prune(min_count))
+        if len(word_data) > max_words // 2:
+            min_count *= 2
+    return min_count
+
+
+@instrument.timed
+def read_file(filename, chunk_size=CHUNK_SIZE, word_data=None, progress=None, n=1, max_words=None,
+              approximate=False, review_index=None):
     """
     Reads the information from the specified file and builds a new 
-    word_data dictionary with the data found in the file. Returns the
-    newly created dictionary. 
+    word_data WordStore with the data found in the file. Returns the
+    newly created store, which can be used just like a word_data dictionary.
+    The file is memory-mapped and its reviews are counted in batches of
+    roughly chunk_size bytes.
+
+    When word_data is given the counts are added to that store instead, and
+    another thread may read from it while it fills up. progress, n, max_words
+    and review_index are passed on to read_range. When approximate is True the
+    counts go into a new SketchStore, which uses a fixed amount of memory
+    however large the file is, but only keeps its most common words and
+    estimates their counts (see sketchstore.py).
 
     Input:
         filename (str): name of the file holding professor review data
+        chunk_size (int): the approximate number of bytes to read per batch
+        word_data (WordStore): the store to add the counts to, or None for a new one
+        progress (function): called after each batch as progress(bytes_read, bytes_total)
+        n (int): the number of words in each phrase counted
+        max_words (int): the most distinct words (or phrases) to keep, or None for no limit
+        approximate (bool): whether to count into a SketchStore rather than a WordStore
+        review_index (ReviewIndex): an index to record the reviews each word is in, or None
 
     >>> read_file('data/small-one.txt')
     {'okay': {'W': [0, 0, 0], 'M': [0, 1, 0]}, 'best': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
@@ -106,46 +302,421 @@ def read_file(filename):
     {'awesome': {'W': [0, 0, 2], 'M': [0, 0, 1]}, 'teacher': {'W': [0, 0, 1], 'M': [0, 0, 1]}, 'class': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
     >>> read_file('data/small-three.txt')
     {'average': {'W': [0, 0, 0], 'M': [1, 3, 0]}, 'best': {'W': [0, 0, 3], 'M': [1, 0, 0]}, 'not': {'W': [0, 0, 0], 'M': [2, 0, 0]}}
+    >>> read_file('data/small-three.txt', chunk_size=1) == read_file('data/small-three.txt')
+    True
+    >>> read_file('data/small-two.txt', n=2)
+    {'awesome teacher': {'W': [0, 0, 1], 'M': [0, 0, 1]}, 'awesome class': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
+    >>> read_file('data/small-two.txt', approximate=True) == read_file('data/small-two.txt')
+    True
+    >>> review_index = ReviewIndex()
+    >>> word_data = read_file('data/small-three.txt', review_index=review_index)
+    >>> review_index.offsets('average', 'M', 1), review_index.offsets('average', 'M', 0)
+    ([43], [94])
+
+    The totals stay right when another thread reads them while the file is
+    read, even part way through a batch.
+
+    >>> import sys, threading
+    >>> interval = sys.getswitchinterval()
+    >>> sys.setswitchinterval(1e-5)
+    >>> right = []
+    >>> for trial in range(3):
+    ...     word_data = WordStore()
+    ...     loader = threading.Thread(target=read_file, args=('data/full-data.txt', 1 << 14, word_data))
+    ...     loader.start()
+    ...     while not len(word_data) and loader.is_alive():
+    ...         pass
+    ...     totals = word_data.totals()
+    ...     loader.join()
+    ...     right.append(word_data.totals() == {gender: sum(sum(word_data[word][gender]) for word in word_data)
+    ...                                         for gender in 'WM'})
+    >>> sys.setswitchinterval(interval)
+    >>> right
+    [True, True, True]
+    """
+    if word_data is None:
+        word_data = SketchStore() if approximate else WordStore()
+    start, end = shard_file(filename, 1)[0]
+    read_range(word_data, filename, start, end, chunk_size, progress, n, max_words, review_index)
+    return word_data
+
+
+@instrument.timed
+def read_range(word_data, filename, start, end, chunk_size=CHUNK_SIZE, progress=None, n=1, max_words=None,
+               review_index=None):
+    """
+    Adds the reviews found between the byte offsets start and end of the
+    given file to word_data. Both offsets must fall on the start of a line
+    (or the end of the file), as the ranges returned by shard_file do.
+    If progress is given it is called after every batch with the number of
+    bytes of the range read so far and the size of the range.
+
+    When n is more than 1, every run of n consecutive words in a review is
+    counted as one phrase (see word_ngrams) instead of counting single words.
+    There are far more distinct phrases than words, so when max_words is
+    given the rarest entries are pruned whenever the store grows past it
+    (see prune_words). The counts kept may then be short by up to
+    word_data.error_bound(); the totals stay exact.
+
+    Every review is also recorded in word_data.review_stats, so the number of
+    reviews, ratings and words per gender are known without another pass.
+    If review_index is given, the offset of every review is added to it under
+    each word (or phrase) of the review, so example reviews can be found later.
+
+    Input:
+        word_data (WordStore): the store to add the counts to
+        filename (str): name of the file holding professor review data
+        start (int): byte offset of the first review to read
+        end (int): byte offset just past the last review to read
+        chunk_size (int): the approximate number of bytes to count per batch
+        progress (function): called as progress(bytes_read, bytes_total), or None
+        n (int): the number of words in each phrase counted
+        max_words (int): the most distinct words (or phrases) to keep, or None for no limit
+        review_index (ReviewIndex): an index to record the reviews each word is in, or None
+
+    >>> calls = []
+    >>> read_range(WordStore(), 'data/small-three.txt', 37, 114, 30, lambda done, total: calls.append((done, total)))
+    >>> calls
+    [(50, 77), (77, 77)]
+    """
+    # walks the memory-mapped file, adding the words of each batch of reviews to the store
+    with reviewreader.open_reviews(filename) as buffer:
+        batch = []
+        batch_start = start
+        indices = {}
+        review_stats = word_data.review_stats
+        min_count = PRUNE_MIN_COUNT
+        if instrument.enabled:
+            reviews_before = sum(map(sum, review_stats.reviews.values()))
+            tokens_before = sum(map(sum, review_stats.tokens.values()))
+            words_before = len(word_data)
+        for rating, gender, comment_start, comment_end in reviewreader.iter_reviews(buffer, start, end):
+            index = indices.get(rating)
+            if index is None:
+                index = indices[rating] = convert_rating_to_index(rating)
+            words = reviewreader.comment_words(buffer, comment_start, comment_end)
+            gender = convert_gender_to_key(gender)
+            review_stats.add(gender, index, rating, len(words))
+            words = word_ngrams(words, n)
+            if review_index is not None:
+                review_index.add(gender, index, comment_start, words)
+            batch.append((gender, rating, words))
+            if comment_end - batch_start >= chunk_size:
+                add_review_words(word_data, batch)
+                instrument.count('batches')
+                if max_words is not None and len(word_data) > max_words:
+                    min_count = prune_words(word_data, max_words, min_count)
+                batch = []
+                batch_start = comment_end
+                if progress is not None:
+                    progress(batch_start - start, end - start)
+        add_review_words(word_data, batch)
+        instrument.count('batches')
+        if max_words is not None and len(word_data) > max_words:
+            prune_words(word_data, max_words, min_count)
+        if instrument.enabled:
+            instrument.count('reviews parsed', sum(map(sum, review_stats.reviews.values())) - reviews_before)
+            instrument.count('tokens', sum(map(sum, review_stats.tokens.values())) - tokens_before)
+            instrument.count('unique words (net of pruning)', len(word_data) - words_before)
+        if progress is not None:
+            progress(end - start, end - start)
+
+
+def index_reviews(filename, review_index=None, n=1, vocabulary=None):
+    """
+    Returns a ReviewIndex of the reviews in the given file, adding them to
+    review_index if it is given. Only the words are split out; nothing is
+    counted, so this is the cheap way to index a file whose counts were
+    loaded from elsewhere (such as the index cache). If vocabulary is given
+    (such as a store that was pruned), only the words in it are indexed.
+
+    >>> index = index_reviews('data/small-three.txt')
+    >>> index.offsets('best', 'W', 2), index.offsets('best', 'M', 0)
+    ([73], [94])
+    >>> pruned = index_reviews('data/small-three.txt', vocabulary={'best', 'worst'})
+    >>> len(index), len(pruned), 'not' in pruned
+    (3, 1, False)
+    """
+    if review_index is None:
+        review_index = ReviewIndex()
+    with reviewreader.open_reviews(filename) as buffer:
+        indices = {}
+        for rating, gender, comment_start, comment_end in reviewreader.iter_reviews(buffer):
+            index = indices.get(rating)
+            if index is None:
+                index = indices[rating] = convert_rating_to_index(rating)
+            words = word_ngrams(reviewreader.comment_words(buffer, comment_start, comment_end), n)
+            if vocabulary is not None:
+                words = [word for word in words if word in vocabulary]
+            review_index.add(convert_gender_to_key(gender), index, comment_start, words)
+    return review_index
+
+
+@instrument.timed
+def example_reviews(filename, review_index, word, gender, index, count=DEFAULT_EXAMPLES):
+    """
+    Returns up to count of the reviews behind one bar of the chart of word:
+    the reviews of professors of the given gender, in the given rating
+    bucket, that contain word. Each review is read straight from its offset
+    in the data file, as a (rating, gender, comment) tuple.
+
+    Input:
+        filename (str): the data file review_index was built from
+        review_index (ReviewIndex): the index of the reviews each word is in
+        word (str): the word (or phrase) whose reviews are wanted
+        gender (str): the gender of the bar
+        index (int): the bucket index of the bar
+        count (int): the most reviews to return
+
+    Returns:
+        reviews (List[Tuple[float, str, str]]): the rating, gender and comment of each review
+
+    >>> index = index_reviews('data/small-three.txt')
+    >>> example_reviews('data/small-three.txt', index, 'best', 'W', 2)
+    [(5.0, 'W', 'best best best')]
+    >>> example_reviews('data/small-three.txt', index, 'best', 'W', 0)
+    []
+    """
+    offsets = review_index.offsets(word, gender, index, count)
+    with reviewreader.open_reviews(filename) as buffer:
+        return [reviewreader.review_at(buffer, offset) for offset in offsets]
+
+
+def update_from_file(word_data, filename, offset=0, final=False):
+    """
+    Adds the reviews written to filename since the byte offset to word_data,
+    so a file that is being appended to can be counted in O(new data). Only
+    complete lines are read unless final is True, since the last line of a
+    growing file may still be being written. Returns the offset to pass to
+    the next call. An offset of 0 means the file has not been read yet, and
+    its header line is skipped.
+
+    Input:
+        word_data (WordStore): the store to add the counts to
+        filename (str): name of the file holding professor review data
+        offset (int): the offset returned by the previous call, or 0
+        final (bool): whether to also read a last line with no newline
+
+    Returns:
+        offset (int): the byte offset just past the last review read
+
+    >>> store = WordStore()
+    >>> offset = update_from_file(store, 'data/small-three.txt')
+    >>> offset, store
+    (88, {'average': {'W': [0, 0, 0], 'M': [0, 3, 0]}, 'best': {'W': [0, 0, 3], 'M': [0, 0, 0]}})
+    >>> update_from_file(store, 'data/small-three.txt', offset, final=True)
+    114
+    >>> store == read_file('data/small-three.txt')
+    True
+    """
+    with reviewreader.open_reviews(filename) as buffer:
+        if offset == 0:
+            offset = reviewreader.header_end(buffer)
+        end = len(buffer) if final else buffer.rfind(b'\n', offset) + 1
+    if end <= offset:
+        return offset
+    read_range(word_data, filename, offset, end)
+    return end
+
+
+def follow_file(word_data, filename, offset=0, interval=FOLLOW_INTERVAL):
     """
-    word_data = {}
+    Follows a review file that is being appended to, like tail -f. Each time
+    new complete lines have been written, they are added to word_data and
+    the new offset is yielded. The file is checked every interval seconds,
+    and the generator runs until the caller stops iterating.
 
-    # reads rating and gender then loops through each word in the review, adding the data for that word to a dictionary
-    with open(filename) as file:
-        next(file)
-        for line in file:
-            line = line.strip()
-            index = line.find(',')
-            rating = float(line[0:index])
-            gender = line[index+1:index+2]
-            string_of_words = line[index+3:len(line)]
-            words = string_of_words.split()
+    Input:
+        word_data (WordStore): the store to add the counts to
+        filename (str): name of the file holding professor review data
+        offset (int): the offset already read up to, or 0 to read the whole file
+        interval (float): the number of seconds to wait between checks
+    """
+    while True:
+        if os.path.getsize(filename) < offset:
+            raise ValueError(f"{filename} was truncated, so it is no longer append-only")
+        new_offset = update_from_file(word_data, filename, offset)
+        if new_offset != offset:
+            offset = new_offset
+            yield offset
+        else:
+            time.sleep(interval)
+
+
+def shard_file(filename, num_shards):
+    """
+    Splits the reviews in the given file into at most num_shards byte ranges
+    of roughly equal size. Every range starts at the beginning of a line and
+    the header line is skipped, so each range can be read independently
+    with read_range.
 
-            # for each word in list, call add_data_for_word_function, pass in word_data, word, gender, and rating
-            for word in words:
-                add_data_for_word(word_data, word, gender, rating)
+    Input:
+        filename (str): name of the file holding professor review data
+        num_shards (int): the number of ranges to split the file into
 
+    Returns:
+        shards (List[Tuple[int, int]]): the (start, end) byte offsets of each range
+
+    >>> shard_file('data/small-three.txt', 1)
+    [(37, 114)]
+    >>> shard_file('data/small-three.txt', 3)
+    [(37, 67), (67, 88), (88, 114)]
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as file:
+    ...     _ = file.write('Rating,Professor Gender,Comment Text\\n')
+    >>> shard_file(file.name, 2), read_file(file.name)
+    ([(37, 37)], {})
+    >>> os.remove(file.name)
+    """
+    with open(filename, 'rb') as file:
+        file.readline()
+        header_end = file.tell()
+        size = file.seek(0, 2)
+
+        boundaries = [header_end]
+        for i in range(1, num_shards):
+            position = header_end + (size - header_end) * i // num_shards
+            # moves forward to the start of the next line unless already at one
+            file.seek(position - 1)
+            file.readline()
+            boundaries.append(max(file.tell(), boundaries[-1]))
+        boundaries.append(size)
+
+    shards = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+    # a file holding only its header still has one (empty) range, so reading it gives an empty store
+    return shards or [(header_end, size)]
+
+
+def read_shard(filename, start, end):
+    """
+    Returns a new WordStore holding the counts for one byte range of the file.
+    This is the unit of work handed to each process by read_file_parallel.
+    """
+    word_data = WordStore()
+    read_range(word_data, filename, start, end)
     return word_data
 
 
-def search_words(word_data, target):
+@instrument.timed
+def read_file_parallel(filename, workers=None):
+    """
+    Builds the same WordStore as read_file, but splits the file into one
+    shard per worker, counts the shards in a pool of processes and then
+    merges the results in file order.
+
+    Input:
+        filename (str): name of the file holding professor review data
+        workers (int): the number of processes to use (defaults to the CPU count)
+
+    >>> read_file_parallel('data/small-three.txt', 2) == read_file('data/small-three.txt')
+    True
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shard_file(filename, workers)
+    if len(shards) <= 1:
+        return read_file(filename)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tables = executor.map(read_shard, [filename] * len(shards), *zip(*shards))
+        return merge_word_data(*tables)
+
+
+def merge_word_data(*tables):
+    """
+    Combines any number of word_data tables (WordStores or plain word_data
+    dictionaries) into a new WordStore by adding their counts together.
+    Merging is associative, so partial results for different files, days or
+    shards can be combined in any grouping. Words keep the order in which
+    they first appear across the tables.
+
+    Input:
+        tables (word_data): the tables to combine
+
+    Returns:
+        word_data (WordStore): a new store holding the summed counts
+
+    >>> day_one = read_file('data/small-one.txt')
+    >>> day_two = {'best': {'W': [0, 0, 0], 'M': [1, 0, 0]}}
+    >>> merge_word_data(day_one, day_two)
+    {'okay': {'W': [0, 0, 0], 'M': [0, 1, 0]}, 'best': {'W': [0, 0, 1], 'M': [1, 0, 0]}}
+    """
+    word_data = WordStore()
+    for table in tables:
+        word_data.merge(table)
+    return word_data
+
+
+@instrument.timed
+def lookup_words(word_data, words, scheme=None):
+    """
+    Returns the data for each of the given words, in order, with None for a
+    word that is not in word_data. A WordStore or FrequencyView answers the
+    whole batch in one lookup; a plain dictionary is looked up word by word.
+    When a BucketScheme is given the data has one value per bucket of the
+    scheme, which needs a store with histograms of ratings (see WordStore).
+
+    Input:
+        word_data (dictionary): a dictionary containing word frequency data
+        words (List[str]): the words to look up
+        scheme (BucketScheme): how to cut the ratings into buckets, or None for low, medium and high
+
+    Returns:
+        results (List[dictionary]): the {gender: [low, medium, high]} data of each word, or None
+
+    >>> word_data = read_file('data/small-three.txt')
+    >>> lookup_words(word_data, ['best', 'zebra'])
+    [{'W': [0, 0, 3], 'M': [1, 0, 0]}, None]
+    >>> lookup_words(dict(word_data), ['best', 'zebra']) == lookup_words(word_data, ['best', 'zebra'])
+    True
+    >>> lookup_words(word_data, ['best'], BucketScheme((4.5,)))
+    [{'W': [0, 3], 'M': [1, 0]}]
+    """
+    if isinstance(word_data, (WordStore, SketchStore, StoreUnion, FrequencyView)):
+        return word_data.lookup(words, scheme=scheme)
+    if scheme is not None and scheme != THREE_BUCKETS:
+        raise ValueError("a word_data dictionary only has the low, medium and high buckets")
+    return [word_data.get(word) for word in words]
+
+
+@instrument.timed
+def search_words(word_data, target, prefix=False, ignore_case=True):
     """
     Given a word_data dictionary that stores word frequency information and a target string,
     returns a list of all words in the dictionary that contain the target string. This
     function should be case-insensitive with respect to the target string.
+    For a WordStore, SketchStore or StoreUnion (or a FrequencyView of one) the
+    words are found with its SearchIndex rather than by checking every word in
+    the vocabulary; a SketchStore only searches its most common words.
 
     Input:
         word_data (dictionary): a dictionary containing word frequency data
         target (str): a string to look for in the names contained within word_data
+        prefix (bool): whether to only return words that start with the target string
+        ignore_case (bool): whether upper and lower case letters match each other
 
     Returns:
         matching_words (List[str]): a list of all words from word_data that contain
-                                    the target string
+                                    the target string, in the order they appear in word_data
+
+    >>> word_data = read_file('data/small-three.txt')
+    >>> search_words(word_data, 'ES')
+    ['best']
+    >>> search_words(word_data, 'a', prefix=True)
+    ['average']
+    >>> search_words(dict(word_data), 'ES')
+    ['best']
     """
+    if isinstance(word_data, (WordStore, SketchStore, StoreUnion, FrequencyView)):
+        return word_data.search_index().search(target, prefix, ignore_case)
+
+    if ignore_case:
+        target = target.lower()
     matching_words = []
 
     # if the target string is in the key appends the key to matching_words list
     for key in word_data:
-        if target in key:
+        text = key.lower() if ignore_case else key
+        if text.startswith(target) if prefix else target in text:
             matching_words.append(key)
 
     return matching_words
@@ -174,21 +745,95 @@ def print_words(word_data):
         print("")
 
 
+def format_examples(filename, review_index, word, count=DEFAULT_EXAMPLES):
+    """
+    Returns the text listing up to count example reviews containing word for
+    each gender and rating bucket, read from the data file at the offsets in
+    review_index.
+
+    >>> print(format_examples('data/small-three.txt', index_reviews('data/small-three.txt'), 'best'))
+    W Low Reviews:
+    W Medium Reviews:
+    W High Reviews:
+      5.0 best best best
+    M Low Reviews:
+      1.0 not best not average
+    M Medium Reviews:
+    M High Reviews:
+    """
+    lines = []
+    for gender in (KEY_WOMEN, KEY_MEN):
+        for index, label in enumerate(BUCKET_LABELS):
+            lines.append(f"{gender} {label}:")
+            for rating, review_gender, comment in example_reviews(filename, review_index, word, gender, index, count):
+                lines.append(f"  {rating} {comment}")
+    return '\n'.join(lines)
+
+
+def follow_and_report(filename):
+    """
+    Counts the given file and then keeps following it as reviews are appended,
+    printing the vocabulary size and per-gender word totals after each update.
+    Stops when the user presses Ctrl-C.
+    """
+    word_data = WordStore()
+    try:
+        for offset in follow_file(word_data, filename):
+            totals = word_data.totals()
+            print(f"{offset} bytes: {len(word_data)} words, {totals[KEY_WOMEN]} for women, {totals[KEY_MEN]} for men")
+    except KeyboardInterrupt:
+        pass
+
+
 def main():
     # (This function is provided for you)
     import sys
-    args = sys.argv[1:]
+    args = instrument.take_flag(sys.argv[1:])
 
     if len(args) == 0:
         return
-    # Two command line forms
+    # Five command line forms
     # 1. data_file
     # 2. -search target data_file
+    # 3. -follow data_file
+    # 4. -skew k data_file
+    # 5. -examples word data_file
+    # Forms 1, 2 and 4 may start with -ngrams n to count phrases of n words instead of single words,
+    # and then with -approximate to estimate the counts of the most common words in fixed memory
+    n = 1
+    max_words = None
+    if len(args) >= 3 and args[0] == '-ngrams':
+        n = int(args[1])
+        max_words = MAX_NGRAMS if n > 1 else None
+        args = args[2:]
+    approximate = len(args) >= 2 and args[0] == '-approximate'
+    if approximate:
+        args = args[1:]
 
     # Assume no search, so filename to read
     # is the first argument
     filename = args[0]
 
+    if args[0] == '-follow' and len(args) >= 2:
+        follow_and_report(args[1])
+        return
+
+    # Rank the words most skewed towards each gender, overall and in each rating bucket
+    if args[0] == '-skew' and len(args) >= 3:
+        word_data = read_file(args[2], n=n, max_words=max_words, approximate=approximate)
+        for bucket, label in [(None, "All reviews"), (0, "Low reviews"), (1, "Medium reviews"), (2, "High reviews")]:
+            print(f"{label}:")
+            print(skew.format_ranking(skew.top_skewed(word_data, int(args[1]), bucket)))
+        return
+
+    # Show a few of the reviews behind each bar of the chart of a word
+    if args[0] == '-examples' and len(args) >= 3:
+        # indexed after reading, so phrases pruned from the store get no postings
+        word_data = read_file(args[2], n=n, max_words=max_words)
+        review_index = index_reviews(args[2], n=n, vocabulary=word_data if max_words is not None else None)
+        print(format_examples(args[2], review_index, args[1]))
+        return
+
     # Check if we are doing search, set target variable
     target = ''
     if len(args) >= 2 and args[0] == '-search':
@@ -196,7 +841,10 @@ def main():
         filename = args[2]  # Update filename to skip first 2 args
 
     # Read in the data from the file name
-    word_data = read_file(filename)
+    word_data = read_file(filename, n=n, max_words=max_words, approximate=approximate)
+    if approximate:
+        print(f"Counts are estimates, each at most {word_data.error_bound()} too high (with probability "
+              f"{1 - math.exp(-word_data.depth):.3f}); only the {len(word_data)} most common words are kept.")
 
     # Either we do a search or just print everything.
     if len(target) > 0:
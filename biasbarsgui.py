@@ -12,14 +12,50 @@ the Bias Bars program.
 You should not modify any of the contents of this file.
 """
 
+import queue
+import threading
 import tkinter
 
+import instrument
+
+# how long typing must pause before a live search runs, and how often finished searches are collected
+SEARCH_DELAY_MS = 150
+SEARCH_POLL_MS = 20
+# the most search results shown at once; the rest are reached with the page buttons
+SEARCH_PAGE_SIZE = 50
+
+# how often a background load reports its progress to the window
+LOAD_POLL_MS = 50
+# virtual event sent to the window once a background load has finished
+DATA_LOADED_EVENT = '<<DataLoaded>>'
+
+# the most words that can be compared in one chart
+MAX_COMPARED_WORDS = 50
+
+# the size, in characters, of the window of example reviews
+EXAMPLES_WIDTH = 100
+EXAMPLES_HEIGHT = 30
+
+# the choices offered by the skewed words panel, and the bucket index each one ranks
+RANK_CHOICES = {"All Reviews": None, "Low Reviews": 0, "Medium Reviews": 1, "High Reviews": 2}
+
 
 # provided function to build the GUI
-def make_gui(top, width, height, word_data, plot_word, search_words):
+def make_gui(top, width, height, word_data, plot_word, search_words, rank_words=None, plot_words=None,
+             show_examples=None):
     """
     Set up the GUI elements for Bias Bars, returning the Canvas to use.
     top is TK root, width/height is canvas size, word_data is Bias Bars Data dict.
+    If rank_words is given, a panel listing the most gender-skewed words is added;
+    rank_words(word_data, bucket) must return the text to show in it.
+    If plot_words is given, several words separated by commas can be plotted
+    together, and a button plots the page of search results shown;
+    plot_words(canvas, word_data, words) must draw the comparison chart.
+    If show_examples is given, a button opens a window of example reviews
+    containing the word entered; show_examples(word) must return their text,
+    or None while the reviews are still being indexed.
+    word_data may still be filling up when the GUI is made: when top receives a
+    DATA_LOADED_EVENT the search results and the skewed words are worked out again.
     """
     # word entry field
     label = tkinter.Label(top, text="Word To Plot:")
@@ -29,6 +65,10 @@ def make_gui(top, width, height, word_data, plot_word, search_words):
     entry.focus()
     error_out = tkinter.Text(top, height=2, width=70, name='errorout', borderwidth=2)
     error_out.grid(row=0, column=2, sticky='w')
+    if show_examples is not None:
+        examples = tkinter.Button(top, text="Examples",
+                                  command=lambda: handle_examples(top, entry, word_data, error_out, show_examples))
+        examples.grid(row=0, column=3, sticky='w')
 
     # canvas for drawing
     canvas = tkinter.Canvas(top, width=width, height=height, name='canvas')
@@ -44,29 +84,64 @@ def make_gui(top, width, height, word_data, plot_word, search_words):
     search_entry.grid(row=3, column=1, sticky='w')
     search_out = tkinter.Text(top, height=2, width=70, name='searchout', borderwidth=2)
     search_out.grid(row=3, column=2, sticky='w')
+    live_search = LiveSearch(top, search_entry, search_out, word_data, search_words)
+    previous_page = tkinter.Button(top, text="<", command=lambda: live_search.turn_page(-1))
+    previous_page.grid(row=3, column=3, sticky='w')
+    next_page = tkinter.Button(top, text=">", command=lambda: live_search.turn_page(1))
+    next_page.grid(row=3, column=4, sticky='w')
+    if plot_words is not None:
+        plot_page = tkinter.Button(top, text="Plot All",
+                                   command=lambda: handle_plot_matches(live_search, canvas, word_data, error_out,
+                                                                       plot_word, plot_words))
+        plot_page.grid(row=3, column=5, sticky='w')
 
     # When <return> key is hit in a text field .. connect to the handle_draw()
-    # and handle_search() functions to do the work.
-    entry.bind("<Return>", lambda event: handle_plot(entry, canvas, word_data, error_out, plot_word))
-    search_entry.bind("<Return>", lambda event: handle_search(search_entry, search_out, word_data, search_words))
+    # and live search functions to do the work. The search field also
+    # searches as the user types, once typing pauses.
+    entry.bind("<Return>", lambda event: handle_plot(entry, canvas, word_data, error_out, plot_word, plot_words))
+    search_entry.bind("<Return>", lambda event: live_search.search_now())
+    search_entry.bind("<KeyRelease>", lambda event: live_search.schedule())
+
+    # Skewed words panel below the search field
+    if rank_words is not None:
+        label = tkinter.Label(top, text="Most Skewed:")
+        label.grid(row=4, column=0, sticky='w')
+        bucket_choice = tkinter.StringVar(top, value=next(iter(RANK_CHOICES)))
+        bucket_menu = tkinter.OptionMenu(top, bucket_choice, *RANK_CHOICES,
+                                         command=lambda choice: handle_rank(bucket_choice, rank_out, word_data, rank_words))
+        bucket_menu.grid(row=4, column=1, sticky='w')
+        rank_out = tkinter.Text(top, height=4, width=70, name='rankout', borderwidth=2)
+        rank_out.grid(row=4, column=2, sticky='w')
+        handle_rank(bucket_choice, rank_out, word_data, rank_words)
+        top.bind(DATA_LOADED_EVENT, lambda event: handle_rank(bucket_choice, rank_out, word_data, rank_words), add='+')
+    top.bind(DATA_LOADED_EVENT, lambda event: live_search.refresh(), add='+')
 
     top.update()
     return canvas
 
 
-def handle_plot(entry, canvas, word_data, error_out, plot):
+@instrument.timed
+def handle_plot(entry, canvas, word_data, error_out, plot, plot_many=None):
     """
     (provided)
     Called when <return> key hit in given entry text field.
     Gets search text from given entry, draws results
-    to the given canvas.
+    to the given canvas. If plot_many is given, the text may
+    hold several words separated by commas. A phrase with
+    spaces is plotted if word_data counts phrases.
     """
     text = entry.get()
 
     error_out.delete('1.0', tkinter.END)
     if not text:
         error_out.insert('1.0', "Please enter a non-empty word.")
-    elif " " in text:
+    elif plot_many is not None and "," in text:
+        words = [word.strip() for word in text.split(",")]
+        if not all(words):
+            error_out.insert('1.0', "Please separate the words to compare with commas, e.g. smart,intelligent,genius.")
+        else:
+            plot_compared(words, canvas, word_data, error_out, plot, plot_many)
+    elif " " in text and text.lower() not in word_data:
         error_out.insert('1.0', "The program cannot search for multiple words at a time. Please enter a single word with no spaces.")
     elif text.lower() not in word_data:
         error_out.insert('1.0', f"{text} is not contained in the word database.")
@@ -74,6 +149,70 @@ def handle_plot(entry, canvas, word_data, error_out, plot):
         plot(canvas, word_data, text.lower())
 
 
+def handle_plot_matches(live_search, canvas, word_data, error_out, plot, plot_many):
+    """
+    Called when the Plot All button is pressed: plots every word on the page
+    of search results being shown.
+    """
+    error_out.delete('1.0', tkinter.END)
+    words = live_search.page_words()
+    if not words:
+        error_out.insert('1.0', "There are no search results to plot.")
+    else:
+        plot_compared(words, canvas, word_data, error_out, plot, plot_many)
+
+
+def plot_compared(words, canvas, word_data, error_out, plot, plot_many):
+    """
+    Plots the given words together, reporting any that are not in word_data and
+    leaving out any beyond the first MAX_COMPARED_WORDS. A single word left to
+    plot is drawn with plot rather than plot_many.
+    """
+    words = list(dict.fromkeys(word.lower() for word in words))
+    missing = [word for word in words if word not in word_data]
+    words = [word for word in words if word in word_data]
+    notes = []
+    if missing:
+        notes.append(f"{', '.join(missing)} {'is' if len(missing) == 1 else 'are'} not contained in the word database.")
+    if len(words) > MAX_COMPARED_WORDS:
+        notes.append(f"Only the first {MAX_COMPARED_WORDS} of {len(words)} words are plotted.")
+        words = words[:MAX_COMPARED_WORDS]
+    error_out.insert('1.0', ' '.join(notes))
+    if len(words) == 1:
+        plot(canvas, word_data, words[0])
+    elif words:
+        plot_many(canvas, word_data, words)
+
+
+@instrument.timed
+def handle_examples(top, entry, word_data, error_out, show_examples):
+    """
+    Called when the Examples button is pressed: opens a window listing
+    example reviews that contain the word entered, for each bar of its chart.
+    """
+    word = entry.get().strip().lower()
+    error_out.delete('1.0', tkinter.END)
+    if not word:
+        error_out.insert('1.0', "Please enter a non-empty word.")
+        return
+    if word not in word_data:
+        error_out.insert('1.0', f"{word} is not contained in the word database.")
+        return
+    text = show_examples(word)
+    if text is None:
+        error_out.insert('1.0', "The reviews are still being indexed. Please try again in a moment.")
+        return
+    window = tkinter.Toplevel(top)
+    window.wm_title(f"Reviews containing {word}")
+    examples_out = tkinter.Text(window, height=EXAMPLES_HEIGHT, width=EXAMPLES_WIDTH, wrap='word', borderwidth=2)
+    scrollbar = tkinter.Scrollbar(window, command=examples_out.yview)
+    examples_out.configure(yscrollcommand=scrollbar.set)
+    examples_out.grid(row=0, column=0, sticky='nsew')
+    scrollbar.grid(row=0, column=1, sticky='ns')
+    examples_out.insert('1.0', text)
+    examples_out.configure(state='disabled')
+
+
 def handle_search(search_entry, search_out, word_data, search):
     """
     (provided) Called for <return> key in lower search field.
@@ -88,3 +227,215 @@ def handle_search(search_entry, search_out, word_data, search):
         out = ' '.join(result)
         search_out.delete('1.0', tkinter.END)
         search_out.insert('1.0', out)
+
+
+@instrument.timed
+def handle_rank(bucket_choice, rank_out, word_data, rank):
+    """
+    Called when a bucket is chosen in the skewed words panel. Ranks the words
+    for the chosen bucket and shows the result in the rank_out text area.
+    """
+    result = rank(word_data, RANK_CHOICES[bucket_choice.get()])
+    rank_out.delete('1.0', tkinter.END)
+    rank_out.insert('1.0', result)
+
+
+class LiveSearch:
+    """
+    Runs the search for the lower search field as the user types. Keystrokes are
+    debounced with after(), each search runs in a worker thread so the window
+    stays responsive, and only the result of the newest search is shown: any
+    search that finishes after a newer one has started is thrown away. Results
+    are shown SEARCH_PAGE_SIZE words at a time. A search that fails shows its
+    error in place of the results.
+    """
+
+    def __init__(self, top, search_entry, search_out, word_data, search):
+        self.top = top
+        self.search_entry = search_entry
+        self.search_out = search_out
+        self.word_data = word_data
+        self.search = search
+        self.pending = None         # id of the scheduled after() call, if any
+        self.generation = 0         # number of the newest search started
+        self.shown = 0              # number of the search whose results are on screen
+        self.results = queue.Queue()
+        self.polling = False
+        self.target = ''
+        self.matches = []
+        self.page = 0
+
+    def schedule(self):
+        """
+        Called on every keystroke: (re)starts the debounce timer.
+        """
+        if self.pending is not None:
+            self.top.after_cancel(self.pending)
+        self.pending = self.top.after(SEARCH_DELAY_MS, self.search_now)
+
+    def search_now(self):
+        """
+        Starts a search for the current contents of the search field in a worker thread.
+        """
+        if self.pending is not None:
+            self.top.after_cancel(self.pending)
+            self.pending = None
+        target = self.search_entry.get().strip()
+        if target == self.target:
+            return
+        self.generation += 1
+        self.target = target
+        if not target:
+            self.shown = self.generation
+            self.show([], 0)
+            return
+
+        generation = self.generation
+        worker = threading.Thread(target=self.run_search, args=(generation, target), daemon=True)
+        worker.start()
+        if not self.polling:
+            self.polling = True
+            self.top.after(SEARCH_POLL_MS, self.collect)
+
+    def run_search(self, generation, target):
+        """
+        Worker thread body: skips the search if it is already stale, and
+        otherwise hands the result back to the Tk thread through the queue.
+        If the search fails, its exception is handed back as the result, so
+        the Tk thread stops waiting for it.
+        """
+        if generation == self.generation:
+            with instrument.timer('LiveSearch.run_search'):
+                try:
+                    matches = self.search(self.word_data, target)
+                except Exception as error:
+                    matches = error
+                self.results.put((generation, matches))
+        else:
+            instrument.count('searches skipped as stale')
+
+    def collect(self):
+        """
+        Runs on the Tk thread: shows the newest finished search, discarding
+        stale ones, and keeps polling while a search is still running.
+        """
+        while not self.results.empty():
+            generation, matches = self.results.get()
+            if generation == self.generation:
+                self.shown = generation
+                if isinstance(matches, Exception):
+                    self.show_error(matches)
+                else:
+                    self.show(matches, 0)
+            else:
+                instrument.count('search results discarded')
+        if self.shown != self.generation:
+            self.top.after(SEARCH_POLL_MS, self.collect)
+        else:
+            self.polling = False
+
+    def refresh(self):
+        """
+        Searches again for the current contents of the search field, even if
+        they have not changed, e.g. because more words have been loaded.
+        """
+        self.target = None
+        self.search_now()
+
+    def page_words(self):
+        """
+        Returns the matching words on the page of results being shown.
+        """
+        first = self.page * SEARCH_PAGE_SIZE
+        return self.matches[first:first + SEARCH_PAGE_SIZE]
+
+    def turn_page(self, step):
+        """
+        Shows the previous (step -1) or next (step 1) page of results.
+        """
+        self.show(self.matches, self.page + step)
+
+    def show(self, matches, page):
+        """
+        Puts one page of the matching words into the search output area.
+        """
+        self.matches = matches
+        num_pages = max(1, -(-len(matches) // SEARCH_PAGE_SIZE))
+        self.page = min(max(page, 0), num_pages - 1)
+        first = self.page * SEARCH_PAGE_SIZE
+        out = ' '.join(self.page_words())
+        if num_pages > 1:
+            out += f"\n[{first + 1}-{min(first + SEARCH_PAGE_SIZE, len(matches))} of {len(matches)}, page {self.page + 1}/{num_pages}]"
+        self.search_out.delete('1.0', tkinter.END)
+        self.search_out.insert('1.0', out)
+
+    def show_error(self, error):
+        """
+        Puts the error a search failed with into the search output area.
+        """
+        self.matches = []
+        self.page = 0
+        self.search_out.delete('1.0', tkinter.END)
+        self.search_out.insert('1.0', f"Search failed: {error}")
+
+
+class BackgroundLoader:
+    """
+    Runs a slow load function in a worker thread so the window can be shown and
+    used straight away. The load function is called as load(progress) and may
+    call progress(done, total) as often as it likes from the worker thread; the
+    latest progress is handed to on_progress(done, total) on the Tk thread every
+    LOAD_POLL_MS. Once the load returns, on_done(result) is called on the Tk
+    thread and the virtual event (DATA_LOADED_EVENT unless another is given)
+    is sent to top; a load that only adds to data already loaded passes None,
+    so the handlers of the main load are not run again. If the load fails, its
+    exception is raised again on the Tk thread.
+    """
+
+    def __init__(self, top, load, on_progress, on_done, event=DATA_LOADED_EVENT):
+        self.top = top
+        self.load = load
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.event = event
+        self.updates = queue.Queue()
+
+    def start(self):
+        """
+        Starts the load in a worker thread and begins polling for its progress.
+        """
+        worker = threading.Thread(target=self.run_load, daemon=True)
+        worker.start()
+        self.top.after(LOAD_POLL_MS, self.collect)
+
+    def run_load(self):
+        """
+        Worker thread body: runs the load, passing progress back through the queue.
+        """
+        try:
+            with instrument.timer('BackgroundLoader.load'):
+                result = self.load(lambda done, total: self.updates.put(('progress', (done, total))))
+        except Exception as error:
+            self.updates.put(('error', error))
+        else:
+            self.updates.put(('done', result))
+
+    def collect(self):
+        """
+        Runs on the Tk thread: shows the newest progress, and finishes up once
+        the load is done.
+        """
+        progress = None
+        while not self.updates.empty():
+            kind, value = self.updates.get()
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                self.on_done(value)
+                if self.event is not None:
+                    self.top.event_generate(self.event)
+                return
+            progress = value
+        if progress is not None:
+            self.on_progress(*progress)
+        self.top.after(LOAD_POLL_MS, self.collect)
@@ -0,0 +1,225 @@
+"""
+File: biasbarsserver.py
+-----------------------
+This program serves the Bias Bars word data over HTTP on the local machine, so
+that scripts can look words up without each of them re-reading the data file.
+The data is loaded once (through the index cache) and then queries from any
+number of clients are answered by a single asyncio event loop. Connections are
+kept alive between requests.
+
+Every response is a JSON object. The endpoints are:
+    GET /plot?word=smart&word=genius   counts and per-million frequencies for each word
+    GET /search?target=gen&prefix=0    the words containing (or starting with) target
+    GET /top?k=10&gender=W             the k most common words, optionally for one gender
+
+Usage:
+    python biasbarsserver.py [-port port] [data_file]
+"""
+
+import asyncio
+import json
+import sys
+from urllib.parse import urlsplit, parse_qs
+
+import biasbarsdata
+import indexcache
+
+FILENAME = "data/full-data.txt"
+HOST = "127.0.0.1"
+PORT = 8106
+MAX_WORDS_PER_REQUEST = 1000
+MAX_TOP_K = 10000
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class QueryError(Exception):
+    """
+    Raised when a query cannot be answered. The status is the HTTP status to reply with.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def handle_plot(word_data, query):
+    """
+    Returns the counts and frequencies for every word given in the query,
+    looked up as one batch. Words missing from the data map to None.
+
+    >>> word_data = biasbarsdata.read_file('data/small-three.txt')
+    >>> handle_plot(word_data, {'word': ['best', 'zebra']})['best']['counts']
+    {'W': [0, 0, 3], 'M': [1, 0, 0]}
+    >>> handle_plot(word_data, {'word': ['best', 'zebra']})['zebra'] is None
+    True
+    """
+    words = [word.lower() for word in query.get('word', [])]
+    if not words:
+        raise QueryError(400, "give at least one word to plot")
+    if len(words) > MAX_WORDS_PER_REQUEST:
+        raise QueryError(400, f"at most {MAX_WORDS_PER_REQUEST} words can be plotted at once")
+
+    counts = biasbarsdata.lookup_words(word_data, words)
+    frequencies = biasbarsdata.lookup_words(biasbarsdata.FrequencyView(word_data, memoize=False), words)
+    results = {}
+    for word, word_counts, word_frequencies in zip(words, counts, frequencies):
+        if word_counts is None:
+            results[word] = None
+        else:
+            results[word] = {'counts': word_counts, 'frequencies': word_frequencies}
+    return results
+
+
+def handle_search(word_data, query):
+    """
+    Returns the words matching the target given in the query.
+
+    >>> handle_search(biasbarsdata.read_file('data/small-three.txt'), {'target': ['VER']})
+    {'target': 'VER', 'words': ['average']}
+    """
+    target = query.get('target', [''])[0]
+    if not target:
+        raise QueryError(400, "give a non-empty target to search for")
+    prefix = query.get('prefix', ['0'])[0] not in ('0', 'false', '')
+    return {'target': target, 'words': biasbarsdata.search_words(word_data, target, prefix)}
+
+
+def handle_top(word_data, query):
+    """
+    Returns the k most common words, optionally counting only one gender.
+
+    >>> handle_top(biasbarsdata.read_file('data/small-three.txt'), {'k': ['1']})
+    {'top': [['average', 4]]}
+    """
+    try:
+        k = int(query.get('k', ['10'])[0])
+    except ValueError:
+        raise QueryError(400, "k must be a whole number")
+    gender = query.get('gender', [None])[0]
+    if gender not in (None, biasbarsdata.KEY_WOMEN, biasbarsdata.KEY_MEN):
+        raise QueryError(400, f"gender must be {biasbarsdata.KEY_WOMEN} or {biasbarsdata.KEY_MEN}")
+    k = max(0, min(k, MAX_TOP_K))
+    return {'top': [[word, count] for word, count in word_data.most_common(k, gender)]}
+
+
+ROUTES = {
+    '/plot': handle_plot,
+    '/search': handle_search,
+    '/top': handle_top,
+}
+
+
+def answer(word_data, method, target):
+    """
+    Returns the (status, result) pair for one request.
+
+    >>> answer(biasbarsdata.read_file('data/small-one.txt'), 'GET', '/nowhere')
+    (404, {'error': 'no endpoint at /nowhere'})
+    """
+    url = urlsplit(target)
+    handler = ROUTES.get(url.path)
+    if handler is None:
+        return 404, {'error': f"no endpoint at {url.path}"}
+    if method != 'GET':
+        return 405, {'error': "only GET requests are supported"}
+    try:
+        return 200, handler(word_data, parse_qs(url.query))
+    except QueryError as error:
+        return error.status, {'error': str(error)}
+
+
+def content_length(headers):
+    """
+    Returns the length of the request body given by the Content-Length
+    header (0 if there is none), or None if the header is not a
+    non-negative whole number.
+
+    >>> content_length({}), content_length({'content-length': '12'})
+    (0, 12)
+    >>> content_length({'content-length': '-1'}), content_length({'content-length': 'ten'})
+    (None, None)
+    """
+    value = headers.get('content-length', '0')
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+async def serve_client(word_data, reader, writer):
+    """
+    Answers the requests sent over one connection until the client closes it.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            length = content_length(headers)
+            if length:
+                await reader.readexactly(length)
+
+            parts = request_line.decode('latin-1').split()
+            if length is None:
+                # without a length the end of the body cannot be found, so the connection is closed
+                status, result = 400, {'error': "Content-Length must be a non-negative integer"}
+                keep_alive = False
+            elif len(parts) != 3:
+                status, result = 400, {'error': "malformed request line"}
+            else:
+                status, result = answer(word_data, parts[0], parts[1])
+
+            body = json.dumps(result).encode('utf-8')
+            writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_server(word_data, host=HOST, port=PORT, ready=None):
+    """
+    Serves word_data on the given host and port until cancelled. When ready
+    is given it is called with the port once the server is listening.
+    """
+    server = await asyncio.start_server(lambda reader, writer: serve_client(word_data, reader, writer), host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    args = sys.argv[1:]
+    port = PORT
+    if len(args) >= 2 and args[0] == '-port':
+        port = int(args[1])
+        args = args[2:]
+    filename = args[0] if args else FILENAME
+
+    word_data = indexcache.load_word_data(filename)
+    # builds the search index now rather than while the first search request waits
+    word_data.search_index()
+    try:
+        asyncio.run(run_server(word_data, HOST, port,
+                               lambda bound: print(f"Serving {filename} on http://{HOST}:{bound}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
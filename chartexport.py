@@ -0,0 +1,351 @@
+"""
+File: chartexport.py
+--------------------
+This file draws the charts of biasbars.py without a window and saves them as
+SVG files, so charts for thousands of words can be made by a batch job. An
+SvgCanvas stands in for the tkinter Canvas: it keeps the items that plot_word,
+plot_words and plot_word_partitions create and move, and writes them out as
+SVG, so the charts are laid out by exactly the same code as in the GUI (see
+barchart.py, which, unlike biasbars.py, does not need tkinter or a display).
+
+The batch command shares the words out between a pool of worker processes.
+Every worker memory-maps the same index file (see indexcache.py), so the
+counts are loaded once into the page cache and shared read-only. The reviews
+behind the error bars are counted once, by the parent, and each batch of
+words is sent with the counts of just those words:
+
+    python chartexport.py [-workers n] [-top k | -words file] [-output directory]
+                          [-buckets scheme] [-intervals method] data_file
+"""
+
+import itertools
+import os
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+import barchart
+import biasbarsdata
+import confidence
+import indexcache
+import instrument
+
+USAGE = ("Usage: python chartexport.py [-workers n] [-top k | -words file] [-output directory] "
+         "[-buckets scheme] [-intervals analytic|bootstrap|off] data_file")
+OUTPUT_DIRECTORY = "charts"
+TOP_K = 1000
+CHUNK_WORDS = 100           # words drawn per task in the process pool
+# the size assumed for text whose real size only a display could tell, for bbox
+CHAR_WIDTH = 7
+LINE_HEIGHT = 14
+FONT_SIZE = 10              # points, as for the default Tk canvas font
+BACKGROUND = 'white'
+# the SVG text-anchor and dominant-baseline of each Tk anchor
+ANCHORS = {
+    'center': ('middle', 'central'), 'n': ('middle', 'hanging'), 's': ('middle', 'text-after-edge'),
+    'e': ('end', 'central'), 'w': ('start', 'central'), 'ne': ('end', 'hanging'), 'nw': ('start', 'hanging'),
+    'se': ('end', 'text-after-edge'), 'sw': ('start', 'text-after-edge'),
+}
+
+
+class SvgCanvas:
+    """
+    Records the items drawn on it through the parts of the tkinter Canvas
+    interface that the plotting functions of barchart.py use, and returns them
+    as an SVG document. Hidden items are left out.
+
+    >>> canvas = SvgCanvas(100, 50)
+    >>> bar = canvas.create_rectangle(10, 40, 20, 40, fill='orange')
+    >>> label = canvas.create_text(15, 30, text='W', state='hidden')
+    >>> canvas.coords(bar, 10, 20, 20, 40)
+    >>> canvas.bbox(canvas.create_text(50, 25, text='max', anchor='w'))
+    (50, 18, 71, 32)
+    >>> print(canvas.to_svg())
+    <svg xmlns="http://www.w3.org/2000/svg" width="100" height="50" viewBox="0 0 100 50">
+    <rect width="100%" height="100%" fill="white"/>
+    <rect x="10" y="20" width="10" height="20" fill="orange" stroke="black" stroke-width="1"/>
+    <text x="50" y="25" text-anchor="start" dominant-baseline="central" font-family="Helvetica" font-size="10pt" fill="black">max</text>
+    </svg>
+    """
+
+    def __init__(self, width=barchart.WINDOW_WIDTH, height=barchart.WINDOW_HEIGHT):
+        self.width = width
+        self.height = height
+        self._items = {}            # item id -> [kind, coordinates, options]
+        self._ids = itertools.count(1)
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def delete(self, tag):
+        """
+        Deletes every item; 'all' is the only tag the plotting functions use.
+        """
+        self._items.clear()
+
+    def _create(self, kind, coordinates, options):
+        item = next(self._ids)
+        self._items[item] = [kind, list(coordinates), options]
+        return item
+
+    def create_rectangle(self, *coordinates, **options):
+        return self._create('rectangle', coordinates, options)
+
+    def create_line(self, *coordinates, **options):
+        return self._create('line', coordinates, options)
+
+    def create_text(self, *coordinates, **options):
+        return self._create('text', coordinates, options)
+
+    def coords(self, item, *coordinates):
+        self._items[item][1] = list(coordinates)
+
+    def itemconfigure(self, item, **options):
+        self._items[item][2].update(options)
+
+    def bbox(self, item):
+        """
+        Returns the (left, top, right, bottom) box around an item, estimating
+        the size of text from CHAR_WIDTH and LINE_HEIGHT.
+        """
+        kind, coordinates, options = self._items[item]
+        if kind != 'text':
+            xs, ys = coordinates[0::2], coordinates[1::2]
+            return min(xs), min(ys), max(xs), max(ys)
+        x, y = coordinates
+        width = CHAR_WIDTH * len(str(options.get('text', '')))
+        anchor = options.get('anchor', 'center')
+        left = x - width if 'e' in anchor else x if 'w' in anchor else x - width / 2
+        top = y if 'n' in anchor else y - LINE_HEIGHT if 's' in anchor else y - LINE_HEIGHT / 2
+        return round(left), round(top), round(left + width), round(top + LINE_HEIGHT)
+
+    def to_svg(self):
+        """
+        Returns the visible items as the text of an SVG document.
+        """
+        lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                 f'viewBox="0 0 {self.width} {self.height}">',
+                 f'<rect width="100%" height="100%" fill="{BACKGROUND}"/>']
+        for kind, coordinates, options in self._items.values():
+            if options.get('state') == 'hidden':
+                continue
+            if kind == 'rectangle':
+                lines.append(svg_rectangle(coordinates, options))
+            elif kind == 'line':
+                lines.append(svg_line(coordinates, options))
+            else:
+                lines.append(svg_text(coordinates, options))
+        lines.append('</svg>')
+        return '\n'.join(lines)
+
+    def save(self, filename):
+        """
+        Writes the visible items to the given file as SVG.
+        """
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(self.to_svg())
+            file.write('\n')
+
+
+def number(value):
+    """
+    Returns value written as briefly as an SVG attribute allows.
+
+    >>> number(20.0), number(211.66666666), number(-0.0)
+    ('20', '211.67', '0')
+    """
+    return f"{round(value, 2) + 0:g}"
+
+
+def svg_rectangle(coordinates, options):
+    """
+    Returns the SVG element for a Tk rectangle, which by default is not
+    filled and has a black outline one pixel wide.
+    """
+    x1, y1, x2, y2 = coordinates
+    stroke_width = options.get('width', 1)
+    stroke = ''
+    if stroke_width:
+        stroke = f' stroke="{options.get("outline", "black")}" stroke-width="{number(stroke_width)}"'
+    return (f'<rect x="{number(min(x1, x2))}" y="{number(min(y1, y2))}" width="{number(abs(x2 - x1))}" '
+            f'height="{number(abs(y2 - y1))}" fill="{options.get("fill") or "none"}"{stroke}/>')
+
+
+def svg_line(coordinates, options):
+    """
+    Returns the SVG element for a Tk line through the given points, which by
+    default is black and one pixel wide.
+    """
+    points = ' '.join(f"{number(x)},{number(y)}" for x, y in zip(coordinates[0::2], coordinates[1::2]))
+    return (f'<polyline points="{points}" fill="none" stroke="{options.get("fill", "black")}" '
+            f'stroke-width="{number(options.get("width", 1))}"/>')
+
+
+def svg_text(coordinates, options):
+    """
+    Returns the SVG element for Tk text, anchored as Tk anchors it.
+    """
+    x, y = coordinates
+    text_anchor, baseline = ANCHORS[options.get('anchor', 'center')]
+    family, size = options.get('font', ('Helvetica', FONT_SIZE))[:2]
+    return (f'<text x="{number(x)}" y="{number(y)}" text-anchor="{text_anchor}" dominant-baseline="{baseline}" '
+            f'font-family={quoteattr(family)} font-size="{size}pt" fill="{options.get("fill", "black")}">'
+            f'{escape(str(options.get("text", "")))}</text>')
+
+
+def chart_filename(directory, word):
+    """
+    Returns the path of the SVG file for the chart of word in directory, with
+    any character that is not safe in a file name escaped.
+
+    >>> chart_filename('charts', 'great')
+    'charts/great.svg'
+    >>> chart_filename('charts', "../he/she's")
+    'charts/%2E.%2Fhe%2Fshe%27s.svg'
+    """
+    name = urllib.parse.quote(word, safe='')
+    if name.startswith('.'):
+        name = '%2E' + name[1:]
+    return os.path.join(directory, name + '.svg')
+
+
+def export_words(word_data, words, directory, scheme=None, word_confidence=None, canvas=None):
+    """
+    Draws the chart of each word with barchart.plot_word and saves it in
+    directory, reusing one canvas so that each chart only moves and relabels
+    the items of the one before. Returns the number of charts written.
+
+    Input:
+        word_data (FrequencyView): the word frequencies to chart
+        words (List[str]): the words to chart, all of which must be in word_data
+        directory (str): the existing directory to write the SVG files to
+        scheme (BucketScheme): how to cut the ratings into buckets, or None
+        word_confidence (WordConfidence): gives the error bars, or None for none
+        canvas (SvgCanvas): the canvas to draw on, or None for a new one
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> word_data = biasbarsdata.FrequencyView(biasbarsdata.read_file('data/small-three.txt'))
+    >>> export_words(word_data, ['best', 'not'], directory)
+    2
+    >>> sorted(os.listdir(directory))
+    ['best.svg', 'not.svg']
+    """
+    canvas = canvas or SvgCanvas()
+    for word in words:
+        intervals = word_confidence.intervals(word, scheme) if word_confidence is not None else None
+        barchart.plot_word(canvas, word_data, word, scheme, intervals)
+        canvas.save(chart_filename(directory, word))
+    instrument.count('charts exported', len(words))
+    return len(words)
+
+
+# the store, canvas and settings of a worker process, set up once by start_worker
+_worker = {}
+
+
+def start_worker(filename, scheme, interval_method):
+    """
+    Loads the index of the data file in a worker process (the index file is
+    memory-mapped, so every worker shares the same pages).
+    """
+    _worker['word_data'] = biasbarsdata.FrequencyView(indexcache.load_word_data(filename))
+    _worker['canvas'] = SvgCanvas()
+    _worker['scheme'] = scheme
+    _worker['interval_method'] = interval_method
+
+
+def export_chunk(words, directory, review_counts=None):
+    """
+    Writes the charts of the given words in a worker process set up by
+    start_worker, with error bars worked out from review_counts (the
+    ReviewCounts of those words) if it is given.
+    """
+    word_confidence = None
+    if review_counts is not None:
+        word_confidence = confidence.WordConfidence(review_counts, _worker['interval_method'])
+    return export_words(_worker['word_data'], words, directory, _worker['scheme'], word_confidence,
+                        _worker['canvas'])
+
+
+@instrument.timed
+def export_vocabulary(filename, words, directory, scheme=None, interval_method=None, workers=None,
+                      chunk_size=CHUNK_WORDS):
+    """
+    Writes the charts of the given words from the given data file to
+    directory, in batches of chunk_size words spread over a pool of worker
+    processes. The index file is built first if it is missing or out of date,
+    so the workers all find it. Returns the number of charts written.
+
+    Input:
+        filename (str): name of the file holding professor review data
+        words (List[str]): the words to chart, all of which must be in the data
+        directory (str): the directory to write the SVG files to, made if missing
+        scheme (BucketScheme): how to cut the ratings into buckets, or None
+        interval_method (str): how to work out the error bars (see confidence.py), or None
+        workers (int): the number of processes to use (defaults to the CPU count);
+                       with 1 the charts are drawn in this process
+    """
+    os.makedirs(directory, exist_ok=True)
+    indexcache.load_word_data(filename)
+    # the reviews are counted once, here, for just the words being charted
+    review_counts = None
+    if interval_method:
+        review_counts = confidence.collect_review_counts(filename, vocabulary=set(words))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        start_worker(filename, scheme, interval_method)
+        return export_chunk(words, directory, review_counts)
+
+    chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+    chunk_counts = [review_counts.subset(chunk) if review_counts is not None else None for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                             initargs=(filename, scheme, interval_method)) as executor:
+        return sum(executor.map(export_chunk, chunks, [directory] * len(chunks), chunk_counts))
+
+
+def main():
+    args = instrument.take_flag(sys.argv[1:])
+    if len(args) == 0:
+        return
+    options = {'-workers': 0, '-top': TOP_K, '-words': None, '-output': OUTPUT_DIRECTORY, '-buckets': None,
+               '-intervals': None}
+    for flag, default in options.items():
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1] if default is None else type(default)(args[position + 1])
+            del args[position:position + 2]
+    filename = args[0]
+    scheme = biasbarsdata.BucketScheme.parse(options['-buckets']) if options['-buckets'] else None
+    # -intervals takes the same values as in biasbars.py, where off is the same as leaving it out
+    try:
+        interval_method = confidence.parse_method(options['-intervals']) if options['-intervals'] else None
+    except ValueError as error:
+        print(f"{error}\n{USAGE}")
+        return
+
+    word_data = indexcache.load_word_data(filename)
+    if options['-words'] is not None:
+        with open(options['-words']) as file:
+            wanted = [line.strip() for line in file if line.strip()]
+        words = [word for word in wanted if word in word_data]
+        if len(words) < len(wanted):
+            print(f"Skipping {len(wanted) - len(words)} words that are not in {filename}")
+    else:
+        words = [word for word, count in word_data.most_common(options['-top'])]
+
+    start = time.perf_counter()
+    workers = options['-workers'] or os.cpu_count() or 1
+    written = export_vocabulary(filename, words, options['-output'], scheme, interval_method, workers)
+    seconds = time.perf_counter() - start
+    print(f"Wrote {written} charts to {options['-output']} in {seconds:.1f} s "
+          f"({written / seconds:.0f} charts/s with {workers} worker(s))")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,680 @@
+"""
+File: confidence.py
+-------------------
+This file works out how far the differences shown in a chart can be trusted.
+A word used in a handful of reviews can give one gender a tall bar and the
+other none, so for every bar this finds a confidence interval for the word's
+frequency, and for every rating bucket an interval for the difference between
+the women's and the men's frequencies, along with a p-value for it.
+
+Everything is worked out from review-level counts: for each word and each
+(gender x rating) slot, how many reviews used the word once, how many used it
+twice, and so on (see collect_review_counts, which gathers them in one pass over
+a data file). There are two methods:
+
+    analytic    normal approximations, treating the reviews as independent draws;
+                instant, and close to the bootstrap once a word is in a few reviews
+    bootstrap   resamples the reviews for the intervals, with a Poisson bootstrap
+                (each review is weighted by a Poisson(1) draw, so the count of a word
+                in a bucket is one Poisson draw per distinct number of uses), and
+                shuffles the gender labels of the reviews in each bucket for
+                permutation-test p-values
+
+The results for a word are cached by WordConfidence, and score_vocabulary scores
+a whole vocabulary in a pool of processes within a time budget:
+
+    python confidence.py [-method bootstrap] [-budget seconds] [-workers n] [-buckets scheme] data_file
+    python confidence.py -word word data_file
+"""
+
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import biasbarsdata
+import instrument
+import reviewreader
+from wordstore import (GENDERS, KEY_WOMEN, KEY_MEN, NUM_RATINGS, HISTOGRAM_ROW_SIZE, PER_MILLION, THREE_BUCKETS,
+                       COUNT_TYPECODE, BucketScheme, rating_slot)
+
+ANALYTIC = 'analytic'
+BOOTSTRAP = 'bootstrap'
+METHODS = (ANALYTIC, BOOTSTRAP)
+OFF = 'off'                 # the -intervals value that turns the error bars off
+CONFIDENCE = 0.95
+REPLICATES = 1000           # bootstrap resamples (and label shuffles) per word in the GUI
+BATCH_REPLICATES = 200      # ... and per word when a whole vocabulary is scored
+BATCH_BUDGET = 60.0         # seconds
+CHUNK_WORDS = 50            # words scored per task in the process pool
+SEED = 106
+# Poisson and hypergeometric draws with a mean above these use their normal approximation
+POISSON_NORMAL_MEAN = 30
+HYPERGEOMETRIC_NORMAL_DRAWS = 50
+SIGNIFICANCE = 0.05
+# the number of times a word is used in one review is kept in the low bits of a packed tally key
+USES_BITS = 16
+MAX_USES = (1 << USES_BITS) - 1
+TOP_K = 10
+
+
+class ReviewCounts:
+    """
+    The review-level counts resampling needs: for each word, the number of
+    reviews in each (gender x rating) slot that used it each number of times,
+    and for each slot and gender the number of reviews and words.
+
+    Like a WordStore, each word has a row id. The counts are kept as one flat
+    array of (slot, uses, reviews) entries sorted by row, with the index of
+    the first entry of every row in a second array, so only the slots and
+    numbers of uses that occur take any space. Reviews added since the arrays
+    were last built are tallied in a dictionary and folded in when the counts
+    are next read.
+
+    >>> counts = ReviewCounts()
+    >>> counts.add('W', 5.0, ['best', 'best', 'class'])
+    >>> counts.add('W', 4.5, ['best'])
+    >>> counts.add('M', 1.0, ['worst', 'class'])
+    >>> counts.bucket_uses('best', 'W')
+    [{}, {}, {1: 1, 2: 1}]
+    >>> counts.bucket_reviews('M'), counts.tokens, counts.squared_tokens
+    ([1, 0, 0], {'W': 4, 'M': 2}, {'W': 10, 'M': 4})
+    >>> sub = counts.subset(['class'])
+    >>> list(sub), sub.bucket_uses('class', 'M'), sub.bucket_reviews('W')
+    (['class'], [{1: 1}, {}, {}], [0, 0, 2])
+    """
+
+    def __init__(self):
+        self._words = []
+        self._rows = {}
+        self._entries = array(COUNT_TYPECODE)   # (slot, uses, reviews) triples, sorted by row, slot and uses
+        self._starts = array(COUNT_TYPECODE, [0])     # index of the first triple of each row, and of the end
+        self._pending = {}          # (row, slot, uses) packed into one int -> reviews not yet in the arrays
+        self.reviews = [0] * HISTOGRAM_ROW_SIZE     # reviews per (gender x rating) slot
+        self.tokens = {gender: 0 for gender in GENDERS}
+        self.squared_tokens = {gender: 0 for gender in GENDERS}
+
+    def add(self, gender, rating, words, vocabulary=None):
+        """
+        Records one review with the given gender key, rating and list of words,
+        keeping the counts of only the words in vocabulary, if it is given.
+        """
+        slot = GENDERS.index(gender) * NUM_RATINGS + rating_slot(rating)
+        self.reviews[slot] += 1
+        self.tokens[gender] += len(words)
+        self.squared_tokens[gender] += len(words) * len(words)
+        rows = self._rows
+        pending = self._pending
+        for word, uses in Counter(words).items():
+            row = rows.get(word)
+            if row is None:
+                if vocabulary is not None and word not in vocabulary:
+                    continue
+                row = rows[word] = len(self._words)
+                self._words.append(word)
+            key = ((row * HISTOGRAM_ROW_SIZE + slot) << USES_BITS) | min(uses, MAX_USES)
+            pending[key] = pending.get(key, 0) + 1
+
+    def _compact(self):
+        """
+        Folds the pending tallies into the arrays of entries.
+        """
+        if not self._pending:
+            return
+        tallies = self._pending
+        entries = self._entries
+        for row in range(len(self._starts) - 1):
+            for i in range(self._starts[row] * 3, self._starts[row + 1] * 3, 3):
+                key = ((row * HISTOGRAM_ROW_SIZE + entries[i]) << USES_BITS) | entries[i + 1]
+                tallies[key] = tallies.get(key, 0) + entries[i + 2]
+        entries = array(COUNT_TYPECODE)
+        starts = array(COUNT_TYPECODE, [0] * (len(self._words) + 1))
+        for key in sorted(tallies):
+            row, slot = divmod(key >> USES_BITS, HISTOGRAM_ROW_SIZE)
+            entries.extend((slot, key & MAX_USES, tallies[key]))
+            starts[row + 1] += 1
+        for row in range(len(self._words)):
+            starts[row + 1] += starts[row]
+        self._entries = entries
+        self._starts = starts
+        self._pending = {}
+
+    def entries(self, word):
+        """
+        Returns the (slot, uses, reviews) triples of word, in slot and uses order.
+        """
+        row = self._rows.get(word)
+        if row is None:
+            return []
+        self._compact()
+        entries = self._entries
+        return [(entries[i], entries[i + 1], entries[i + 2])
+                for i in range(self._starts[row] * 3, self._starts[row + 1] * 3, 3)]
+
+    def bucket_uses(self, word, gender, scheme=THREE_BUCKETS):
+        """
+        Returns one {uses: reviews} histogram per bucket of the given scheme,
+        counting the given gender's reviews that used word each number of times.
+        """
+        base = GENDERS.index(gender) * NUM_RATINGS
+        bucket_of = [index for index, (start, end) in enumerate(scheme.slot_ranges()) for slot in range(start, end)]
+        buckets = [{} for i in range(len(scheme))]
+        for slot, uses, reviews in self.entries(word):
+            if base <= slot < base + NUM_RATINGS:
+                bucket = buckets[bucket_of[slot - base]]
+                bucket[uses] = bucket.get(uses, 0) + reviews
+        return buckets
+
+    def bucket_reviews(self, gender, scheme=THREE_BUCKETS):
+        """
+        Returns the number of the given gender's reviews in each bucket of the given scheme.
+        """
+        base = GENDERS.index(gender) * NUM_RATINGS
+        return scheme.regroup(self.reviews[base:base + NUM_RATINGS])
+
+    def subset(self, words):
+        """
+        Returns a ReviewCounts with the same review totals but only the given
+        words, which is all a worker process scoring those words needs.
+        """
+        counts = ReviewCounts()
+        for word in words:
+            entries = self.entries(word)
+            if not entries:
+                continue
+            counts._rows[word] = len(counts._words)
+            counts._words.append(word)
+            for entry in entries:
+                counts._entries.extend(entry)
+            counts._starts.append(len(counts._entries) // 3)
+        counts.reviews = list(self.reviews)
+        counts.tokens = dict(self.tokens)
+        counts.squared_tokens = dict(self.squared_tokens)
+        return counts
+
+    def most_used(self):
+        """
+        Returns every word, from the one in the most reviews to the one in the fewest.
+        """
+        self._compact()
+        entries = self._entries
+        starts = self._starts
+        reviews = [sum(entries[starts[row] * 3 + 2:starts[row + 1] * 3:3]) for row in range(len(self._words))]
+        return [self._words[row] for row in sorted(range(len(reviews)), key=reviews.__getitem__, reverse=True)]
+
+    def nbytes(self):
+        """
+        Returns the number of bytes taken by the arrays of entries.
+        """
+        self._compact()
+        return (len(self._entries) + len(self._starts)) * self._entries.itemsize
+
+    def __contains__(self, word):
+        return word in self._rows
+
+    def __iter__(self):
+        return iter(self._words)
+
+    def __len__(self):
+        return len(self._words)
+
+
+def parse_method(text):
+    """
+    Returns the interval method named by the value of an -intervals flag:
+    ANALYTIC or BOOTSTRAP, or None when the value is OFF.
+
+    >>> parse_method('bootstrap'), parse_method('off')
+    ('bootstrap', None)
+    >>> parse_method('exact')
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown interval method exact, expected one of analytic, bootstrap, off
+    """
+    if text == OFF:
+        return None
+    if text not in METHODS:
+        raise ValueError(f"unknown interval method {text}, expected one of {', '.join(METHODS + (OFF,))}")
+    return text
+
+
+@instrument.timed
+def collect_review_counts(filename, review_counts=None, n=1, vocabulary=None):
+    """
+    Returns the ReviewCounts of the reviews in the given file (of the phrases
+    of n words in them when n > 1), adding them to review_counts if it is given.
+    If vocabulary is given (such as the WordStore of the file, which may have
+    been pruned), only the counts of the words in it are kept.
+
+    >>> counts = collect_review_counts('data/small-three.txt')
+    >>> counts.bucket_uses('best', 'W'), counts.bucket_uses('best', 'M')
+    ([{}, {}, {3: 1}], [{1: 1}, {}, {}])
+    >>> list(collect_review_counts('data/small-three.txt', vocabulary={'not'}))
+    ['not']
+    """
+    if review_counts is None:
+        review_counts = ReviewCounts()
+    with reviewreader.open_reviews(filename) as buffer:
+        for rating, gender, comment_start, comment_end in reviewreader.iter_reviews(buffer):
+            words = reviewreader.comment_words(buffer, comment_start, comment_end)
+            review_counts.add(biasbarsdata.convert_gender_to_key(gender), rating, biasbarsdata.word_ngrams(words, n), vocabulary)
+    review_counts._compact()
+    return review_counts
+
+
+def critical_value(confidence):
+    """
+    Returns the number of standard deviations either side of the mean that
+    hold the given fraction of a normal distribution.
+
+    >>> round(critical_value(0.95), 3)
+    1.96
+    """
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def percentile_interval(samples, confidence):
+    """
+    Returns the (low, high) bounds holding the middle confidence fraction of samples.
+
+    >>> percentile_interval(list(range(101)), 0.9)
+    (5, 95)
+    """
+    ordered = sorted(samples)
+    tail = (1 - confidence) / 2
+    last = len(ordered) - 1
+    return ordered[round(tail * last)], ordered[round((1 - tail) * last)]
+
+
+def poisson(generator, mean):
+    """
+    Returns a draw from the Poisson distribution with the given mean, using
+    its normal approximation for large means.
+    """
+    if mean > POISSON_NORMAL_MEAN:
+        return max(0, round(generator.gauss(mean, math.sqrt(mean))))
+    # multiplies uniform draws until the product falls below exp(-mean)
+    limit = math.exp(-mean)
+    draws = 0
+    product = generator.random()
+    while product > limit:
+        draws += 1
+        product *= generator.random()
+    return draws
+
+
+def hypergeometric(generator, population, successes, draws):
+    """
+    Returns the number of successes among draws made without replacement from
+    a population holding the given number of successes, drawing one at a time
+    for a few draws and using the normal approximation for many.
+
+    >>> hypergeometric(random.Random(0), 10, 10, 4), hypergeometric(random.Random(0), 10, 0, 4)
+    (4, 0)
+    """
+    if draws <= HYPERGEOMETRIC_NORMAL_DRAWS:
+        found = 0
+        for i in range(draws):
+            if generator.random() * population < successes:
+                found += 1
+                successes -= 1
+            population -= 1
+        return found
+    share = successes / population
+    variance = draws * share * (1 - share) * (population - draws) / max(population - 1, 1)
+    found = round(generator.gauss(draws * share, math.sqrt(variance)))
+    return min(max(found, draws - (population - successes), 0), draws, successes)
+
+
+def word_uses(review_counts, word, scheme):
+    """
+    Returns {gender: one {uses: reviews} histogram per bucket} for word.
+    """
+    return {gender: review_counts.bucket_uses(word, gender, scheme) for gender in GENDERS}
+
+
+def point_estimates(review_counts, uses):
+    """
+    Returns {gender: the frequency of the word in each bucket, per million words}.
+    """
+    return {gender: [sum(k * n for k, n in bucket.items()) * PER_MILLION / review_counts.tokens[gender]
+                     if review_counts.tokens[gender] else 0.0 for bucket in uses[gender]]
+            for gender in GENDERS}
+
+
+def make_result(frequencies, intervals, difference_intervals, p_values):
+    """
+    Returns the dictionary describing the confidence of one word's chart.
+    """
+    return {
+        'frequencies': frequencies,
+        'intervals': intervals,
+        'differences': [w - m for w, m in zip(frequencies[KEY_WOMEN], frequencies[KEY_MEN])],
+        'difference_intervals': difference_intervals,
+        'p_values': p_values,
+    }
+
+
+def analytic_confidence(review_counts, word, scheme=THREE_BUCKETS, confidence=CONFIDENCE):
+    """
+    Returns the confidence of the chart of word from normal approximations:
+    a review using the word k times adds k to its count, so the variance of a
+    count is the sum of k squared over its reviews, and the variance of a
+    gender's total words is the sum of the squared review lengths.
+
+    Returns:
+        result (dict): 'frequencies', 'intervals' and 'differences' per gender
+                       and bucket (per million words), and per bucket the
+                       'difference_intervals' (women minus men) and 'p_values'
+
+    >>> counts = collect_review_counts('data/small-three.txt')
+    >>> result = analytic_confidence(counts, 'best')
+    >>> [round(value) for value in result['differences']]
+    [-142857, 0, 1000000]
+    >>> [round(value, 3) for value in result['p_values']]
+    [0.416, 1.0, 0.48]
+    """
+    z = critical_value(confidence)
+    uses = word_uses(review_counts, word, scheme)
+    frequencies = point_estimates(review_counts, uses)
+    variances = {}
+    intervals = {}
+    for gender in GENDERS:
+        tokens = review_counts.tokens[gender]
+        variances[gender] = []
+        for bucket, frequency in zip(uses[gender], frequencies[gender]):
+            # the delta method for the ratio of the word's count to the gender's total words
+            count_variance = sum(k * k * n for k, n in bucket.items())
+            share = frequency / PER_MILLION
+            variance = ((count_variance + share * share * review_counts.squared_tokens[gender]) / (tokens * tokens)
+                        * PER_MILLION * PER_MILLION if tokens else 0.0)
+            variances[gender].append(variance)
+        intervals[gender] = [(max(frequency - z * math.sqrt(variance), 0.0), frequency + z * math.sqrt(variance))
+                             for frequency, variance in zip(frequencies[gender], variances[gender])]
+
+    difference_intervals = []
+    p_values = []
+    for i in range(len(scheme)):
+        difference = frequencies[KEY_WOMEN][i] - frequencies[KEY_MEN][i]
+        deviation = math.sqrt(variances[KEY_WOMEN][i] + variances[KEY_MEN][i])
+        difference_intervals.append((difference - z * deviation, difference + z * deviation))
+        p_values.append(math.erfc(abs(difference) / (deviation * math.sqrt(2))) if deviation else 1.0)
+    return make_result(frequencies, intervals, difference_intervals, p_values)
+
+
+def bootstrap_confidence(review_counts, word, scheme=THREE_BUCKETS, confidence=CONFIDENCE,
+                         replicates=REPLICATES, permutations=REPLICATES, seed=SEED):
+    """
+    Returns the confidence of the chart of word, in the form analytic_confidence
+    gives it, with percentile intervals from replicates Poisson bootstrap
+    resamples of the reviews and p-values from permutations shuffles of the
+    gender labels of the reviews in each bucket. The draws are seeded by seed
+    and word, so a word gets the same result however the words are batched.
+
+    >>> counts = collect_review_counts('data/small-three.txt')
+    >>> result = bootstrap_confidence(counts, 'best', replicates=200, permutations=200)
+    >>> result['intervals']['M'][0][0], result['intervals']['W'][2][0]
+    (0.0, 0.0)
+    >>> bootstrap_confidence(counts, 'best', replicates=200, permutations=200) == result
+    True
+    """
+    generator = random.Random(f"{seed}:{word}")
+    uses = word_uses(review_counts, word, scheme)
+    frequencies = point_estimates(review_counts, uses)
+
+    # draws every gender's resampled frequencies in every bucket, one resample of the reviews at a time
+    samples = {gender: [[] for bucket in uses[gender]] for gender in GENDERS}
+    for r in range(replicates):
+        for gender in GENDERS:
+            # the total words of a resample is a sum over every review, so its normal approximation is used
+            tokens = review_counts.tokens[gender]
+            tokens = max(generator.gauss(tokens, math.sqrt(review_counts.squared_tokens[gender])), 1.0)
+            scale = PER_MILLION / tokens
+            for bucket, bucket_samples in zip(uses[gender], samples[gender]):
+                count = 0
+                for k, n in bucket.items():
+                    count += k * poisson(generator, n)
+                bucket_samples.append(count * scale)
+    intervals = {gender: [percentile_interval(bucket_samples, confidence) for bucket_samples in samples[gender]]
+                 for gender in GENDERS}
+    difference_intervals = [percentile_interval([w - m for w, m in zip(women, men)], confidence)
+                            for women, men in zip(samples[KEY_WOMEN], samples[KEY_MEN])]
+
+    women_reviews = review_counts.bucket_reviews(KEY_WOMEN, scheme)
+    men_reviews = review_counts.bucket_reviews(KEY_MEN, scheme)
+    women_scale = PER_MILLION / max(review_counts.tokens[KEY_WOMEN], 1)
+    men_scale = PER_MILLION / max(review_counts.tokens[KEY_MEN], 1)
+    p_values = []
+    for i in range(len(scheme)):
+        # pools the reviews of the bucket that used the word, by how many times they used it
+        pooled = Counter(uses[KEY_WOMEN][i])
+        pooled.update(uses[KEY_MEN][i])
+        if not pooled:
+            p_values.append(1.0)
+            continue
+        total = sum(k * n for k, n in pooled.items())
+        observed = abs(frequencies[KEY_WOMEN][i] - frequencies[KEY_MEN][i])
+        # a little slack, so shuffles that match the observed difference are not lost to rounding
+        threshold = observed * (1 - 1e-9)
+        extreme = 0
+        for p in range(permutations):
+            # deals the bucket's women labels out at random, one group of reviews at a time
+            population = women_reviews[i] + men_reviews[i]
+            remaining = women_reviews[i]
+            women_count = 0
+            for k, n in pooled.items():
+                found = hypergeometric(generator, population, remaining, n)
+                women_count += k * found
+                remaining -= found
+                population -= n
+            if abs(women_count * women_scale - (total - women_count) * men_scale) >= threshold:
+                extreme += 1
+        p_values.append((extreme + 1) / (permutations + 1))
+    return make_result(frequencies, intervals, difference_intervals, p_values)
+
+
+def score_words(review_counts, words, scheme=THREE_BUCKETS, method=ANALYTIC, confidence=CONFIDENCE,
+                replicates=REPLICATES, seed=SEED):
+    """
+    Returns {word: result} for each of the given words in review_counts, with
+    the results of analytic_confidence or bootstrap_confidence. This is the
+    task each worker process of score_vocabulary runs on a batch of words.
+
+    >>> counts = collect_review_counts('data/small-three.txt')
+    >>> list(score_words(counts, ['best', 'missing', 'average']))
+    ['best', 'average']
+    """
+    results = {}
+    for word in words:
+        if word not in review_counts:
+            continue
+        if method == BOOTSTRAP:
+            results[word] = bootstrap_confidence(review_counts, word, scheme, confidence, replicates, replicates, seed)
+        else:
+            results[word] = analytic_confidence(review_counts, word, scheme, confidence)
+    instrument.count('words scored', len(results))
+    return results
+
+
+@instrument.timed
+def score_vocabulary(review_counts, words=None, scheme=THREE_BUCKETS, method=BOOTSTRAP, budget=BATCH_BUDGET,
+                     workers=None, confidence=CONFIDENCE, replicates=BATCH_REPLICATES, seed=SEED,
+                     chunk_size=CHUNK_WORDS):
+    """
+    Scores the given words (every word, from the most used, when None) in
+    batches of chunk_size words spread over a pool of worker processes, for at
+    most about budget seconds. Only a couple of batches per worker are queued
+    at a time, so the batches not yet started when the budget runs out are
+    dropped, and the words are scored in order of priority.
+
+    Input:
+        review_counts (ReviewCounts): the review-level counts of the data file
+        words (List[str]): the words to score, most important first, or None
+        scheme (BucketScheme): how to cut the ratings into buckets
+        method (str): ANALYTIC or BOOTSTRAP
+        budget (float): the number of seconds to stop starting new batches after
+        workers (int): the number of processes to use (defaults to the CPU count);
+                       with 1 the words are scored in this process
+
+    Returns:
+        results (dict): word -> result, in the order of words, for the words scored in time
+
+    >>> counts = collect_review_counts('data/small-three.txt')
+    >>> sorted(score_vocabulary(counts, method=ANALYTIC, workers=1))
+    ['average', 'best', 'not']
+    """
+    if words is None:
+        words = review_counts.most_used()
+    workers = workers or os.cpu_count() or 1
+    deadline = time.perf_counter() + budget
+    chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+    settings = (scheme, method, confidence, replicates, seed)
+    results = {}
+
+    if workers == 1:
+        for chunk in chunks:
+            if time.perf_counter() >= deadline:
+                break
+            results.update(score_words(review_counts, chunk, *settings))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            queued = iter(chunks)
+            pending = set()
+            while True:
+                while len(pending) < 2 * workers and time.perf_counter() < deadline:
+                    chunk = next(queued, None)
+                    if chunk is None:
+                        break
+                    pending.add(executor.submit(score_words, review_counts.subset(chunk), chunk, *settings))
+                if not pending:
+                    break
+                done, pending = wait(pending, max(deadline - time.perf_counter(), 0), FIRST_COMPLETED)
+                for future in done:
+                    results.update(future.result())
+                if time.perf_counter() >= deadline:
+                    for future in pending:
+                        future.cancel()
+                    # the batches already running are short, so they are finished and kept
+                    for future in pending:
+                        if not future.cancelled():
+                            results.update(future.result())
+                    break
+    return {word: results[word] for word in words if word in results}
+
+
+class WordConfidence:
+    """
+    Works out the confidence of the chart of each word plotted, by the given
+    method, keeping every result so a word plotted again costs nothing.
+
+    >>> confidence = WordConfidence(collect_review_counts('data/small-three.txt'))
+    >>> confidence.result('best') is confidence.result('best'), confidence.result('missing')
+    (True, None)
+    >>> [[round(high) for low, high in confidence.intervals('average')['M']]]
+    [[486944, 1460831, 0]]
+    """
+
+    def __init__(self, review_counts, method=ANALYTIC, confidence=CONFIDENCE, replicates=REPLICATES, seed=SEED):
+        if method not in METHODS:
+            raise ValueError(f"unknown method {method}, expected one of {', '.join(METHODS)}")
+        self.review_counts = review_counts
+        self.method = method
+        self.confidence = confidence
+        self.replicates = replicates
+        self.seed = seed
+        self._cache = {}        # (word, bucket edges) -> result
+
+    @instrument.timed
+    def result(self, word, scheme=None):
+        """
+        Returns the result for word (as analytic_confidence describes it) with
+        the ratings cut by the given scheme, or None if word is not in any review.
+        """
+        scheme = scheme or THREE_BUCKETS
+        key = (word, scheme.edges)
+        if key not in self._cache:
+            self._cache[key] = score_words(self.review_counts, [word], scheme, self.method, self.confidence,
+                                           self.replicates, self.seed).get(word)
+        else:
+            instrument.count('confidence cache hits')
+        return self._cache[key]
+
+    def intervals(self, word, scheme=None):
+        """
+        Returns {gender: [(low, high) for each bucket]} for word, the error bars
+        of its chart, or None if word is not in any review.
+        """
+        result = self.result(word, scheme)
+        return None if result is None else result['intervals']
+
+
+def format_result(word, result, labels):
+    """
+    Returns a table of the differences between women and men in each bucket
+    of the chart of word, with their confidence intervals and p-values.
+    """
+    lines = [f"{word}: women minus men, per million words"]
+    for label, difference, (low, high), p_value in zip(labels, result['differences'],
+                                                       result['difference_intervals'], result['p_values']):
+        lines.append(f"  {label:16s} {difference:+10.1f}  ({low:+.1f} to {high:+.1f})  p = {p_value:.3g}")
+    return '\n'.join(lines)
+
+
+def format_significant(results, labels, k=TOP_K, significance=SIGNIFICANCE):
+    """
+    Returns, for each bucket, the k words whose difference between women and
+    men has the smallest p-value below significance (ties going to the larger
+    difference), as printable text.
+    """
+    lines = []
+    for i, label in enumerate(labels):
+        ranked = sorted(((result['p_values'][i], -abs(result['differences'][i]), word)
+                         for word, result in results.items() if result['p_values'][i] < significance))
+        lines.append(f"{label}: {len(ranked)} words with p < {significance}")
+        for p_value, negative, word in ranked[:k]:
+            result = results[word]
+            low, high = result['difference_intervals'][i]
+            lines.append(f"  {word:20s} {result['differences'][i]:+10.1f}  ({low:+.1f} to {high:+.1f})"
+                         f"  p = {p_value:.3g}")
+    return '\n'.join(lines)
+
+
+def main():
+    args = instrument.take_flag(sys.argv[1:])
+    if len(args) == 0:
+        return
+    # -method, -budget, -workers and -buckets change how the vocabulary is scored,
+    # and -word scores a single word instead
+    options = {'-method': BOOTSTRAP, '-budget': BATCH_BUDGET, '-workers': None, '-buckets': '3', '-word': None}
+    for flag, default in options.items():
+        if flag in args:
+            position = args.index(flag)
+            options[flag] = args[position + 1] if default is None else type(default)(args[position + 1])
+            del args[position:position + 2]
+    filename = args[0]
+    scheme = BucketScheme.parse(options['-buckets'])
+
+    review_counts = collect_review_counts(filename)
+    if options['-word'] is not None:
+        confidence = WordConfidence(review_counts, options['-method'])
+        result = confidence.result(options['-word'], scheme)
+        print(f"{options['-word']} is not in any review" if result is None
+              else format_result(options['-word'], result, scheme.labels))
+        return
+
+    start = time.perf_counter()
+    workers = int(options['-workers']) if options['-workers'] else None
+    results = score_vocabulary(review_counts, scheme=scheme, method=options['-method'],
+                               budget=options['-budget'], workers=workers)
+    print(f"Scored {len(results)} of {len(review_counts)} words by the {options['-method']} method "
+          f"in {time.perf_counter() - start:.1f} s")
+    print(format_significant(results, scheme.labels))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+File: indexcache.py
+-------------------
+This file saves a compiled WordStore to disk so that a data file only has to be
+parsed the first time it is loaded. The index file holds the vocabulary, the counts
+array, the histograms of ratings and the per-gender totals, and on later runs it is
+memory-mapped so the arrays are used straight from the page cache without being
+copied or re-parsed.
+
+Each index records the path, size, modification time and SHA-256 hash of the data
+file it was built from, and it is rebuilt automatically when the data file changes.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import biasbarsdata
+import instrument
+from wordstore import WordStore, ReviewStats, COUNT_TYPECODE, ROW_SIZE, HISTOGRAM_ROW_SIZE
+
+CACHE_DIRNAME = ".biasbars_cache"
+INDEX_SUFFIX = ".idx"
+MAGIC = b"BBINDEX3"
+HEADER_LENGTH = struct.Struct("<I")
+ALIGNMENT = 8
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def cache_path(filename):
+    """
+    Returns the path of the index file for the given data file, which lives in
+    a cache directory next to the data file.
+
+    >>> cache_path('data/full-data.txt') == os.path.join('data', '.biasbars_cache', 'full-data.txt.idx')
+    True
+    """
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, CACHE_DIRNAME, name + INDEX_SUFFIX)
+
+
+def hash_file(filename):
+    """
+    Returns the hex SHA-256 digest of the contents of the given file.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        block = file.read(HASH_BLOCK_SIZE)
+        while block:
+            digest.update(block)
+            block = file.read(HASH_BLOCK_SIZE)
+    return digest.hexdigest()
+
+
+def source_key(filename, content_hash=None):
+    """
+    Returns the dictionary identifying the current version of a data file.
+    The content hash is only computed when it is not passed in.
+    """
+    stat = os.stat(filename)
+    return {
+        'source': os.path.abspath(filename),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': content_hash or hash_file(filename),
+    }
+
+
+@instrument.timed
+def write_index(word_data, filename, index_filename=None):
+    """
+    Writes the given WordStore, built from the data file filename, to its
+    index file. The file is written under a temporary name and then renamed
+    so a reader never sees a partially written index.
+
+    Input:
+        word_data (WordStore): the counts read from filename
+        filename (str): name of the data file the counts were read from
+        index_filename (str): where to write the index (defaults to cache_path(filename))
+    """
+    index_filename = index_filename or cache_path(filename)
+    counts = word_data.buffer()
+    # histograms that do not match the counts are of no use, so they are only saved when complete
+    histograms = word_data.histogram_buffer() if word_data.has_histograms() else b''
+    vocabulary = '\n'.join(word_data.words()).encode('utf-8')
+    header = source_key(filename)
+    header.update({
+        'words': len(word_data),
+        'totals': word_data.totals(),
+        'review_stats': word_data.review_stats.to_dict(),
+        'histograms': word_data.has_histograms(),
+        'typecode': counts.typecode if hasattr(counts, 'typecode') else counts.format,
+        'itemsize': counts.itemsize,
+        'byteorder': sys.byteorder,
+        'vocabulary_length': len(vocabulary),
+    })
+    header = json.dumps(header).encode('utf-8')
+
+    # the counts start on an aligned offset so they can be cast straight from the mapped file
+    prefix_length = len(MAGIC) + HEADER_LENGTH.size + len(header) + len(vocabulary)
+    padding = -prefix_length % ALIGNMENT
+
+    os.makedirs(os.path.dirname(index_filename) or '.', exist_ok=True)
+    temp_filename = f"{index_filename}.{os.getpid()}.tmp"
+    with open(temp_filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(HEADER_LENGTH.pack(len(header)))
+        file.write(header)
+        file.write(vocabulary)
+        file.write(bytes(padding))
+        file.write(memoryview(counts).cast('B'))
+        file.write(memoryview(histograms).cast('B'))
+    os.replace(temp_filename, index_filename)
+
+
+def update_header(index_filename, header, header_length):
+    """
+    Rewrites the header of an index file in place, padded with spaces to its
+    old length. Nothing is written if the new header is longer, or if the
+    index file cannot be written; the index is then just checked again later.
+    """
+    encoded = json.dumps(header).encode('utf-8')
+    if len(encoded) > header_length:
+        return
+    try:
+        with open(index_filename, 'r+b') as file:
+            file.seek(len(MAGIC) + HEADER_LENGTH.size)
+            file.write(encoded.ljust(header_length))
+    except OSError:
+        pass
+
+
+@instrument.timed
+def read_index(filename, index_filename=None):
+    """
+    Memory-maps the index file for the given data file and returns a read-only
+    WordStore backed by it, or None if there is no usable index or the data
+    file has changed since the index was built.
+
+    The size and modification time are checked first. The data file is only
+    hashed when its modification time differs, so a file that was touched but
+    not changed does not cause a rebuild.
+
+    >>> import tempfile
+    >>> index_filename = os.path.join(tempfile.mkdtemp(), 'small-three.idx')
+    >>> word_data = read_index('data/small-three.txt', index_filename)
+    >>> print(word_data)
+    None
+    >>> write_index(biasbarsdata.read_file('data/small-three.txt'), 'data/small-three.txt', index_filename)
+    >>> word_data = read_index('data/small-three.txt', index_filename)
+    >>> word_data
+    {'average': {'W': [0, 0, 0], 'M': [1, 3, 0]}, 'best': {'W': [0, 0, 3], 'M': [1, 0, 0]}, 'not': {'W': [0, 0, 0], 'M': [2, 0, 0]}}
+    >>> word_data.has_histograms(), word_data.histogram('best', 'W')
+    (True, [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3])
+
+    After the data file is touched, its hash is checked once and the new time recorded.
+
+    >>> import shutil
+    >>> data_filename = shutil.copy('data/small-three.txt', os.path.dirname(index_filename))
+    >>> write_index(word_data, data_filename, index_filename)
+    >>> os.utime(data_filename, ns=(0, 10 ** 18))
+    >>> read_index(data_filename, index_filename) == word_data
+    True
+    >>> with open(index_filename, 'rb') as file:
+    ...     data = file.read()
+    >>> length, = HEADER_LENGTH.unpack_from(data, len(MAGIC))
+    >>> json.loads(data[len(MAGIC) + HEADER_LENGTH.size:][:length])['mtime_ns']
+    1000000000000000000
+    """
+    index_filename = index_filename or cache_path(filename)
+    try:
+        with open(index_filename, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        word_data = store_from_index(filename, index_filename, mapped)
+    except Exception:
+        mapped.close()
+        raise
+    if word_data is None:
+        # nothing refers to the mapping of a rejected index, so it is closed now rather than left open
+        mapped.close()
+    return word_data
+
+
+def store_from_index(filename, index_filename, mapped):
+    """
+    Returns the read-only WordStore held in mapped, the memory-mapped index
+    file for the given data file, or None if the index is unusable or out of
+    date (see read_index). When None is returned nothing refers to mapped any
+    more, so it can be closed.
+    """
+    if mapped[:len(MAGIC)] != MAGIC:
+        return None
+    position = len(MAGIC)
+    header_length, = HEADER_LENGTH.unpack_from(mapped, position)
+    position += HEADER_LENGTH.size
+    try:
+        header = json.loads(mapped[position:position + header_length])
+    except ValueError:
+        return None
+    position += header_length
+
+    if (header['typecode'] != COUNT_TYPECODE or header['byteorder'] != sys.byteorder
+            or header['source'] != os.path.abspath(filename)):
+        return None
+    stat = os.stat(filename)
+    if stat.st_size != header['size']:
+        return None
+    if stat.st_mtime_ns != header['mtime_ns']:
+        if hash_file(filename) != header['sha256']:
+            return None
+        # the file was touched but not changed, so the new time is recorded to skip hashing next time
+        header['mtime_ns'] = stat.st_mtime_ns
+        update_header(index_filename, header, header_length)
+
+    vocabulary = mapped[position:position + header['vocabulary_length']].decode('utf-8')
+    words = vocabulary.split('\n') if header['words'] else []
+    position += header['vocabulary_length']
+    position += -position % ALIGNMENT
+
+    counts_length = header['words'] * ROW_SIZE * header['itemsize']
+    histograms_length = header['words'] * HISTOGRAM_ROW_SIZE * header['itemsize'] if header['histograms'] else 0
+    arrays = memoryview(mapped)[position:]
+    if len(arrays) != counts_length + histograms_length:
+        arrays.release()
+        return None
+    counts = arrays[:counts_length].cast(COUNT_TYPECODE)
+    histograms = arrays[counts_length:].cast(COUNT_TYPECODE) if header['histograms'] else None
+    return WordStore(counts, words, header['totals'], ReviewStats.from_dict(header['review_stats']), histograms)
+
+
+@instrument.timed
+def load_word_data(filename, word_data=None, progress=None):
+    """
+    Returns the WordStore for the given data file, using its index file when
+    it is up to date. Otherwise the data file is read with read_file and a
+    new index is written for next time. The returned store may be read-only.
+
+    When the data file has to be read, the counts are added to word_data if
+    it is given (so another thread can search it while it fills up) and
+    progress is called as the file is read; see biasbarsdata.read_file.
+    The index file only holds the counts, so the reviews each word is in are
+    indexed separately, once the store is in use (see biasbarsdata.index_reviews).
+
+    Input:
+        filename (str): name of the file holding professor review data
+        word_data (WordStore): an empty store to read into, or None
+        progress (function): called as progress(bytes_read, bytes_total), or None
+    """
+    cached = read_index(filename)
+    if cached is not None:
+        instrument.count('index cache hits')
+        return cached
+    instrument.count('index cache misses')
+    word_data = biasbarsdata.read_file(filename, word_data=word_data, progress=progress)
+    try:
+        write_index(word_data, filename)
+    except OSError:
+        # the cache is only an optimization, so an unwritable directory is not an error
+        pass
+    return word_data
@@ -0,0 +1,175 @@
+"""
+File: instrument.py
+-------------------
+This file defines the optional instrumentation of the Bias Bars programs:
+counters (reviews parsed, words counted, unique words, malformed lines, ...),
+timers around the slow stages (loading, searching, plotting, ...), and whole
+program cProfile and tracemalloc captures. A summary is printed to stderr when
+the program exits.
+
+Instrumentation is off unless it is switched on, either with the environment
+variable BIASBARS_INSTRUMENT or with the -instrument command line flag of
+biasbars.py and biasbarsdata.py. Either one takes a comma separated list of
+what to capture on top of the counters and timers:
+
+    BIASBARS_INSTRUMENT=1 python biasbars.py
+    python biasbarsdata.py -instrument=profile,memory data/full-data.txt
+
+When it is off, count() returns at once, timed functions pay one flag check
+per call, and nothing is recorded, so the hot paths run as before.
+"""
+
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+ENV_VAR = 'BIASBARS_INSTRUMENT'
+FLAG = '-instrument'
+REPORT_LINES = 20
+
+enabled = False
+counters = Counter()
+timings = {}                # stage name -> [number of calls, total seconds]
+_lock = threading.Lock()
+_profiler = None
+
+
+def configure(spec):
+    """
+    Switches instrumentation on, as described by spec: any non-empty string
+    turns on the counters and timers, and the words 'profile' and 'memory'
+    in it also start cProfile and tracemalloc. The report is printed at exit.
+    An empty spec leaves instrumentation off.
+
+    >>> configure('')
+    >>> enabled
+    False
+    """
+    global enabled, _profiler
+    if not spec or enabled:
+        return
+    enabled = True
+    captures = {part.strip() for part in spec.split(',')}
+    if 'memory' in captures:
+        tracemalloc.start()
+    if 'profile' in captures:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(report)
+
+
+def take_flag(args):
+    """
+    Returns args without the -instrument flag, switching instrumentation on
+    (with the captures given after an = sign) if the flag was there.
+
+    >>> take_flag(['data/full-data.txt'])
+    ['data/full-data.txt']
+    """
+    rest = []
+    for arg in args:
+        if arg == FLAG or arg.startswith(FLAG + '='):
+            configure(arg.partition('=')[2] or 'on')
+        else:
+            rest.append(arg)
+    return rest
+
+
+def count(name, amount=1):
+    """
+    Adds amount to the named counter, if instrumentation is on.
+    """
+    if enabled:
+        with _lock:
+            counters[name] += amount
+
+
+def record(name, seconds):
+    """
+    Adds one call taking the given number of seconds to the named stage.
+    """
+    with _lock:
+        calls = timings.setdefault(name, [0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+
+
+@contextmanager
+def timer(name):
+    """
+    Context manager that times its block as one call of the named stage, if
+    instrumentation is on.
+    """
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(function):
+    """
+    Decorator that times every call of function as a stage named after it,
+    if instrumentation is on when the call is made.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+    return wrapper
+
+
+def format_report():
+    """
+    Returns the summary of everything recorded, as printable text.
+    """
+    lines = ["-- instrumentation --"]
+    if counters:
+        lines.append("counters:")
+        lines.extend(f"  {name:28s} {value:12d}" for name, value in sorted(counters.items()))
+    if timings:
+        lines.append("timers:")
+        for name, (calls, seconds) in sorted(timings.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {name:28s} {calls:6d} calls {seconds * 1000:10.1f} ms"
+                         f" {seconds / calls * 1000:9.2f} ms/call")
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"memory: {current / 1024:.0f} KiB allocated now, {peak / 1024:.0f} KiB at peak")
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:REPORT_LINES // 2]:
+            lines.append(f"  {stat}")
+    if _profiler is not None:
+        _profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(_profiler, stream=out).sort_stats('cumulative').print_stats(REPORT_LINES)
+        lines.append("profile (main thread):")
+        lines.append(out.getvalue().strip())
+    return '\n'.join(lines)
+
+
+def report():
+    """
+    Prints the summary to stderr.
+    """
+    print(format_report(), file=sys.stderr)
+
+
+configure(os.environ.get(ENV_VAR, ''))
@@ -0,0 +1,129 @@
+"""
+File: partitions.py
+-------------------
+This file defines a store made of several separately built partitions, such as
+one per data file or per yearly slice (small-2016.txt next to full-data.txt).
+Each partition is an ordinary WordStore, loaded through its own index file (see
+indexcache.py), so adding a slice never means counting the others again, and
+queries name the union of partitions they are about. The counts of a union are
+added up when they are asked for (see wordstore.StoreUnion), never rebuilt.
+
+    partitions = load_partitions(['data/small-2016.txt', 'data/full-data.txt'])
+    union = partitions.union(['small-2016'])
+    biasbarsdata.search_words(union, 'smart')
+"""
+
+import os
+from collections.abc import Mapping
+
+import indexcache
+import instrument
+from wordstore import StoreUnion, PER_MILLION
+
+
+def partition_name(filename):
+    """
+    Returns the name of the partition holding the given data file: its file
+    name without directories or extension.
+
+    >>> partition_name('data/small-2016.txt')
+    'small-2016'
+    """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+class PartitionedStore(Mapping):
+    """
+    An ordered mapping of partition name -> WordStore. Any union of the
+    partitions can be queried like one store with union(), and the union of
+    every partition is itself the store to use when none are picked.
+
+    >>> partitions = load_partitions(['data/small-one.txt', 'data/small-two.txt'])
+    >>> list(partitions)
+    ['small-one', 'small-two']
+    >>> union = partitions.union()
+    >>> union['awesome'], len(union)
+    ({'W': [0, 0, 2], 'M': [0, 0, 1]}, 5)
+    >>> partitions.union(['small-one'])
+    {'okay': {'W': [0, 0, 0], 'M': [0, 1, 0]}, 'best': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
+    >>> partitions.compare('best')
+    {'small-one': {'W': [0, 0, 1], 'M': [0, 0, 0]}, 'small-two': None}
+    """
+
+    def __init__(self, partitions=None):
+        self._partitions = dict(partitions or {})
+        self._unions = {}
+
+    def add(self, name, word_data):
+        """
+        Adds (or replaces) the partition with the given name.
+        """
+        self._partitions[name] = word_data
+        self._unions.clear()
+
+    def union(self, names=None):
+        """
+        Returns a StoreUnion of the named partitions, in the order given, or of
+        every partition when names is None. The same union is returned for the
+        same names, so the counts it merges for whole-vocabulary queries are
+        worked out only once.
+        """
+        names = tuple(self._partitions if names is None else names)
+        union = self._unions.get(names)
+        if union is None:
+            union = self._unions[names] = StoreUnion(self._partitions[name] for name in names)
+        return union
+
+    def compare(self, word, names=None, scale=None, scheme=None):
+        """
+        Returns a dictionary mapping the name of each partition (every one, or
+        only the named ones) to the counts of word in it, or to its frequencies
+        when scale is given, or to None if the word is not in that partition.
+        """
+        names = list(self._partitions if names is None else names)
+        return {name: self._partitions[name].lookup([word], scale, scheme)[0] for name in names}
+
+    def __getitem__(self, name):
+        return self._partitions[name]
+
+    def __iter__(self):
+        return iter(self._partitions)
+
+    def __len__(self):
+        return len(self._partitions)
+
+
+@instrument.timed
+def load_partitions(filenames, progress=None):
+    """
+    Returns a PartitionedStore with one partition per data file, named by
+    partition_name. Each file is loaded on its own with
+    indexcache.load_word_data, so it is only read when its own index file is
+    missing or out of date. If progress is given it is called as
+    progress(files_loaded, files_total) after each file.
+    """
+    partitions = PartitionedStore()
+    for i, filename in enumerate(filenames):
+        partitions.add(partition_name(filename), indexcache.load_word_data(filename))
+        if progress is not None:
+            progress(i + 1, len(filenames))
+    return partitions
+
+
+def main():
+    import sys
+    args = instrument.take_flag(sys.argv[1:])
+    # python partitions.py word data_file [data_file ...]
+    if len(args) < 2:
+        return
+    word = args[0]
+    partitions = load_partitions(args[1:])
+    for name, gender_data in partitions.compare(word, scale=PER_MILLION).items():
+        print(f"{name}: {gender_data if gender_data is not None else 'not found'}")
+    union = partitions.union()
+    if word in union:
+        print(f"all: {union.frequencies(word)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+File: pipeline.py
+-----------------
+This file defines a streaming pipeline for counting the words in a review file
+when the plain whitespace split used by biasbarsdata.read_file is not enough.
+Reviews flow through the pipeline in batches, one stage at a time:
+
+    source -> parse -> tokenize -> filter(s) -> aggregate
+
+so a large file never has to be held in memory. The tokenizer and the filters
+are ordinary functions and can be swapped or combined freely, and the time spent
+in every stage is recorded so the cost of each transform can be seen.
+"""
+
+import string
+import time
+
+import biasbarsdata
+import reviewreader
+from wordstore import WordStore, ReviewStats
+
+# the approximate number of bytes of reviews in each batch
+BATCH_SIZE = 1 << 18
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from had has have he her his i if in is it its
+me my not of on or our she so that the their them they this to was we were what
+when which who will with you your
+""".split())
+
+
+def whitespace_tokenizer(comment):
+    """
+    The tokenizer used by read_file: splits a comment on whitespace.
+
+    >>> whitespace_tokenizer('great  class\\n')
+    ['great', 'class']
+    """
+    return comment.split()
+
+
+def lowercase(words):
+    """
+    Filter that converts every word to lowercase.
+
+    >>> lowercase(['Great', 'CLASS'])
+    ['great', 'class']
+    """
+    return [word.lower() for word in words]
+
+
+def unescape_quotes(words):
+    """
+    Filter that turns the escaped apostrophes found in the data (it\\'s) back into plain ones.
+
+    >>> unescape_quotes(["it\\\\'s", 'great'])
+    ["it's", 'great']
+    """
+    return [word.replace("\\'", "'") for word in words]
+
+
+def strip_punctuation(words):
+    """
+    Filter that removes punctuation from both ends of every word, dropping
+    words that were nothing but punctuation.
+
+    >>> strip_punctuation(['great!', '(really)', '--', "don't"])
+    ['great', 'really', "don't"]
+    """
+    stripped = [word.strip(string.punctuation) for word in words]
+    return [word for word in stripped if word]
+
+
+def remove_stop_words(stop_words=STOP_WORDS):
+    """
+    Returns a filter that drops every word found in stop_words.
+
+    >>> remove_stop_words({'the', 'a'})(['the', 'best', 'a', 'class'])
+    ['best', 'class']
+    """
+    def remove_stop_words(words):
+        return [word for word in words if word not in stop_words]
+    return remove_stop_words
+
+
+def ngrams(n):
+    """
+    Returns a filter that replaces the words of a review with its runs of n
+    consecutive words, each joined by a single space.
+
+    >>> ngrams(2)(['not', 'very', 'helpful'])
+    ['not very', 'very helpful']
+    """
+    def join_ngrams(words):
+        return biasbarsdata.word_ngrams(words, n)
+    join_ngrams.__name__ = f"ngrams_{n}"
+    return join_ngrams
+
+
+class Pipeline:
+    """
+    A source -> parse -> tokenize -> filter -> aggregate pipeline over a review
+    file. The tokenizer turns a comment into a list of words, and each filter
+    turns a list of words into a new list of words. The total number of seconds
+    spent in each stage is kept in the timings dictionary, and the ReviewStats
+    of the reviews read (with the words the tokenizer found) in review_stats.
+
+    >>> Pipeline().run('data/small-three.txt') == biasbarsdata.read_file('data/small-three.txt')
+    True
+    >>> pipeline = Pipeline(filters=[lowercase, remove_stop_words({'not'})])
+    >>> pipeline.run('data/small-three.txt')
+    {'average': {'W': [0, 0, 0], 'M': [1, 3, 0]}, 'best': {'W': [0, 0, 3], 'M': [1, 0, 0]}}
+    >>> list(pipeline.timings)
+    ['source', 'parse', 'tokenize', 'lowercase', 'remove_stop_words', 'aggregate']
+    """
+
+    def __init__(self, tokenizer=whitespace_tokenizer, filters=(), batch_size=BATCH_SIZE):
+        self.tokenizer = tokenizer
+        self.filters = list(filters)
+        self.batch_size = batch_size
+        self.timings = {}
+        self.review_stats = ReviewStats()
+
+    def stage_names(self):
+        """
+        Returns the names of the stages in the order reviews pass through them.
+        Filters are named after their functions.
+        """
+        return ['source', 'parse', 'tokenize'] + [word_filter.__name__ for word_filter in self.filters] + ['aggregate']
+
+    def _time(self, name, start):
+        """
+        Adds the time since start to the named stage and returns the current time.
+        """
+        now = time.perf_counter()
+        self.timings[name] += now - start
+        return now
+
+    def batches(self, filename):
+        """
+        Generator that streams the reviews in the file through every stage
+        except aggregate, yielding batches of (gender, rating, words) tuples
+        ready to be counted.
+        """
+        self.timings = dict.fromkeys(self.stage_names(), 0.0)
+        self.review_stats = ReviewStats()
+        with reviewreader.open_reviews(filename) as buffer:
+            spans = reviewreader.iter_reviews(buffer)
+            start = time.perf_counter()
+            while True:
+                # source: the next batch of review spans from the mapped file
+                batch = []
+                size = 0
+                for review in spans:
+                    batch.append(review)
+                    size += review[3] - review[2]
+                    if size >= self.batch_size:
+                        break
+                start = self._time('source', start)
+                if not batch:
+                    return
+
+                # parse: the rating, gender and comment text of each review
+                reviews = [(biasbarsdata.convert_gender_to_key(gender), rating, buffer[s:e].decode(reviewreader.ENCODING))
+                           for rating, gender, s, e in batch]
+                start = self._time('parse', start)
+
+                reviews = [(gender, rating, self.tokenizer(comment)) for gender, rating, comment in reviews]
+                for gender, rating, words in reviews:
+                    self.review_stats.add(gender, biasbarsdata.convert_rating_to_index(rating), rating, len(words))
+                start = self._time('tokenize', start)
+
+                for word_filter in self.filters:
+                    reviews = [(gender, rating, word_filter(words)) for gender, rating, words in reviews]
+                    start = self._time(word_filter.__name__, start)
+
+                yield reviews
+                start = time.perf_counter()
+
+    def run(self, filename, word_data=None):
+        """
+        Runs the whole pipeline over the file, counting the words into
+        word_data (a new WordStore by default), and returns word_data.
+        """
+        if word_data is None:
+            word_data = WordStore()
+        for reviews in self.batches(filename):
+            start = time.perf_counter()
+            biasbarsdata.add_review_words(word_data, reviews)
+            self._time('aggregate', start)
+        word_data.review_stats.merge(self.review_stats)
+        return word_data
+
+    def report(self):
+        """
+        Returns a printable summary of the time spent in each stage.
+        """
+        total = sum(self.timings.values()) or 1.0
+        lines = []
+        for name, seconds in self.timings.items():
+            lines.append(f"{name:20s} {seconds * 1000:8.1f} ms {seconds / total * 100:5.1f}%")
+        return '\n'.join(lines)
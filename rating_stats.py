@@ -5,44 +5,45 @@ This file defines a program that allows a user to calculate
 baseline summary statistics about a datafile of professor review
 """
 
+import biasbarsdata
+import indexcache
+from wordstore import KEY_WOMEN, KEY_MEN, FIVE_BUCKETS
 
-def calculate_rating_stats(filename):
+
+def calculate_rating_stats(filename, review_stats=None, scheme=None):
     """
     This function analyzes the professor review data in the given
     file to calculate the percentage of reviews for both men and
     women that fall in the "high rating" bucket, which is a numerical
     rating that is greater than 3.5.
 
+    The answer is read from the ReviewStats gathered when the file's
+    words were counted, so the file is not read again: either the given
+    review_stats, or those of the file's word data (loaded from its
+    index file when that is up to date).
+
+    When a BucketScheme is given, the percentages are of the reviews in its
+    highest bucket instead, worked out from the histograms of ratings.
+
     The resulting information is printed to the console.
+
+    >>> review_stats = biasbarsdata.read_file('data/small-three.txt').review_stats
+    >>> calculate_rating_stats('data/small-three.txt', review_stats)
+    100% of reviews for women in the dataset are high.
+    0% of reviews for men in the dataset are high.
+    >>> calculate_rating_stats('data/small-three.txt', review_stats, FIVE_BUCKETS)
+    100% of reviews for women in the dataset are 5 Stars.
+    0% of reviews for men in the dataset are 5 Stars.
     """
-    total_female_reviews = 0
-    high_female_reviews = 0
-    total_male_reviews = 0
-    high_male_reviews = 0
-
-    with open(filename) as file:
-        next(file)
-        for line in file:
-            line = line.strip()
-            index_1 = line.find(',')
-            rating = float(line[0:index_1])
-            index_2 = line.find(',', index_1 + 1, len(line))
-            gender = line[index_1 + 1:index_2].upper()
-
-            if gender == 'W':
-                total_female_reviews += 1
-                if rating > 3.5:
-                    high_female_reviews += 1
-            else:
-                total_male_reviews += 1
-                if rating > 3.5:
-                    high_male_reviews += 1
-
-    female_percentage = round((high_female_reviews / total_female_reviews) * 100)
-    male_percentage = round((high_male_reviews / total_male_reviews) * 100)
-
-    print(f'{female_percentage}% of reviews for women in the dataset are high.')
-    print(f'{male_percentage}% of reviews for men in the dataset are high.')
+    if review_stats is None:
+        review_stats = indexcache.load_word_data(filename).review_stats
+
+    female_percentage = review_stats.high_percentage(KEY_WOMEN, scheme)
+    male_percentage = review_stats.high_percentage(KEY_MEN, scheme)
+    bucket = 'high' if scheme is None else scheme.labels[-1]
+
+    print(f'{female_percentage}% of reviews for women in the dataset are {bucket}.')
+    print(f'{male_percentage}% of reviews for men in the dataset are {bucket}.')
 
 
 def main():
@@ -0,0 +1,143 @@
+"""
+File: reviewindex.py
+--------------------
+This file defines an inverted index from each word to the reviews it appears
+in, so the reviews behind any bar of a chart can be pulled up. For every word
+and every (gender x bucket) bar there is one posting list: the byte offsets of
+the reviews' comments in the data file, in increasing order. Each list is stored
+as the differences between successive offsets, written as variable-length
+integers (7 bits per byte, with the high bit set on every byte but the last),
+so most entries take one or two bytes.
+
+The index is filled while a file is read (see biasbarsdata.read_file), and
+example reviews are found by decoding the start of a posting list and reading
+those offsets straight out of the data file.
+"""
+
+from wordstore import GENDERS, NUM_BUCKETS, gender_offset
+
+DEFAULT_EXAMPLES = 3
+
+
+def encode_varint(value, out):
+    """
+    Appends the variable-length encoding of the non-negative integer value to
+    the bytearray out.
+
+    >>> out = bytearray()
+    >>> encode_varint(5, out); encode_varint(300, out)
+    >>> list(out)
+    [5, 172, 2]
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data, limit=None):
+    """
+    Returns the list of integers encoded in data, stopping after limit of
+    them if a limit is given.
+
+    >>> decode_varints(bytes([5, 172, 2, 1]))
+    [5, 300, 1]
+    >>> decode_varints(bytes([5, 172, 2, 1]), 2)
+    [5, 300]
+    """
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        if len(values) == limit:
+            break
+        value = 0
+        shift = 0
+    return values
+
+
+class ReviewIndex:
+    """
+    Maps each word to the delta and varint compressed offsets of the reviews
+    containing it, with one posting list per gender and bucket. Reviews must be
+    added in increasing offset order, as they are when a file is read.
+
+    >>> index = ReviewIndex()
+    >>> index.add('W', 2, 40, ['great', 'class', 'great'])
+    >>> index.add('W', 2, 300, ['great'])
+    >>> index.add('M', 0, 320, ['boring', 'class'])
+    >>> index.offsets('great', 'W', 2)
+    [40, 300]
+    >>> index.offsets('great', 'W', 2, limit=1), index.offsets('class', 'M', 0), index.offsets('great', 'M', 0)
+    ([40], [320], [])
+    >>> 'boring' in index, len(index)
+    (True, 3)
+    """
+
+    def __init__(self):
+        self._postings = [{} for i in range(len(GENDERS) * NUM_BUCKETS)]    # word -> encoded deltas
+        self._last = [{} for i in range(len(GENDERS) * NUM_BUCKETS)]        # word -> last offset added
+        self._words = set()
+
+    def add(self, gender, index, offset, words):
+        """
+        Records that the review at the given byte offset, with the given gender
+        and bucket index, contains each of the given words.
+        """
+        slot = gender_offset(gender) + index
+        postings = self._postings[slot]
+        last = self._last[slot]
+        # the offset of the review is the same for every word, so its encoding is reused for new words
+        first = bytearray()
+        encode_varint(offset, first)
+        for word in set(words):
+            previous = last.get(word)
+            last[word] = offset
+            if previous is None:
+                postings[word] = first[:]
+                self._words.add(word)
+                continue
+            delta = offset - previous
+            posting = postings[word]
+            # deltas are written inline (rather than with encode_varint) as this runs once per word per review
+            while delta >= 0x80:
+                posting.append((delta & 0x7F) | 0x80)
+                delta >>= 7
+            posting.append(delta)
+
+    def offsets(self, word, gender, index, limit=None):
+        """
+        Returns the offsets of the reviews with the given gender and bucket index
+        that contain word, in file order, decoding only the first limit of them
+        if a limit is given.
+        """
+        posting = self._postings[gender_offset(gender) + index].get(word)
+        if posting is None:
+            return []
+        offsets = decode_varints(posting, limit)
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i - 1]
+        return offsets
+
+    def nbytes(self):
+        """
+        Returns the number of bytes taken by the encoded posting lists.
+        """
+        return sum(len(posting) for postings in self._postings for posting in postings.values())
+
+    def num_postings(self):
+        """
+        Returns the total number of (word, review) entries in the index.
+        """
+        return sum(len(decode_varints(posting)) for postings in self._postings for posting in postings.values())
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def __len__(self):
+        return len(self._words)
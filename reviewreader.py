@@ -0,0 +1,135 @@
+"""
+File: reviewreader.py
+---------------------
+This file defines the reader shared by everything that scans a file of professor
+reviews. The file is memory-mapped and walked as bytes, and each review is reported
+as its rating, its gender and the span of bytes holding the comment text, so the
+comment is never copied unless the caller asks for its words.
+
+Each line of a review file has the form
+    rating,gender,comment text
+and the first line of the file is a header.
+"""
+
+import mmap
+from contextlib import contextmanager
+
+import instrument
+
+ENCODING = 'utf-8'
+
+
+@contextmanager
+def open_reviews(filename):
+    """
+    Memory-maps the given file for reading and yields the mapped bytes,
+    closing the mapping afterwards. An empty file yields an empty bytes object,
+    since an empty file cannot be mapped.
+    """
+    with open(filename, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def header_end(buffer):
+    """
+    Returns the offset just past the header line of the given file contents.
+
+    >>> header_end(b'Rating,Professor Gender,Comment Text\\n5.0,W,great\\n')
+    37
+    """
+    newline = buffer.find(b'\n')
+    return len(buffer) if newline == -1 else newline + 1
+
+
+def iter_reviews(buffer, start=None, end=None):
+    """
+    Walks the reviews in buffer[start:end], yielding a tuple
+    (rating, gender, comment_start, comment_end) for each one. The rating is a
+    float, the gender is the text between the first and second commas, and the
+    comment is buffer[comment_start:comment_end]. Blank lines are skipped.
+
+    Input:
+        buffer (bytes-like): the contents of a review file, usually from open_reviews
+        start (int): offset of the first line to read (defaults to just past the header)
+        end (int): offset at which to stop (defaults to the end of the buffer)
+
+    >>> data = b'Rating,Professor Gender,Comment Text\\n3.0,M,average\\n\\n5.0,W,best best'
+    >>> [(rating, gender, data[s:e]) for rating, gender, s, e in iter_reviews(data)]
+    [(3.0, 'M', b'average'), (5.0, 'W', b'best best')]
+    """
+    if start is None:
+        start = header_end(buffer)
+    if end is None:
+        end = len(buffer)
+
+    # a file only holds a handful of distinct ratings and genders, so each is decoded just once
+    ratings = {}
+    genders = {}
+    find = buffer.find
+    position = start
+    while position < end:
+        line_end = find(b'\n', position, end)
+        if line_end == -1:
+            line_end = end
+        first_comma = find(b',', position, line_end)
+        if first_comma != -1:
+            second_comma = find(b',', first_comma + 1, line_end)
+            if second_comma == -1:
+                second_comma = line_end
+
+            rating_bytes = buffer[position:first_comma]
+            rating = ratings.get(rating_bytes)
+            if rating is None:
+                try:
+                    rating = float(rating_bytes)
+                except ValueError:
+                    instrument.count('malformed lines')
+                    raise
+                ratings[rating_bytes] = rating
+            gender_bytes = buffer[first_comma + 1:second_comma]
+            gender = genders.get(gender_bytes)
+            if gender is None:
+                gender = gender_bytes.decode(ENCODING)
+                genders[gender_bytes] = gender
+
+            yield rating, gender, min(second_comma + 1, line_end), line_end
+        elif buffer[position:line_end].strip():
+            instrument.count('malformed lines')
+            raise ValueError(f"malformed review line at byte {position}")
+        position = line_end + 1
+
+
+def comment_words(buffer, comment_start, comment_end):
+    """
+    Returns the list of whitespace separated words in the given comment span.
+
+    >>> comment_words(b'5.0,W,very  good\\r\\n', 6, 18)
+    ['very', 'good']
+    """
+    return buffer[comment_start:comment_end].decode(ENCODING).split()
+
+
+def review_at(buffer, comment_start):
+    """
+    Returns the (rating, gender, comment text) of the review whose comment
+    starts at the given offset, reading only that one line of the buffer.
+
+    >>> data = b'Rating,Professor Gender,Comment Text\\n3.0,M,average\\n5.0,W,best best\\n'
+    >>> review_at(data, 57)
+    (5.0, 'W', 'best best')
+    """
+    line_start = buffer.rfind(b'\n', 0, comment_start) + 1
+    line_end = buffer.find(b'\n', comment_start)
+    if line_end == -1:
+        line_end = len(buffer)
+    for rating, gender, start, end in iter_reviews(buffer, line_start, line_end):
+        return rating, gender, buffer[start:end].decode(ENCODING).strip()
+    raise ValueError(f"no review at byte {comment_start}")
@@ -0,0 +1,169 @@
+"""
+File: searchindex.py
+--------------------
+This file defines the index used by biasbarsdata.search_words to find every word
+containing a target string without scanning the whole vocabulary. Every word is
+split into its distinct 1, 2 and 3 character grams, and each gram maps to the
+sorted list of ids of the words containing it. A query only has to check the words
+that appear in the posting lists of all of its trigrams. Prefix queries are answered
+with a binary search over the sorted vocabulary.
+
+Results always come back in word id order, which is the order the words were added,
+so they match the order of a linear scan.
+"""
+
+from array import array
+from bisect import bisect_left
+
+GRAM_LENGTH = 3
+
+
+def grams(text):
+    """
+    Returns the set of distinct substrings of text with length 1 to GRAM_LENGTH.
+
+    >>> sorted(grams('abc'))
+    ['a', 'ab', 'abc', 'b', 'bc', 'c']
+    """
+    found = set()
+    for length in range(1, GRAM_LENGTH + 1):
+        for i in range(len(text) - length + 1):
+            found.add(text[i:i + length])
+    return found
+
+
+def contains(posting, word_id):
+    """
+    Returns whether the sorted posting list contains word_id, using a binary search.
+
+    >>> contains(array('I', [1, 4, 9]), 4), contains(array('I', [1, 4, 9]), 5)
+    (True, False)
+    """
+    i = bisect_left(posting, word_id)
+    return i < len(posting) and posting[i] == word_id
+
+
+class SearchIndex:
+    """
+    A substring and prefix index over a growing list of words.
+
+    >>> index = SearchIndex(['okay', 'best', 'Bestow', 'sob'])
+    >>> index.search('est')
+    ['best', 'Bestow']
+    >>> index.search('BEST')
+    ['best', 'Bestow']
+    >>> index.search('Best', ignore_case=False)
+    ['Bestow']
+    >>> index.search('b', prefix=True)
+    ['best', 'Bestow']
+    >>> index.search('stow')
+    ['Bestow']
+    """
+
+    def __init__(self, words=()):
+        self._words = []
+        self._lowered = []
+        self._postings = {}
+        self._sorted = []
+        self._sorted_size = 0
+        self.add_words(words)
+
+    def add_words(self, words):
+        """
+        Adds the given words to the index, giving them the next word ids in order.
+        """
+        postings = self._postings
+        for word in words:
+            word_id = len(self._words)
+            lowered = word.lower()
+            self._words.append(word)
+            self._lowered.append(lowered)
+            for gram in grams(lowered):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(word_id)
+
+    def __len__(self):
+        return len(self._words)
+
+    def _prefix_ids(self, prefix):
+        """
+        Returns the ids of the words whose lowercased form starts with prefix,
+        sorting the vocabulary first if words have been added since the last sort.
+        """
+        if self._sorted_size != len(self._lowered):
+            self._sorted = sorted((lowered, word_id) for word_id, lowered in enumerate(self._lowered))
+            self._sorted_size = len(self._lowered)
+        ids = []
+        for i in range(bisect_left(self._sorted, (prefix,)), len(self._sorted)):
+            lowered, word_id = self._sorted[i]
+            if not lowered.startswith(prefix):
+                break
+            ids.append(word_id)
+        ids.sort()
+        return ids
+
+    def _substring_ids(self, target):
+        """
+        Returns the ids of the words whose lowercased form contains target.
+        """
+        if not target:
+            return range(len(self._words))
+        if len(target) <= GRAM_LENGTH:
+            return self._postings.get(target, ())
+
+        # intersects the posting lists of every trigram, smallest first, then checks the survivors
+        lists = [self._postings.get(target[i:i + GRAM_LENGTH], ()) for i in range(len(target) - GRAM_LENGTH + 1)]
+        lists.sort(key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            candidates = [word_id for word_id in candidates if contains(posting, word_id)]
+        return [word_id for word_id in candidates if target in self._lowered[word_id]]
+
+    def search(self, target, prefix=False, ignore_case=True):
+        """
+        Returns the list of words containing target (or starting with it when
+        prefix is True), in the order the words were added.
+
+        Input:
+            target (str): the string to look for
+            prefix (bool): whether to only match words that start with target
+            ignore_case (bool): whether upper and lower case letters match each other
+
+        Returns:
+            matching_words (List[str]): the matching words
+        """
+        lowered = target.lower()
+        ids = self._prefix_ids(lowered) if prefix else self._substring_ids(lowered)
+        words = [self._words[word_id] for word_id in ids]
+        if ignore_case:
+            return words
+        if prefix:
+            return [word for word in words if word.startswith(target)]
+        return [word for word in words if target in word]
+
+
+class UnionIndex:
+    """
+    Searches several SearchIndexes as one, as for a union of word stores. The
+    results of each index are taken in turn, leaving out words already found,
+    so they come back in the order the words first appear across the indexes.
+
+    >>> index = UnionIndex([SearchIndex(['best', 'okay']), SearchIndex(['bestow', 'best'])])
+    >>> index.search('est')
+    ['best', 'bestow']
+    """
+
+    def __init__(self, indexes):
+        self._indexes = list(indexes)
+
+    def search(self, target, prefix=False, ignore_case=True):
+        """
+        Returns the list of words in any of the indexes containing target (or
+        starting with it when prefix is True); see SearchIndex.search.
+        """
+        found = {}
+        for index in self._indexes:
+            found.update(dict.fromkeys(index.search(target, prefix, ignore_case)))
+        return list(found)
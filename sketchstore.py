@@ -0,0 +1,295 @@
+"""
+File: sketchstore.py
+--------------------
+This file defines an approximate alternative to WordStore for review archives
+too large to count every word exactly. The counts live in a count-min sketch: a
+fixed table of depth rows by width columns, where each word is hashed to one
+column per row and every cell holds a (gender x bucket) group of counts laid out
+like a WordStore row. A word's count is estimated as the smallest value found in
+its columns, so estimates are never too low, and are too high by at most
+e / width of the total count with probability 1 - e ** -depth.
+
+A sketch cannot list the words it has seen, so the capacity words with the
+highest estimated totals (the heavy hitters) are tracked alongside it. Those are
+the words the store contains, iterates over, searches and ranks; the estimate
+of any other word is still available from estimate().
+
+Memory use is fixed by width, depth and capacity, however many reviews are read.
+"""
+
+import hashlib
+import heapq
+import math
+from array import array
+from collections.abc import Mapping
+
+from searchindex import SearchIndex
+from wordstore import ReviewStats, THREE_BUCKETS, GENDERS, NUM_BUCKETS, ROW_SIZE, COUNT_TYPECODE, PER_MILLION, gender_offset
+
+WIDTH = 1 << 14
+DEPTH = 4
+CAPACITY = 1 << 12
+# the most words whose cells are remembered, so common words are not hashed again for every batch
+CELL_CACHE_SIZE = 1 << 16
+
+
+def column_hashes(word, width, depth):
+    """
+    Returns the column of the word in each of the depth rows of a sketch with
+    the given width. The columns come from two halves of one hash of the word
+    (double hashing), so only one hash is computed however deep the sketch is.
+
+    >>> column_hashes('good', 1 << 14, 4) == column_hashes('good', 1 << 14, 4)
+    True
+    >>> all(0 <= column < 8 for column in column_hashes('good', 8, 4))
+    True
+    """
+    digest = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    first = digest & 0xFFFFFFFF
+    step = (digest >> 32) | 1
+    return [(first + i * step) % width for i in range(depth)]
+
+
+class SketchStore(Mapping):
+    """
+    An approximate word store backed by a count-min sketch of width x depth
+    cells plus the capacity heaviest words. It can be filled by the same
+    add_words and add_counts calls as a WordStore, so read_file can count into
+    either one, and it answers the same queries for its heavy hitters. Its
+    review_stats are exact, since they take only a few numbers per gender.
+
+    >>> store = SketchStore(width=64, depth=3, capacity=2)
+    >>> store.add_counts('W', 2, {'good': 5, 'fine': 1})
+    >>> store.add_counts('M', 0, {'bad': 3})
+    >>> store['good']
+    {'W': [0, 0, 5], 'M': [0, 0, 0]}
+    >>> sorted(store), 'fine' in store
+    (['bad', 'good'], False)
+    >>> store.estimate('fine')['W'][2] >= 1
+    True
+    """
+
+    def __init__(self, width=WIDTH, depth=DEPTH, capacity=CAPACITY):
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self._counts = array(COUNT_TYPECODE, bytes(width * depth * ROW_SIZE * array(COUNT_TYPECODE).itemsize))
+        self._totals = dict.fromkeys(GENDERS, 0)
+        self._slot_totals = [0] * ROW_SIZE
+        self._heavy = {}          # heavy hitter -> its estimated total when last offered
+        self._heap = []           # (estimated total, word) entries, some of them out of date
+        self._cells = {}          # word -> offsets of its cells in the counts array
+        self._search_index = None
+        self._indexed_version = -1
+        self._heavy_version = 0
+        self._version = 0
+        self.review_stats = ReviewStats()
+
+    def add_words(self, words, publish=True):
+        """
+        Does nothing, since a sketch has no rows to make; present so a
+        SketchStore can be filled like a WordStore.
+        """
+
+    def publish_words(self):
+        """
+        Does nothing, as add_words makes no rows to publish.
+        """
+
+    def add_counts(self, gender, index, word_counts, rating=None):
+        """
+        Adds a whole mapping of word -> count to the given gender and bucket,
+        then offers every word to the heavy hitters. The rating is ignored,
+        since a sketch keeps no histograms of ratings.
+        """
+        width = self.width
+        depth = self.depth
+        counts = self._counts
+        slot = gender_offset(gender) + index
+        cell_cache = self._cells
+        for word, count in word_counts.items():
+            cells = cell_cache.get(word)
+            if cells is None:
+                if len(cell_cache) >= CELL_CACHE_SIZE:
+                    cell_cache.clear()
+                cells = cell_cache[word] = [(row * width + column) * ROW_SIZE
+                                            for row, column in enumerate(column_hashes(word, width, depth))]
+            for cell in cells:
+                counts[cell + slot] += count
+            self._offer(word, min(sum(counts[cell:cell + ROW_SIZE]) for cell in cells))
+        added = sum(word_counts.values())
+        self._totals[gender] += added
+        self._slot_totals[slot] += added
+        self._version += 1
+
+    def add(self, word, gender, index, count=1):
+        """
+        Adds count to the given gender and bucket of word.
+        """
+        self.add_counts(gender, index, {word: count})
+
+    def _offer(self, word, total):
+        """
+        Records the estimated total of word, making it a heavy hitter if it is
+        one already, if there is room, or if it outweighs the lightest one.
+        Entries that are out of date stay in the heap until it holds more than
+        four per heavy hitter, when it is rebuilt from the heavy hitters.
+
+        >>> import biasbarsdata
+        >>> store = SketchStore(width=1024, capacity=256)
+        >>> for i in range(5):
+        ...     store = biasbarsdata.read_file('data/small-2016.txt', word_data=store)
+        >>> len(store._heap) <= 4 * store.capacity
+        True
+        """
+        heavy = self._heavy
+        heap = self._heap
+        if word in heavy or len(heavy) < self.capacity:
+            if word not in heavy:
+                self._heavy_version += 1
+            heavy[word] = total
+            heapq.heappush(heap, (total, word))
+        else:
+            # drops heap entries that are out of date until the lightest heavy hitter is on top
+            while heap[0][0] != heavy.get(heap[0][1]):
+                heapq.heappop(heap)
+            if total > heap[0][0]:
+                lightest, evicted = heapq.heapreplace(heap, (total, word))
+                del heavy[evicted]
+                heavy[word] = total
+                self._heavy_version += 1
+        if len(heap) > 4 * self.capacity:
+            self._heap = [(total, word) for word, total in heavy.items()]
+            heapq.heapify(self._heap)
+
+    def estimate(self, word):
+        """
+        Returns the estimated {gender: [low, medium, high]} counts of any word,
+        whether or not it is a heavy hitter. No estimate is ever too low.
+        """
+        counts = self._counts
+        values = [min(values) for values in zip(*(
+            counts[cell:cell + ROW_SIZE]
+            for cell in ((row * self.width + column) * ROW_SIZE
+                         for row, column in enumerate(column_hashes(word, self.width, self.depth)))))]
+        return {gender: values[i * NUM_BUCKETS:(i + 1) * NUM_BUCKETS] for i, gender in enumerate(GENDERS)}
+
+    def error_bound(self):
+        """
+        Returns the most by which any single count may be overestimated, with
+        probability 1 - e ** -depth: e / width times the largest total counted
+        for one gender and bucket.
+
+        >>> store = SketchStore(width=272, depth=3)
+        >>> store.add_counts('W', 0, {'good': 100})
+        >>> store.error_bound()
+        1
+        """
+        return math.ceil(math.e * max(self._slot_totals) / self.width)
+
+    def most_common(self, k, gender=None):
+        """
+        Returns the k heavy hitters with the highest estimated total count, as
+        a list of (word, count) pairs from most to least common. Only the counts
+        for the given gender are used if one is given.
+        """
+        if gender is None:
+            totals = ((word, sum(map(sum, self.estimate(word).values()))) for word in self._heavy)
+        else:
+            totals = ((word, sum(self.estimate(word)[gender])) for word in self._heavy)
+        return heapq.nlargest(k, totals, key=lambda pair: pair[1])
+
+    def frequencies(self, word, scale=PER_MILLION):
+        """
+        Returns the estimated {gender: [low, medium, high]} frequencies of a
+        heavy hitter; see WordStore.frequencies.
+        """
+        if word not in self._heavy:
+            raise KeyError(word)
+        return self.lookup([word], scale)[0]
+
+    def lookup(self, words, scale=None, scheme=None):
+        """
+        Looks up a batch of words, returning the estimated counts of each
+        heavy hitter (or its frequencies when scale is given) and None for
+        any other word; see WordStore.lookup. Only the low, medium and high
+        buckets are kept, so any other BucketScheme raises a ValueError.
+        """
+        if scheme is not None and scheme != THREE_BUCKETS:
+            raise ValueError("a SketchStore only keeps the low, medium and high buckets")
+        if scale is not None:
+            factors = {gender: scale / total if total else 0.0 for gender, total in self._totals.items()}
+        results = []
+        for word in words:
+            if word not in self._heavy:
+                results.append(None)
+                continue
+            gender_data = self.estimate(word)
+            if scale is not None:
+                gender_data = {gender: [value * factors[gender] for value in values]
+                               for gender, values in gender_data.items()}
+            results.append(gender_data)
+        return results
+
+    def totals(self):
+        """
+        Returns a dictionary mapping each gender to the exact number of words
+        counted for it.
+        """
+        return dict(self._totals)
+
+    def search_index(self):
+        """
+        Returns a SearchIndex over the heavy hitters, rebuilt whenever they change.
+        """
+        if self._indexed_version != self._heavy_version:
+            self._search_index = SearchIndex(list(self._heavy))
+            self._indexed_version = self._heavy_version
+        return self._search_index
+
+    def version(self):
+        """
+        Returns a number that changes every time a count in the store changes.
+        """
+        return self._version
+
+    def words(self):
+        """
+        Returns the list of heavy hitters, in the order buffer() lays out their rows.
+        """
+        return list(self._heavy)
+
+    def buffer(self):
+        """
+        Returns a flat array of the estimated counts of the heavy hitters,
+        laid out like WordStore.buffer(), so they can be ranked by skew.py.
+        """
+        rows = array(COUNT_TYPECODE)
+        for word in self._heavy:
+            gender_data = self.estimate(word)
+            for gender in GENDERS:
+                rows.extend(gender_data[gender])
+        return rows
+
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the sketch table.
+        """
+        return len(self._counts) * self._counts.itemsize
+
+    def __getitem__(self, word):
+        if word not in self._heavy:
+            raise KeyError(word)
+        return self.estimate(word)
+
+    def __contains__(self, word):
+        return word in self._heavy
+
+    def __iter__(self):
+        return iter(self._heavy)
+
+    def __len__(self):
+        return len(self._heavy)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
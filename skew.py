@@ -0,0 +1,128 @@
+"""
+File: skew.py
+-------------
+This file ranks every word in a WordStore by how much more often it is used in
+reviews of women than in reviews of men (or the other way around), so that biased
+words can be found without typing candidates into the GUI one at a time.
+
+A word's skew in a rating bucket is its smoothed log-odds ratio:
+
+    log((w + a) / (W - w + a)) - log((m + a) / (M - m + a))
+
+where w and m are the word's counts for women and men in the bucket, W and M are the
+total numbers of words counted for women and men in the bucket, and a is a small
+smoothing constant. Positive scores lean towards women and negative scores towards
+men. Words seen fewer than min_count times in the bucket are not ranked, since a
+handful of reviews can make a rare word look very skewed.
+"""
+
+import heapq
+import math
+
+from wordstore import FrequencyView, KEY_WOMEN, KEY_MEN, GENDERS, NUM_BUCKETS, ROW_SIZE, gender_offset
+
+MIN_COUNT = 20
+SMOOTHING = 0.5
+TOP_K = 10
+
+
+def column(counts, gender, buckets):
+    """
+    Returns one value per word: the sum of the given gender's counts over the
+    given bucket indices, read as strided slices of the flat counts array.
+
+    >>> from array import array
+    >>> column(array('I', [1, 2, 3, 4, 5, 6, 10, 20, 30, 40, 50, 60]), 'M', [0, 2])
+    [10, 100]
+    """
+    start = gender_offset(gender)
+    columns = [counts[start + index::ROW_SIZE] for index in buckets]
+    if len(columns) == 1:
+        return columns[0].tolist()
+    return [sum(values) for values in zip(*columns)]
+
+
+def skew_scores(word_data, bucket=None, min_count=MIN_COUNT, smoothing=SMOOTHING):
+    """
+    Returns a list of (score, row, women_count, men_count) tuples, one for every
+    word counted at least min_count times in the bucket (or in all buckets when
+    bucket is None).
+
+    Input:
+        word_data (WordStore or FrequencyView): the word counts to rank
+        bucket (int): the rating bucket index to rank, or None for every bucket
+        min_count (int): the fewest times a word must appear to be ranked
+        smoothing (float): the constant added to every count
+
+    >>> from wordstore import WordStore
+    >>> store = WordStore()
+    >>> store.add('kind', 'W', 2, 30)
+    >>> store.add('kind', 'M', 2, 10)
+    >>> store.add('the', 'W', 2, 100)
+    >>> store.add('the', 'M', 2, 120)
+    >>> [(round(score, 2), row) for score, row, w, m in skew_scores(store, 2, min_count=5)]
+    [(1.25, 0), (-1.25, 1)]
+    """
+    if isinstance(word_data, FrequencyView):
+        word_data = word_data.store
+    counts = word_data.buffer()
+    buckets = range(NUM_BUCKETS) if bucket is None else [bucket]
+    women = column(counts, KEY_WOMEN, buckets)
+    men = column(counts, KEY_MEN, buckets)
+    total_women = sum(women)
+    total_men = sum(men)
+
+    log = math.log
+    scores = []
+    for row, (w, m) in enumerate(zip(women, men)):
+        if w + m >= min_count:
+            score = (log((w + smoothing) / (total_women - w + smoothing))
+                     - log((m + smoothing) / (total_men - m + smoothing)))
+            scores.append((score, row, w, m))
+    return scores
+
+
+def top_skewed(word_data, k=TOP_K, bucket=None, min_count=MIN_COUNT, smoothing=SMOOTHING):
+    """
+    Returns the k words skewed most towards each gender, as a dictionary
+    mapping each gender to a list of (word, score, women_count, men_count)
+    tuples, most skewed first. Only words leaning towards a gender are listed
+    for it, and only the top k are selected (with a heap), so the whole
+    vocabulary is never sorted.
+
+    >>> from wordstore import WordStore
+    >>> store = WordStore()
+    >>> store.add('kind', 'W', 2, 30)
+    >>> store.add('kind', 'M', 2, 10)
+    >>> store.add('funny', 'M', 2, 30)
+    >>> store.add('the', 'W', 2, 100)
+    >>> store.add('the', 'M', 2, 120)
+    >>> ranking = top_skewed(store, 1, min_count=5)
+    >>> ranking['W'][0][0], ranking['M'][0][0]
+    ('kind', 'funny')
+    """
+    if isinstance(word_data, FrequencyView):
+        word_data = word_data.store
+    scores = skew_scores(word_data, bucket, min_count, smoothing)
+    words = word_data.words()
+    ranking = {}
+    leaning = {KEY_WOMEN: [entry for entry in scores if entry[0] > 0],
+               KEY_MEN: [entry for entry in scores if entry[0] < 0]}
+    for gender, pick in ((KEY_WOMEN, heapq.nlargest), (KEY_MEN, heapq.nsmallest)):
+        ranking[gender] = [(words[row], score, w, m) for score, row, w, m in pick(k, leaning[gender])]
+    return ranking
+
+
+def format_ranking(ranking, genders=GENDERS):
+    """
+    Returns a printable table of a ranking returned by top_skewed.
+
+    >>> print(format_ranking({'W': [('kind', 1.6, 30, 10)], 'M': []}))
+    W: kind (+1.60, W 30 / M 10)
+    M:
+    """
+    lines = []
+    for gender in genders:
+        entries = [f"{word} ({score:+.2f}, W {w} / M {m})" for word, score, w, m in ranking[gender]]
+        lines.append(f"{gender}: " + ', '.join(entries) if entries else f"{gender}:")
+    return '\n'.join(lines)
@@ -0,0 +1,1125 @@
+"""
+File: wordstore.py
+------------------
+This file defines the compact storage used for word frequency data. Instead of
+building a dictionary of dictionaries of lists for every word, each word is given
+a row id and all of the counts live in a single contiguous array laid out as
+(word x gender x bucket). The WordStore class still behaves like the original
+word_data dictionary, so code that looks up word_data[word][gender][index] keeps working.
+
+Alongside the low/medium/high counts, each word keeps a histogram of the ratings
+of the reviews it was in, at the half point resolution of the data, in a second
+array laid out as (word x gender x rating). Any other way of cutting the ratings
+into buckets (a BucketScheme) is worked out from the histograms when asked for,
+so trying new cut points does not mean reading the reviews again.
+"""
+
+import bisect
+import heapq
+import itertools
+import math
+import threading
+from array import array
+from collections.abc import Mapping
+
+from searchindex import SearchIndex, UnionIndex
+
+KEY_WOMEN = "W"
+KEY_MEN = "M"
+
+# the order of the genders and buckets inside each row of the counts array
+GENDERS = (KEY_WOMEN, KEY_MEN)
+NUM_BUCKETS = 3
+ROW_SIZE = len(GENDERS) * NUM_BUCKETS
+
+COUNT_TYPECODE = 'I'        # unsigned 32 bit counts
+FREQUENCY_TYPECODE = 'd'    # used once counts have been scaled into frequencies
+PER_MILLION = 1000000
+
+# ratings are kept to the nearest half point, from 0 to MAX_RATING
+RATINGS_PER_POINT = 2
+MAX_RATING = 5
+NUM_RATINGS = MAX_RATING * RATINGS_PER_POINT + 1
+HISTOGRAM_ROW_SIZE = len(GENDERS) * NUM_RATINGS
+
+
+def gender_offset(gender):
+    """
+    Returns the offset of the given gender's buckets inside a row.
+
+    >>> gender_offset('W')
+    0
+    >>> gender_offset('M')
+    3
+    """
+    return GENDERS.index(gender) * NUM_BUCKETS
+
+
+def rating_slot(rating):
+    """
+    Returns the position of the given rating in a histogram of ratings,
+    rounding it to the nearest half point.
+
+    >>> rating_slot(0.0), rating_slot(3.5), rating_slot(5.0), rating_slot(7.0)
+    (0, 7, 10, 10)
+    """
+    return min(max(round(rating * RATINGS_PER_POINT), 0), NUM_RATINGS - 1)
+
+
+class BucketScheme:
+    """
+    A way of cutting ratings into buckets, given by the rating at which each
+    bucket after the first one starts (its edges). Bucket i holds the ratings
+    from edge i - 1 up to, but not including, edge i. The counts of a bucket are
+    found from a histogram of ratings with one cumulative sum, so any number of
+    schemes can be tried on the same counts.
+
+    >>> scheme = BucketScheme((2.5, 4))
+    >>> [scheme.index(rating) for rating in (1.0, 2.0, 2.5, 3.5, 4.0, 5.0)]
+    [0, 0, 1, 1, 2, 2]
+    >>> scheme.regroup([0, 0, 1, 1, 1, 2, 1, 1, 1, 1, 5])
+    [3, 4, 7]
+    >>> scheme.labels
+    ('Below 2.5', '2.5 to 3.5', '4 and Up')
+    >>> len(FIVE_BUCKETS), FIVE_BUCKETS.index(4.5)
+    (5, 4)
+
+    Edges are rounded up to the half point ratings the histograms hold.
+
+    >>> BucketScheme((2.2, 3.9)).labels
+    ('Below 2.5', '2.5 to 3.5', '4 and Up')
+    >>> BucketScheme((2.1, 2.3))
+    Traceback (most recent call last):
+    ...
+    ValueError: bucket edges must round up to different half point ratings: (2.1, 2.3)
+    """
+
+    def __init__(self, edges, labels=None):
+        self.edges = tuple(edges)
+        if list(self.edges) != sorted(set(self.edges)) or not all(0 < edge <= MAX_RATING for edge in self.edges):
+            raise ValueError(f"bucket edges must be increasing ratings between 0 and {MAX_RATING}: {edges}")
+        # the histogram slot at which each bucket after the first one starts
+        self._starts = [math.ceil(edge * RATINGS_PER_POINT) for edge in self.edges]
+        if any(start >= end for start, end in zip(self._starts, self._starts[1:])):
+            raise ValueError(f"bucket edges must round up to different half point ratings: {edges}")
+        if labels is None:
+            labels = self._default_labels()
+        if len(labels) != len(self.edges) + 1:
+            raise ValueError(f"{len(self.edges) + 1} buckets need as many labels, not {len(labels)}")
+        self.labels = tuple(labels)
+
+    def _default_labels(self):
+        """
+        Returns labels naming the range of half point ratings in each bucket.
+        """
+        if not self.edges:
+            return ("All Reviews",)
+        labels = [f"Below {self._starts[0] / RATINGS_PER_POINT:g}"]
+        for start, end in zip(self._starts, self._starts[1:]):
+            first, last = start / RATINGS_PER_POINT, (end - 1) / RATINGS_PER_POINT
+            labels.append(f"{first:g}" if first == last else f"{first:g} to {last:g}")
+        labels.append(f"{self._starts[-1] / RATINGS_PER_POINT:g} and Up")
+        return labels
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Returns the scheme described by text: '3' or '5' for the named schemes,
+        or else a comma separated list of edges.
+
+        >>> BucketScheme.parse('3') is THREE_BUCKETS
+        True
+        >>> BucketScheme.parse('2,3.5').edges
+        (2.0, 3.5)
+        """
+        if text in SCHEMES:
+            return SCHEMES[text]
+        return cls([float(edge) for edge in text.split(',')])
+
+    def index(self, rating):
+        """
+        Returns the index of the bucket holding the given rating.
+        """
+        return bisect.bisect_right(self._starts, rating_slot(rating))
+
+    def slot_ranges(self):
+        """
+        Returns the (start, end) range of histogram slots in each bucket.
+
+        >>> THREE_BUCKETS.slot_ranges()
+        [(0, 5), (5, 8), (8, 11)]
+        """
+        bounds = [0, *self._starts, NUM_RATINGS]
+        return list(zip(bounds, bounds[1:]))
+
+    def regroup(self, histogram):
+        """
+        Returns the list of bucket totals of a histogram of ratings with
+        NUM_RATINGS slots, found from its cumulative sums.
+        """
+        cumulative = [0, *itertools.accumulate(histogram)]
+        return [cumulative[end] - cumulative[start] for start, end in self.slot_ranges()]
+
+    def __len__(self):
+        return len(self.edges) + 1
+
+    def __eq__(self, other):
+        if not isinstance(other, BucketScheme):
+            return NotImplemented
+        return self._starts == other._starts
+
+    def __hash__(self):
+        return hash(tuple(self._starts))
+
+    def __repr__(self):
+        return f"BucketScheme({self.edges}, {self.labels})"
+
+
+# the low/medium/high buckets that every WordStore counts directly (see convert_rating_to_index)
+THREE_BUCKETS = BucketScheme((2.5, 4), ("Low Reviews", "Medium Reviews", "High Reviews"))
+FIVE_BUCKETS = BucketScheme((1.5, 2.5, 3.5, 4.5), ("1 Star", "2 Stars", "3 Stars", "4 Stars", "5 Stars"))
+SCHEMES = {'3': THREE_BUCKETS, '5': FIVE_BUCKETS}
+
+
+class ReviewStats:
+    """
+    The review-level summary gathered while a review file is counted:
+    per-gender review counts per bucket, rating histograms and word totals.
+    Every WordStore carries one, filled in by the same pass that counts its
+    words, so questions about whole reviews can be answered without reading
+    the file again.
+
+    >>> stats = ReviewStats()
+    >>> stats.add('W', 2, 5.0, 3)
+    >>> stats.add('W', 0, 1.5, 2)
+    >>> stats.add('M', 2, 5.0, 4)
+    >>> stats.reviews, stats.tokens
+    ({'W': [1, 0, 1], 'M': [0, 0, 1]}, {'W': [2, 0, 3], 'M': [0, 0, 4]})
+    >>> stats.ratings
+    {'W': {5.0: 1, 1.5: 1}, 'M': {5.0: 1}}
+    >>> stats.high_percentage('W')
+    50
+    """
+
+    def __init__(self):
+        self.reviews = {gender: [0] * NUM_BUCKETS for gender in GENDERS}
+        self.tokens = {gender: [0] * NUM_BUCKETS for gender in GENDERS}
+        self.ratings = {gender: {} for gender in GENDERS}
+
+    def add(self, gender, index, rating, num_tokens):
+        """
+        Records one review with the given gender key, bucket index, rating and number of words.
+        """
+        self.reviews[gender][index] += 1
+        self.tokens[gender][index] += num_tokens
+        ratings = self.ratings[gender]
+        ratings[rating] = ratings.get(rating, 0) + 1
+
+    def merge(self, other):
+        """
+        Adds every review recorded in other to this summary.
+
+        >>> stats = ReviewStats()
+        >>> stats.add('M', 1, 3.0, 2)
+        >>> other = ReviewStats()
+        >>> other.add('M', 1, 3.0, 5)
+        >>> stats.merge(other)
+        >>> stats.reviews['M'], stats.tokens['M'], stats.ratings['M']
+        ([0, 2, 0], [0, 7, 0], {3.0: 2})
+        """
+        for gender in GENDERS:
+            for index in range(NUM_BUCKETS):
+                self.reviews[gender][index] += other.reviews[gender][index]
+                self.tokens[gender][index] += other.tokens[gender][index]
+            ratings = self.ratings[gender]
+            for rating, count in other.ratings[gender].items():
+                ratings[rating] = ratings.get(rating, 0) + count
+
+    def total_reviews(self, gender):
+        """
+        Returns the number of reviews recorded for the given gender.
+        """
+        return sum(self.reviews[gender])
+
+    def bucket_reviews(self, gender, scheme=None):
+        """
+        Returns the number of the given gender's reviews in each bucket of the
+        given BucketScheme, worked out from the ratings histogram, or the
+        low/medium/high counts when no scheme is given.
+
+        >>> stats = ReviewStats()
+        >>> stats.add('W', 2, 5.0, 3)
+        >>> stats.add('W', 1, 3.0, 2)
+        >>> stats.bucket_reviews('W'), stats.bucket_reviews('W', FIVE_BUCKETS)
+        ([0, 1, 1], [0, 0, 1, 0, 1])
+        """
+        if scheme is None:
+            return list(self.reviews[gender])
+        histogram = [0] * NUM_RATINGS
+        for rating, count in self.ratings[gender].items():
+            histogram[rating_slot(rating)] += count
+        return scheme.regroup(histogram)
+
+    def high_percentage(self, gender, scheme=None):
+        """
+        Returns the percentage of the given gender's reviews that fall in the
+        highest rating bucket of the given BucketScheme (the high bucket when
+        none is given), rounded to a whole number (0 when there are none).
+        """
+        total = self.total_reviews(gender)
+        return round(self.bucket_reviews(gender, scheme)[-1] / total * 100) if total else 0
+
+    def to_dict(self):
+        """
+        Returns the summary as a dictionary that can be written as JSON.
+
+        >>> stats = ReviewStats()
+        >>> stats.add('W', 2, 4.5, 1)
+        >>> ReviewStats.from_dict(stats.to_dict()) == stats
+        True
+        """
+        return {
+            'reviews': self.reviews,
+            'tokens': self.tokens,
+            'ratings': {gender: [[rating, count] for rating, count in ratings.items()]
+                        for gender, ratings in self.ratings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Returns the summary stored in a dictionary made by to_dict.
+        """
+        stats = cls()
+        for gender in GENDERS:
+            stats.reviews[gender] = list(data['reviews'][gender])
+            stats.tokens[gender] = list(data['tokens'][gender])
+            stats.ratings[gender] = {rating: count for rating, count in data['ratings'][gender]}
+        return stats
+
+    def __eq__(self, other):
+        if not isinstance(other, ReviewStats):
+            return NotImplemented
+        return (self.reviews, self.tokens, self.ratings) == (other.reviews, other.tokens, other.ratings)
+
+    def __repr__(self):
+        return f"ReviewStats(reviews={self.reviews}, tokens={self.tokens})"
+
+
+class WordStore(Mapping):
+    """
+    A vocabulary index mapping each word to a row id, backed by one flat array
+    of counts. Indexing the store with a word returns a freshly built
+    {gender: [low, medium, high]} dictionary so it can be used anywhere
+    the original word_data dictionary was used. A store loaded from an index
+    file (see indexcache.py) is backed by a read-only memoryview instead of an
+    array, which is copied into an array the first time the store is changed.
+
+    The per-gender totals are kept up to date as counts are added, so new
+    reviews can be added at any time and frequencies() always reflects them.
+    The review_stats attribute holds the ReviewStats of the reviews counted.
+
+    Counts added with their rating are also logged in the word's histogram of
+    ratings, from which lookup() and frequencies() can regroup the counts into
+    any BucketScheme. Counts added without one (such as those merged from a
+    plain word_data dictionary) only have their bucket, so once there are any
+    the store can no longer be regrouped; see has_histograms().
+    One thread may add to a store while others read from it: a word counted
+    by a batch (see add_words) only becomes visible once its counts are in.
+
+    >>> store = WordStore()
+    >>> store.add('good', 'M', 2)
+    >>> store.add('good', 'W', 1, 3)
+    >>> store['good']
+    {'W': [0, 3, 0], 'M': [0, 0, 1]}
+    >>> 'good' in store, 'bad' in store
+    (True, False)
+    >>> store
+    {'good': {'W': [0, 3, 0], 'M': [0, 0, 1]}}
+    >>> store.add('fine', 'W', 1, rating=2.5)
+    >>> store.has_histograms(), store.histogram('fine', 'W')
+    (False, [0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0])
+    """
+
+    def __init__(self, counts=None, words=None, totals=None, review_stats=None, histograms=None):
+        self._words = []
+        self._rows = {}
+        self._unpublished = {}      # word -> row, for rows being filled before readers may see them
+        self._counts = array(COUNT_TYPECODE) if counts is None else counts
+        # the histograms only match the counts if both start out empty or both are given
+        self._rated = (counts is None) == (histograms is None)
+        if histograms is None:
+            histograms = array(COUNT_TYPECODE, bytes(len(self._counts) // ROW_SIZE * HISTOGRAM_ROW_SIZE
+                                                    * array(COUNT_TYPECODE).itemsize))
+        self._histograms = histograms
+        # an empty store starts from zero totals that every add keeps up to date, so another thread reading
+        # the totals while counts are added never sums a batch that is then added to the totals again
+        if totals is None and counts is None:
+            totals = dict.fromkeys(GENDERS, 0)
+        self._totals = totals
+        self._search_index = None
+        self._index_lock = threading.Lock()
+        self._read_only = isinstance(self._counts, memoryview) or isinstance(self._histograms, memoryview)
+        self._version = 0
+        self._error = 0
+        self.review_stats = ReviewStats() if review_stats is None else review_stats
+        for word in words or ():
+            self._rows[word] = len(self._words)
+            self._words.append(word)
+
+    def row_for(self, word):
+        """
+        Returns the row id of the given word, adding a new empty row
+        to the store if the word has not been seen before.
+        """
+        row = self._rows.get(word)
+        if row is None:
+            if self._read_only:
+                self._make_writable()
+            row = len(self._words)
+            self._counts.frombytes(bytes(ROW_SIZE * self._counts.itemsize))
+            self._histograms.frombytes(bytes(HISTOGRAM_ROW_SIZE * self._histograms.itemsize))
+            self._words.append(word)
+            self._rows[word] = row
+        return row
+
+    def add(self, word, gender, index, count=1, rating=None):
+        """
+        Logs count occurrences of word in reviews of the given gender
+        that fall in the bucket with the given index, and in the histogram
+        of ratings if the reviews' rating is given.
+        """
+        row = self.row_for(word)
+        if self._read_only:
+            self._make_writable()
+        self._counts[row * ROW_SIZE + gender_offset(gender) + index] += count
+        if rating is None:
+            self._rated = False
+        else:
+            self._histograms[row * HISTOGRAM_ROW_SIZE + GENDERS.index(gender) * NUM_RATINGS
+                             + rating_slot(rating)] += count
+        if self._totals is not None:
+            self._totals[gender] += count
+        self._version += 1
+
+    def add_words(self, words, publish=True):
+        """
+        Gives a row to each of the words that is not already in the store,
+        in the order the words are given, growing the array once for all of them.
+        With publish False the new rows are kept out of sight of readers, while
+        add_counts fills them, until publish_words is called.
+
+        >>> store = WordStore()
+        >>> store.add_words(['good'], publish=False)
+        >>> store.add_counts('W', 2, {'good': 2})
+        >>> 'good' in store, len(store)
+        (False, 0)
+        >>> store.publish_words()
+        >>> store
+        {'good': {'W': [0, 0, 2], 'M': [0, 0, 0]}}
+        """
+        rows = self._rows
+        unpublished = self._unpublished
+        new_words = [word for word in words if word not in rows and word not in unpublished]
+        if new_words and self._read_only:
+            self._make_writable()
+        self._counts.frombytes(bytes(len(new_words) * ROW_SIZE * self._counts.itemsize))
+        self._histograms.frombytes(bytes(len(new_words) * HISTOGRAM_ROW_SIZE * self._histograms.itemsize))
+        first = len(self._words) + len(unpublished)
+        for i, word in enumerate(new_words):
+            unpublished[word] = first + i
+        if publish:
+            self.publish_words()
+
+    def publish_words(self):
+        """
+        Makes the rows given by add_words(..., publish=False) visible to readers.
+        Each word is added to the row lookup before the list of words, so a
+        reader walking the list can always find the row of every word in it.
+        """
+        rows = self._rows
+        for word, row in self._unpublished.items():
+            rows[word] = row
+            self._words.append(word)
+        self._unpublished.clear()
+
+    def add_counts(self, gender, index, word_counts, rating=None):
+        """
+        Adds a whole mapping of word -> count to the given gender and bucket,
+        and to the histograms of ratings if the reviews' rating is given.
+        Every word must already have a row in the store (see add_words).
+
+        >>> store = WordStore()
+        >>> store.add_words(['good', 'bad'])
+        >>> store.add_counts('W', 2, {'good': 2, 'bad': 1}, 4.5)
+        >>> store
+        {'good': {'W': [0, 0, 2], 'M': [0, 0, 0]}, 'bad': {'W': [0, 0, 1], 'M': [0, 0, 0]}}
+        >>> store.histogram('good', 'W')[9], store.has_histograms()
+        (2, True)
+        """
+        if self._read_only:
+            self._make_writable()
+        rows = self._rows
+        counts = self._counts
+        offset = gender_offset(gender) + index
+        # words given rows by add_words but not yet published are looked up there
+        unpublished = self._unpublished
+        if rating is None:
+            self._rated = False
+            for word, count in word_counts.items():
+                row = rows.get(word)
+                if row is None:
+                    row = unpublished[word]
+                counts[row * ROW_SIZE + offset] += count
+        else:
+            histograms = self._histograms
+            histogram_offset = GENDERS.index(gender) * NUM_RATINGS + rating_slot(rating)
+            for word, count in word_counts.items():
+                row = rows.get(word)
+                if row is None:
+                    row = unpublished[word]
+                counts[row * ROW_SIZE + offset] += count
+                histograms[row * HISTOGRAM_ROW_SIZE + histogram_offset] += count
+        if self._totals is not None:
+            self._totals[gender] += sum(word_counts.values())
+        self._version += 1
+
+    def merge(self, other):
+        """
+        Adds every count in other, which may be another WordStore or a plain
+        word_data dictionary, to this store. Words new to this store are added
+        in the order they appear in other.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2)
+        >>> store.merge({'bad': {'W': [1, 0, 0], 'M': [0, 0, 0]}, 'good': {'W': [0, 0, 0], 'M': [0, 0, 2]}})
+        >>> store
+        {'good': {'W': [0, 0, 0], 'M': [0, 0, 3]}, 'bad': {'W': [1, 0, 0], 'M': [0, 0, 0]}}
+
+        Frequencies cannot be added to counts, so neither store may have been scaled.
+
+        >>> scaled = WordStore()
+        >>> scaled.add('good', 'W', 0)
+        >>> scaled.scale({'W': 0.5, 'M': 0.5})
+        >>> store.merge(scaled)
+        Traceback (most recent call last):
+        ...
+        ValueError: cannot merge a store whose counts have been scaled into frequencies
+        """
+        if self.is_scaled() or (isinstance(other, WordStore) and other.is_scaled()):
+            raise ValueError("cannot merge a store whose counts have been scaled into frequencies")
+        self.add_words(other)
+        if self._read_only:
+            self._make_writable()
+        rows = self._rows
+        counts = self._counts
+        if isinstance(other, WordStore):
+            added = other.totals()
+            self._error += other._error
+            self._rated = self._rated and other._rated
+            self.review_stats.merge(other.review_stats)
+            other_counts = other._counts
+            histograms = self._histograms
+            other_histograms = other._histograms
+            for other_row, word in enumerate(other._words):
+                start = rows[word] * ROW_SIZE
+                other_start = other_row * ROW_SIZE
+                for i in range(ROW_SIZE):
+                    counts[start + i] += other_counts[other_start + i]
+                start = rows[word] * HISTOGRAM_ROW_SIZE
+                other_start = other_row * HISTOGRAM_ROW_SIZE
+                for i in range(HISTOGRAM_ROW_SIZE):
+                    histograms[start + i] += other_histograms[other_start + i]
+        else:
+            self._rated = self._rated and not other
+            added = dict.fromkeys(GENDERS, 0)
+            for word, gender_data in other.items():
+                start = rows[word] * ROW_SIZE
+                for gender in GENDERS:
+                    offset = start + gender_offset(gender)
+                    for index, count in enumerate(gender_data[gender]):
+                        counts[offset + index] += count
+                    added[gender] += sum(gender_data[gender])
+        if self._totals is not None:
+            for gender in GENDERS:
+                self._totals[gender] += added[gender]
+        self._version += 1
+
+    def is_scaled(self):
+        """
+        Returns whether scale() has replaced the counts with frequencies.
+        """
+        return isinstance(self._counts, array) and self._counts.typecode == FREQUENCY_TYPECODE
+
+    def _make_writable(self):
+        """
+        Copies counts and histograms held in read-only memoryviews into arrays
+        of the same type so that the store can be changed.
+        """
+        if isinstance(self._counts, memoryview):
+            counts = array(COUNT_TYPECODE)
+            counts.frombytes(self._counts.cast('B'))
+            self._counts = counts
+        if isinstance(self._histograms, memoryview):
+            histograms = array(COUNT_TYPECODE)
+            histograms.frombytes(self._histograms.cast('B'))
+            self._histograms = histograms
+        self._read_only = False
+
+    def counts(self, word, gender):
+        """
+        Returns the [low, medium, high] list of values for the word and gender.
+        """
+        start = self._rows[word] * ROW_SIZE + gender_offset(gender)
+        return self._counts[start:start + NUM_BUCKETS].tolist()
+
+    def histogram(self, word, gender):
+        """
+        Returns the word's histogram of ratings for the given gender: a list
+        of NUM_RATINGS counts, one per half point rating from 0 up.
+        """
+        start = self._rows[word] * HISTOGRAM_ROW_SIZE + GENDERS.index(gender) * NUM_RATINGS
+        return self._histograms[start:start + NUM_RATINGS].tolist()
+
+    def has_histograms(self):
+        """
+        Returns whether every count in the store was added with its rating, so
+        that the counts can be regrouped into any BucketScheme.
+        """
+        return self._rated
+
+    def most_common(self, k, gender=None):
+        """
+        Returns the k words with the highest total count, as a list of
+        (word, count) pairs from most to least common. Only the counts for
+        the given gender are used if one is given.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 4)
+        >>> store.add('bad', 'W', 0, 3)
+        >>> store.add('okay', 'W', 1, 1)
+        >>> store.most_common(2)
+        [('good', 4), ('bad', 3)]
+        >>> store.most_common(1, 'W')
+        [('bad', 3)]
+        """
+        counts = self._counts
+        if gender is None:
+            offset, length = 0, ROW_SIZE
+        else:
+            offset, length = gender_offset(gender), NUM_BUCKETS
+        totals = [sum(counts[start:start + length]) for start in range(offset, len(counts), ROW_SIZE)]
+        top = heapq.nlargest(k, range(len(totals)), key=totals.__getitem__)
+        return [(self._words[row], totals[row]) for row in top]
+
+    def frequencies(self, word, scale=PER_MILLION, scheme=None):
+        """
+        Returns the {gender: [low, medium, high]} frequencies of the word, found
+        by dividing its counts by the total number of words counted for each
+        gender and multiplying by scale (so per million words by default).
+        The counts themselves are left unchanged. When a BucketScheme is given
+        there is one frequency per bucket of the scheme instead.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 1)
+        >>> store.add('bad', 'M', 0, 3)
+        >>> store.add('bad', 'W', 1, 2)
+        >>> store.frequencies('good')
+        {'W': [0.0, 0.0, 0.0], 'M': [0.0, 0.0, 250000.0]}
+        >>> store.add('good', 'M', 2, 4)
+        >>> store.frequencies('good', scale=1)
+        {'W': [0.0, 0.0, 0.0], 'M': [0.0, 0.0, 0.625]}
+        """
+        if scheme is not None:
+            if word not in self._rows:
+                raise KeyError(word)
+            return self.lookup([word], scale, scheme)[0]
+        totals = self.totals()
+        gender_data = self[word]
+        for gender in GENDERS:
+            factor = scale / totals[gender] if totals[gender] else 0.0
+            gender_data[gender] = [count * factor for count in gender_data[gender]]
+        return gender_data
+
+    def prune(self, min_count):
+        """
+        Removes every word counted fewer than min_count times in all, keeping
+        the rest in order, and returns the number of words removed. This keeps
+        the store small when most words are rare, as with phrases. The totals
+        still include the removed counts, so the frequencies of the words kept
+        do not change. A removed word that is added again starts from zero, so
+        its counts may then be short by up to min_count - 1 (see error_bound).
+        Another thread reading the store while it is pruned may briefly see
+        the counts of the wrong word.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 3)
+        >>> store.add('bad', 'W', 0)
+        >>> store.add('fine', 'W', 1, 2)
+        >>> store.prune(2)
+        1
+        >>> store, store.totals(), store.error_bound()
+        ({'good': {'W': [0, 0, 0], 'M': [0, 0, 3]}, 'fine': {'W': [0, 2, 0], 'M': [0, 0, 0]}}, {'W': 3, 'M': 3}, 1)
+        """
+        if self._read_only:
+            self._make_writable()
+        self.totals()
+        counts = self._counts
+        row_sums = [sum(values) for values in zip(*(counts[i::ROW_SIZE] for i in range(ROW_SIZE)))]
+        keep = [row for row, total in enumerate(row_sums) if total >= min_count]
+        removed = len(self._words) - len(keep)
+        if removed == 0:
+            return 0
+
+        kept_counts = array(counts.typecode)
+        kept_histograms = array(self._histograms.typecode)
+        for row in keep:
+            kept_counts += counts[row * ROW_SIZE:(row + 1) * ROW_SIZE]
+            kept_histograms += self._histograms[row * HISTOGRAM_ROW_SIZE:(row + 1) * HISTOGRAM_ROW_SIZE]
+        words = [self._words[row] for row in keep]
+        # the new rows are published first, since they never point past the end of either counts array
+        with self._index_lock:
+            self._rows = {word: row for row, word in enumerate(words)}
+            self._words = words
+            self._counts = kept_counts
+            self._histograms = kept_histograms
+            self._search_index = None
+        self._error += min_count - 1
+        self._version += 1
+        return removed
+
+    def error_bound(self):
+        """
+        Returns the most by which the total count of any word in the store may
+        be short because of pruning; 0 when every count is exact.
+        """
+        return self._error
+
+    def lookup(self, words, scale=None, scheme=None):
+        """
+        Looks up a batch of words at once, returning a list with the
+        {gender: [low, medium, high]} counts of each word in the order given,
+        or None for a word that is not in the store. When scale is given the
+        frequencies are returned instead, as from frequencies(word, scale),
+        with the totals worked out once for the whole batch. When a
+        BucketScheme is given each word's histograms are regrouped into its
+        buckets; a ValueError is raised if the store has no histograms.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 1)
+        >>> store.add('bad', 'W', 0, 3)
+        >>> store.lookup(['bad', 'ugly', 'good'])
+        [{'W': [3, 0, 0], 'M': [0, 0, 0]}, None, {'W': [0, 0, 0], 'M': [0, 0, 1]}]
+        >>> store.lookup(['good'], scale=1)
+        [{'W': [0.0, 0.0, 0.0], 'M': [0.0, 0.0, 1.0]}]
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 2, rating=4.5)
+        >>> store.add('good', 'M', 2, 1, rating=5.0)
+        >>> store.lookup(['good'], scheme=FIVE_BUCKETS)
+        [{'W': [0, 0, 0, 0, 0], 'M': [0, 0, 0, 0, 3]}]
+        >>> store.lookup(['good'], scheme=BucketScheme((4.5, 5)))
+        [{'W': [0, 0, 0], 'M': [0, 2, 1]}]
+        """
+        if scheme is not None and scheme != THREE_BUCKETS:
+            return self._lookup_regrouped(words, scale, scheme)
+        factors = None
+        if scale is not None:
+            totals = self.totals()
+            factors = [scale / totals[gender] if totals[gender] else 0.0 for gender in GENDERS]
+        rows = self._rows
+        counts = self._counts
+        results = []
+        for word in words:
+            row = rows.get(word)
+            if row is None:
+                results.append(None)
+                continue
+            values = counts[row * ROW_SIZE:(row + 1) * ROW_SIZE].tolist()
+            gender_data = {}
+            for i, gender in enumerate(GENDERS):
+                bucket_values = values[i * NUM_BUCKETS:(i + 1) * NUM_BUCKETS]
+                if factors is not None:
+                    bucket_values = [value * factors[i] for value in bucket_values]
+                gender_data[gender] = bucket_values
+            results.append(gender_data)
+        return results
+
+    def _lookup_regrouped(self, words, scale, scheme):
+        """
+        Does the work of lookup() for any scheme other than the low, medium
+        and high buckets the counts are kept in.
+        """
+        if not self._rated:
+            raise ValueError("some counts were added without their ratings, so they cannot be regrouped")
+        factors = None
+        if scale is not None:
+            totals = self.totals()
+            factors = [scale / totals[gender] if totals[gender] else 0.0 for gender in GENDERS]
+        rows = self._rows
+        histograms = self._histograms
+        results = []
+        for word in words:
+            row = rows.get(word)
+            if row is None:
+                results.append(None)
+                continue
+            values = histograms[row * HISTOGRAM_ROW_SIZE:(row + 1) * HISTOGRAM_ROW_SIZE].tolist()
+            gender_data = {}
+            for i, gender in enumerate(GENDERS):
+                bucket_values = scheme.regroup(values[i * NUM_RATINGS:(i + 1) * NUM_RATINGS])
+                if factors is not None:
+                    bucket_values = [value * factors[i] for value in bucket_values]
+                gender_data[gender] = bucket_values
+            results.append(gender_data)
+        return results
+
+    def totals(self):
+        """
+        Returns a dictionary mapping each gender to the sum of its values
+        across every word and bucket. The totals of a store that started out
+        empty are kept up to date as counts are added; those of a store made
+        from existing counts without totals are computed in one pass over the
+        array the first time they are needed, and then kept up to date.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 4)
+        >>> store.add('bad', 'W', 0)
+        >>> store.totals()
+        {'W': 1, 'M': 4}
+        """
+        if self._totals is None:
+            totals = {}
+            for gender in GENDERS:
+                total = 0
+                start = gender_offset(gender)
+                for index in range(NUM_BUCKETS):
+                    total += sum(self._counts[start + index::ROW_SIZE])
+                totals[gender] = total
+            self._totals = totals
+        return dict(self._totals)
+
+    def scale(self, factors):
+        """
+        Replaces the counts with frequencies by multiplying every value for a
+        gender by factors[gender]. The scaled values are stored as doubles.
+
+        >>> store = WordStore()
+        >>> store.add('good', 'M', 2, 4)
+        >>> store.scale({'W': 0.5, 'M': 0.5})
+        >>> store['good']
+        {'W': [0.0, 0.0, 0.0], 'M': [0.0, 0.0, 2.0]}
+        """
+        scaled = array(FREQUENCY_TYPECODE, self._counts.tolist())
+        for gender in GENDERS:
+            factor = factors[gender]
+            start = gender_offset(gender)
+            for i in range(start, len(scaled), ROW_SIZE):
+                for index in range(i, i + NUM_BUCKETS):
+                    scaled[index] *= factor
+        scaled_histograms = array(FREQUENCY_TYPECODE, self._histograms.tolist())
+        for i, gender in enumerate(GENDERS):
+            factor = factors[gender]
+            for start in range(i * NUM_RATINGS, len(scaled_histograms), HISTOGRAM_ROW_SIZE):
+                for index in range(start, start + NUM_RATINGS):
+                    scaled_histograms[index] *= factor
+        self._counts = scaled
+        self._histograms = scaled_histograms
+        self._totals = None
+        self._version += 1
+
+    def search_index(self):
+        """
+        Returns the SearchIndex over the words of this store, building it the
+        first time it is needed. Words added since the last call are indexed
+        before the index is returned, so searches always see every word.
+        """
+        with self._index_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex(self._words[:])
+            elif len(self._search_index) < len(self._words):
+                self._search_index.add_words(self._words[len(self._search_index):])
+            return self._search_index
+
+    def version(self):
+        """
+        Returns a number that changes every time a count in the store changes,
+        so that values computed from the store know when to recompute.
+        """
+        return self._version
+
+    def words(self):
+        """
+        Returns the list of words in row order. The list must not be changed.
+        """
+        return self._words
+
+    def buffer(self):
+        """
+        Returns the flat array (or read-only memoryview) holding the values
+        of every row, as used when writing the store to disk.
+        """
+        return self._counts
+
+    def histogram_buffer(self):
+        """
+        Returns the flat array (or read-only memoryview) holding the histogram
+        of ratings of every row, as used when writing the store to disk.
+        """
+        return self._histograms
+
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the counts and histogram arrays.
+        """
+        return len(self._counts) * self._counts.itemsize + len(self._histograms) * self._histograms.itemsize
+
+    def __getstate__(self):
+        # the lock cannot be pickled, and the search index is cheap to rebuild
+        state = self.__dict__.copy()
+        del state['_index_lock']
+        state['_search_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index_lock = threading.Lock()
+
+    def __getitem__(self, word):
+        start = self._rows[word] * ROW_SIZE
+        row = self._counts[start:start + ROW_SIZE].tolist()
+        return {gender: row[i * NUM_BUCKETS:(i + 1) * NUM_BUCKETS] for i, gender in enumerate(GENDERS)}
+
+    def __contains__(self, word):
+        return word in self._rows
+
+    def __iter__(self):
+        return iter(self._words)
+
+    def __len__(self):
+        return len(self._words)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class FrequencyView(Mapping):
+    """
+    A read-only view of a WordStore that maps each word to its per-million
+    frequencies instead of its counts. Frequencies are only computed for the
+    words that are looked up, using the store's cached per-gender totals, and
+    the raw counts are never changed. When memoize is True each word's
+    frequencies are kept until the store next changes. The store attribute
+    may be replaced, for example once a store loading in the background is
+    ready, and the view then reads from the new store.
+
+    >>> store = WordStore()
+    >>> store.add('good', 'M', 2, 1)
+    >>> store.add('bad', 'M', 0, 3)
+    >>> frequencies = FrequencyView(store)
+    >>> frequencies['good']
+    {'W': [0.0, 0.0, 0.0], 'M': [0.0, 0.0, 250000.0]}
+    >>> store.add('good', 'M', 2, 4)
+    >>> frequencies['good']['M'], store['good']['M']
+    ([0.0, 0.0, 625000.0], [0, 0, 5])
+    """
+
+    def __init__(self, store, memoize=True, scale=PER_MILLION):
+        self.store = store
+        self.memoize = memoize
+        self.scale = scale
+        self._memo = {}
+        self._memo_store = store
+        self._memo_version = store.version()
+
+    def __getitem__(self, word):
+        if not self.memoize:
+            return self.store.frequencies(word, self.scale)
+        store = self.store
+        if self._memo_store is not store or self._memo_version != store.version():
+            self._memo.clear()
+            self._memo_store = store
+            self._memo_version = store.version()
+        gender_data = self._memo.get(word)
+        if gender_data is None:
+            gender_data = self._memo[word] = self.store.frequencies(word, self.scale)
+        return gender_data
+
+    def lookup(self, words, scheme=None):
+        """
+        Returns the frequencies of a batch of words, or None for each word not
+        in the store, in the buckets of the given BucketScheme if there is one;
+        see WordStore.lookup.
+        """
+        return self.store.lookup(words, self.scale, scheme)
+
+    def search_index(self):
+        """
+        Returns the SearchIndex of the underlying store.
+        """
+        return self.store.search_index()
+
+    def __contains__(self, word):
+        return word in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+
+class StoreUnion(Mapping):
+    """
+    A read-only view of several WordStores (such as the partitions of a
+    PartitionedStore, see partitions.py) as if their counts had been merged.
+    Looking up words adds up the counts of each store when asked, and searches
+    combine the stores' own search indexes, so the stores are never rebuilt.
+    Only questions about the whole vocabulary at once (iterating, ranking,
+    buffer()) need the merged counts, which are then worked out once and kept
+    until one of the stores changes.
+
+    >>> first = WordStore()
+    >>> first.add('good', 'W', 2, 2, rating=5.0)
+    >>> second = WordStore()
+    >>> second.add('good', 'M', 0, 1, rating=1.0)
+    >>> second.add('bad', 'M', 0, 3, rating=1.0)
+    >>> union = StoreUnion([first, second])
+    >>> union['good'], 'bad' in union, list(union)
+    ({'W': [0, 0, 2], 'M': [1, 0, 0]}, True, ['good', 'bad'])
+    >>> union.totals(), union.lookup(['bad', 'ugly'], scale=1)
+    ({'W': 2, 'M': 4}, [{'W': [0.0, 0.0, 0.0], 'M': [0.75, 0.0, 0.0]}, None])
+    >>> union.search_index().search('o')
+    ['good']
+    """
+
+    def __init__(self, stores):
+        self.stores = list(stores)
+        self._merged = None
+        self._merged_version = None
+
+    def merged(self):
+        """
+        Returns a WordStore holding the summed counts of every store, merged
+        the first time it is needed after any of the stores changes.
+        """
+        version = self.version()
+        if self._merged is None or self._merged_version != version:
+            merged = WordStore()
+            for store in self.stores:
+                merged.merge(store)
+            self._merged = merged
+            self._merged_version = version
+        return self._merged
+
+    @property
+    def review_stats(self):
+        """
+        The ReviewStats of every store, added together.
+        """
+        stats = ReviewStats()
+        for store in self.stores:
+            stats.merge(store.review_stats)
+        return stats
+
+    def lookup(self, words, scale=None, scheme=None):
+        """
+        Looks up a batch of words in every store and adds up their counts,
+        returning None for a word in none of the stores; see WordStore.lookup.
+        """
+        results = [None] * len(words)
+        for store in self.stores:
+            for i, gender_data in enumerate(store.lookup(words, scheme=scheme)):
+                if gender_data is None:
+                    continue
+                if results[i] is None:
+                    results[i] = gender_data
+                else:
+                    for gender in GENDERS:
+                        results[i][gender] = [a + b for a, b in zip(results[i][gender], gender_data[gender])]
+        if scale is not None:
+            totals = self.totals()
+            factors = {gender: scale / total if total else 0.0 for gender, total in totals.items()}
+            for gender_data in results:
+                if gender_data is not None:
+                    for gender in GENDERS:
+                        gender_data[gender] = [value * factors[gender] for value in gender_data[gender]]
+        return results
+
+    def frequencies(self, word, scale=PER_MILLION, scheme=None):
+        """
+        Returns the frequencies of the word in the union; see WordStore.frequencies.
+        """
+        gender_data = self.lookup([word], scale, scheme)[0]
+        if gender_data is None:
+            raise KeyError(word)
+        return gender_data
+
+    def totals(self):
+        """
+        Returns the per-gender totals of the union: the sums of the stores' totals.
+        """
+        totals = dict.fromkeys(GENDERS, 0)
+        for store in self.stores:
+            for gender, total in store.totals().items():
+                totals[gender] += total
+        return totals
+
+    def search_index(self):
+        """
+        Returns an index searching every store's own SearchIndex in turn.
+        """
+        return UnionIndex(store.search_index() for store in self.stores)
+
+    def has_histograms(self):
+        """
+        Returns whether every store can be regrouped into any BucketScheme.
+        """
+        return all(store.has_histograms() for store in self.stores)
+
+    def error_bound(self):
+        """
+        Returns the most by which any count may be short because of pruning.
+        """
+        return sum(store.error_bound() for store in self.stores)
+
+    def version(self):
+        """
+        Returns a value that changes every time a count in any store changes.
+        """
+        return tuple(store.version() for store in self.stores)
+
+    def most_common(self, k, gender=None):
+        """
+        Returns the k words with the highest total count; see WordStore.most_common.
+        """
+        return self.merged().most_common(k, gender)
+
+    def words(self):
+        """
+        Returns the list of words in the order they first appear across the stores.
+        """
+        return self.merged().words()
+
+    def buffer(self):
+        """
+        Returns the flat array of merged counts, with rows in the order of words().
+        """
+        return self.merged().buffer()
+
+    def __getitem__(self, word):
+        gender_data = self.lookup([word])[0]
+        if gender_data is None:
+            raise KeyError(word)
+        return gender_data
+
+    def __contains__(self, word):
+        return any(word in store for store in self.stores)
+
+    def __iter__(self):
+        return iter(self.words())
+
+    def __len__(self):
+        return len(self.words())
+
+    def __repr__(self):
+        return repr(dict(self.items()))